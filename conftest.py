@@ -9,6 +9,17 @@ elif os.path.isdir("../src"):
 
 import config
 
+
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmarks")
+    group.addoption("--bench-save", metavar="FILE",
+                    help="Save best benchmark times to FILE")
+    group.addoption("--bench-compare", metavar="FILE",
+                    help="Fail benchmarks that got slower than saved in FILE")
+    group.addoption("--bench-threshold", type=float, default=0.25,
+                    help="Allowed slowdown for --bench-compare, as a "
+                         "fraction of the saved time (default 0.25)")
+
 @pytest.fixture(scope="module")
 def application(qapp, request):
     return qapp
@@ -3,17 +3,19 @@ import logging
 logger = logging.getLogger(__name__)
 
 from PyQt5 import QtWidgets, QtCore, QtGui
-from PyQt5.QtNetwork import QNetworkAccessManager
-from PyQt5.QtCore import QSocketNotifier, QTimer
+from PyQt5.QtNetwork import QNetworkAccessManager, QNetworkRequest
+from PyQt5.QtCore import QSocketNotifier, QTimer, QUrl
 
 from config import Settings, defaults
 import util
 
+import os
 import re
 import sys
 import chat
 from chat import user2name, parse_irc_source
 from chat.channel import Channel
+from chat.chattermodel import ChatterModel
 from chat.irclib import SimpleIRCClient, ServerConnectionError
 
 from model.ircuserset import IrcUserset
@@ -33,6 +35,10 @@ class ChatWidget(FormClass, BaseClass, SimpleIRCClient):
 
     auto_join_channels = Settings.persisted_property('chat/auto_join_channels', default_value=[])
 
+    use_history = Settings.persisted_property('chat/history', type=bool, default_value=False)
+    history_path = Settings.persisted_property('chat/history_path', type=str,
+                                               default_value=os.path.join(util.APPDATA_DIR, "chat"))
+
     """
     This is the chat lobby module for the FAF client.
     It manages a list of channels and dispatches IRC events (lobby inherits from irclib's client class)
@@ -58,6 +64,11 @@ class ChatWidget(FormClass, BaseClass, SimpleIRCClient):
         self.nam = QNetworkAccessManager()
         self.nam.finished.connect(self.finish_download_avatar)
 
+        # Nick lists of all channels show users from this model
+        self._chatter_model = ChatterModel(me, client.player_colors,
+                                           client.map_downloader, self)
+        self._chatter_model.friends_on_top = client.friendsontop
+
         # nickserv stuff
         self.identified = False
 
@@ -68,6 +79,9 @@ class ChatWidget(FormClass, BaseClass, SimpleIRCClient):
         # We can't send command until the welcome message is received
         self.welcomed = False
 
+        # Channel -> [(name, elevation)] listed so far by NAMES replies
+        self._pending_names = {}
+
         # Load colors and styles from theme
         self.a_style = util.THEME.readfile("chat/formatters/a_style.qss")
 
@@ -125,14 +139,13 @@ class ChatWidget(FormClass, BaseClass, SimpleIRCClient):
         if not util.respix(url):
             util.addrespix(url, QtGui.QPixmap(img))
 
-        for chatter in util.curDownloadAvatar(url):
-            # FIXME - hack to prevent touching chatter if it was removed
-            channel = chatter.channel
-            ircuser = chatter.user
-            if ircuser in channel.chatters:
-                chatter.update_avatar()
+        for item in util.curDownloadAvatar(url):
+            item.avatar_downloaded()
         util.delDownloadAvatar(url)
 
+    def download_avatar(self, url):
+        self.nam.get(QNetworkRequest(QUrl(url)))
+
     def add_channel(self, name, channel, index = None):
         self.channels[name] = channel
         if index is None:
@@ -141,12 +154,14 @@ class ChatWidget(FormClass, BaseClass, SimpleIRCClient):
             self.insertTab(index, self.channels[name], name)
 
     def sort_channels(self):
+        self._chatter_model.friends_on_top = self.client.friendsontop
         for channel in self.channels.values():
             channel.sort_chatters()
 
     def update_channels(self):
+        self._chatter_model.update_games()
         for channel in self.channels.values():
-            channel.update_chatters()
+            channel.resize_map_column()
 
     def close_channel(self, index):
         """
@@ -161,6 +176,7 @@ class ChatWidget(FormClass, BaseClass, SimpleIRCClient):
                         # Queries and disconnected channel windows can just be closed
                         self.removeTab(index)
                         del self.channels[name]
+                        self._chatter_model.remove_channel(name)
 
                     break
 
@@ -204,7 +220,8 @@ class ChatWidget(FormClass, BaseClass, SimpleIRCClient):
             return False
 
         if chatter.name not in self.channels:
-            priv_chan = Channel(self, chatter.name, self._chatters, self._me, True)
+            priv_chan = Channel(self, chatter.name, self._chatters, self._me,
+                                self._chatter_model, True)
             self.add_channel(chatter.name, priv_chan)
 
             # Add participants to private channel
@@ -307,15 +324,32 @@ class ChatWidget(FormClass, BaseClass, SimpleIRCClient):
         channel = e.arguments()[1]
         listing = e.arguments()[2].split()
 
+        # Big channels are listed in many replies, we add everyone at once
+        # when the listing ends
+        names = self._pending_names.setdefault(channel, [])
         for user in listing:
             name = user.strip(chat.IRC_ELEVATION)
             elevation = user[0] if user[0] in chat.IRC_ELEVATION else None
-            hostname = ''
-            self._add_chatter(name, hostname)
-            self._add_chatter_channel(self._chatters[name], elevation,
-                                      channel, False)
+            names.append((name, elevation))
+
+    def on_endofnames(self, c, e):
+        self.log_event(e)
+        channel = e.arguments()[0]
+        names = self._pending_names.pop(channel, [])
+        if channel not in self.channels:
+            return
+
+        chatters = []
+        for name, elevation in names:
+            if name not in self._chatters:
+                self._chatters[name] = IrcUser(name, '')
+            chatter = self._chatters[name]
+            if chatter.elevation.get(channel) != elevation:
+                chatter.set_elevation(channel, elevation)
+            chatters.append(chatter)
+        self.channels[channel].add_chatters(chatters)
 
-        logger.debug("Added " + str(len(listing)) + " Chatters")
+        logger.debug("Added " + str(len(chatters)) + " Chatters")
 
     def _add_chatter(self, name, hostname):
         if name not in self._chatters:
@@ -335,7 +369,7 @@ class ChatWidget(FormClass, BaseClass, SimpleIRCClient):
 
     def _remove_chatter_channel(self, chatter, channel, msg):
         chatter.set_elevation(channel, None)
-        self.channels[channel].remove_chatter(msg)
+        self.channels[channel].remove_chatter(chatter, msg)
 
     def on_whoisuser(self, c, e):
         self.log_event(e)
@@ -345,7 +379,8 @@ class ChatWidget(FormClass, BaseClass, SimpleIRCClient):
 
         # If we're joining, we need to open the channel for us first.
         if channel not in self.channels:
-            newch = Channel(self, channel, self._chatters, self._me)
+            newch = Channel(self, channel, self._chatters, self._me,
+                            self._chatter_model)
             if channel.lower() in self.crucialChannels:
                 self.add_channel(channel, newch, 1)  # CAVEAT: This is assumes a server tab exists.
                 self.client.localBroadcast.connect(newch.print_raw)
@@ -377,6 +412,7 @@ class ChatWidget(FormClass, BaseClass, SimpleIRCClient):
         if name == self.client.login:   # We left ourselves.
             self.removeTab(self.indexOf(self.channels[channel]))
             del self.channels[channel]
+            self._chatter_model.remove_channel(channel)
         else:                           # Someone else left
             self._remove_chatter_channel(chatter, channel, "left.")
 
@@ -503,6 +539,7 @@ class ChatWidget(FormClass, BaseClass, SimpleIRCClient):
             self.serverLogArea.appendPlainText("%s: %s" % (source, notice))
 
     def on_disconnect(self, c, e):
+        self._pending_names.clear()
         if not self.canDisconnect:
             logger.warning("IRC disconnected - reconnecting.")
             self.serverLogArea.appendPlainText("IRC disconnected - reconnecting.")
@@ -4,13 +4,13 @@ import util
 from PyQt5 import QtWidgets, QtCore, QtGui
 import time
 from chat import logger
-from chat.chatter import Chatter
+from chat.chattermodel import ChatterModel, ChatterSortFilterModel
+from chat.chatteritem import ChatterView, ChatterItemDelegate
+from chat.scrollback import Scrollback, open_history
 import re
 import json
 
 QUERY_BLINK_SPEED = 250
-CHAT_TEXT_LIMIT = 350
-CHAT_REMOVEBLOCK = 50
 
 FormClass, BaseClass = util.THEME.loadUiType("chat/channel.ui")
 
@@ -40,41 +40,21 @@ class Formatters(object):
         return formatter
 
 
-# Helper class to schedule single event loop calls.
-class ScheduledCall(QtCore.QObject):
-    _call = QtCore.pyqtSignal()
-
-    def __init__(self, fn):
-        QtCore.QObject.__init__(self)
-        self._fn = fn
-        self._called = False
-        self._call.connect(self._run_call, QtCore.Qt.QueuedConnection)
-
-    def schedule_call(self):
-        if self._called:
-            return
-        self._called = True
-        self._call.emit()
-
-    def _run_call(self):
-        self._called = False
-        self._fn()
-
-
 class Channel(FormClass, BaseClass):
     """
     This is an actual chat channel object, representing an IRC chat room and the users currently present.
     """
-    def __init__(self, chat_widget, name, chatterset, me, private=False):
+    def __init__(self, chat_widget, name, chatterset, me, chatter_model,
+                 private=False):
         BaseClass.__init__(self, chat_widget)
 
         self.setupUi(self)
 
         # Special HTML formatter used to layout the chat lines written by people
         self.chat_widget = chat_widget
-        self.chatters = {}
-        self.items = {}
+        self.chatters = set()
         self._chatterset = chatterset
+        self._chatter_model = chatter_model
         self._me = me
         chatterset.userRemoved.connect(self._check_user_quit)
 
@@ -88,33 +68,48 @@ class Channel(FormClass, BaseClass):
         # Table width of each chatter's name cell...
         self.max_chatter_width = 100  # TODO: This might / should auto-adapt
 
-        # count the number of line currently in the chat
-        self.lines = 0
+        history = None
+        if chat_widget.use_history:
+            history = open_history(chat_widget.history_path, name)
+        self._scrollback = Scrollback(self.chatArea.document(), history)
+        self.chatArea.verticalScrollBar().valueChanged.connect(self._at_scroll)
+
+        # Lines printed in one pass of the event loop are inserted together
+        self._pending_lines = []
+        self._pending_scroll = False
+        self._flush_timer = QtCore.QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(0)
+        self._flush_timer.timeout.connect(self._flush_lines)
+        self.chatArea.document().setUndoRedoEnabled(False)
 
         # Perform special setup for public channels as opposed to private ones
         self.name = name
         self.private = private
 
-        self.sort_call = ScheduledCall(self.sort_chatters)
+        self._nick_model = None
+        self._nick_view = None
 
         if not self.private:
+            self._nick_model = ChatterSortFilterModel(chatter_model, name)
+            self._nick_view = ChatterView(name, self._nick_model, self.nickList,
+                                          ChatterItemDelegate(self.nickList),
+                                          chat_widget, me)
+
             # Properly and snugly snap all the columns
-            self.nickList.horizontalHeader().setSectionResizeMode(Chatter.RANK_COLUMN, QtWidgets.QHeaderView.Fixed)
-            self.nickList.horizontalHeader().resizeSection(Chatter.RANK_COLUMN, Formatters.NICKLIST_COLUMNS['RANK'])
+            self.nickList.horizontalHeader().setSectionResizeMode(ChatterModel.RANK_COLUMN, QtWidgets.QHeaderView.Fixed)
+            self.nickList.horizontalHeader().resizeSection(ChatterModel.RANK_COLUMN, Formatters.NICKLIST_COLUMNS['RANK'])
 
-            self.nickList.horizontalHeader().setSectionResizeMode(Chatter.AVATAR_COLUMN, QtWidgets.QHeaderView.Fixed)
-            self.nickList.horizontalHeader().resizeSection(Chatter.AVATAR_COLUMN, Formatters.NICKLIST_COLUMNS['AVATAR'])
+            self.nickList.horizontalHeader().setSectionResizeMode(ChatterModel.AVATAR_COLUMN, QtWidgets.QHeaderView.Fixed)
+            self.nickList.horizontalHeader().resizeSection(ChatterModel.AVATAR_COLUMN, Formatters.NICKLIST_COLUMNS['AVATAR'])
 
-            self.nickList.horizontalHeader().setSectionResizeMode(Chatter.STATUS_COLUMN, QtWidgets.QHeaderView.Fixed)
-            self.nickList.horizontalHeader().resizeSection(Chatter.STATUS_COLUMN, Formatters.NICKLIST_COLUMNS['STATUS'])
+            self.nickList.horizontalHeader().setSectionResizeMode(ChatterModel.STATUS_COLUMN, QtWidgets.QHeaderView.Fixed)
+            self.nickList.horizontalHeader().resizeSection(ChatterModel.STATUS_COLUMN, Formatters.NICKLIST_COLUMNS['STATUS'])
 
-            self.nickList.horizontalHeader().setSectionResizeMode(Chatter.MAP_COLUMN, QtWidgets.QHeaderView.Fixed)
+            self.nickList.horizontalHeader().setSectionResizeMode(ChatterModel.MAP_COLUMN, QtWidgets.QHeaderView.Fixed)
             self.resize_map_column()  # The map column can be toggled. Make sure it respects the settings
 
-            self.nickList.horizontalHeader().setSectionResizeMode(Chatter.SORT_COLUMN, QtWidgets.QHeaderView.Stretch)
-
-            self.nickList.itemDoubleClicked.connect(self.nick_double_clicked)
-            self.nickList.itemPressed.connect(self.nick_pressed)
+            self.nickList.horizontalHeader().setSectionResizeMode(ChatterModel.SORT_COLUMN, QtWidgets.QHeaderView.Stretch)
 
             self.nickFilter.textChanged.connect(self.filter_nicks)
 
@@ -127,7 +122,8 @@ class Channel(FormClass, BaseClass):
         self.chatEdit.set_chatters(self.chatters)
 
     def sort_chatters(self):
-        self.nickList.sortItems(Chatter.SORT_COLUMN)
+        if self._nick_model is not None:
+            self._nick_model.invalidate()
 
     def join_channel(self, index):
         """ join another channel """
@@ -157,21 +153,19 @@ class Channel(FormClass, BaseClass):
     @QtCore.pyqtSlot()
     def clearWindow(self):
         if self.isVisible():
+            self._pending_lines = []
             self.chatArea.setPlainText("")
+            self._scrollback.clear()
             self.last_timestamp = 0
 
     @QtCore.pyqtSlot()
     def filter_nicks(self):
-        for chatter in self.chatters.values():
-            chatter.set_visible(chatter.is_filtered(self.nickFilter.text().lower()))
+        self._nick_model.set_nick_filter(self.nickFilter.text())
 
     def update_user_count(self):
         count = len(self.chatters)
         self.nickFilter.setPlaceholderText(str(count) + " users... (type to filter)")
 
-        if self.nickFilter.text():
-            self.filter_nicks()
-
     @QtCore.pyqtSlot()
     def blink(self):
         if self.blinked:
@@ -213,42 +207,63 @@ class Channel(FormClass, BaseClass):
         else:
             QtGui.QDesktopServices.openUrl(url)
 
-    def print_announcement(self, text, color, size, scroll_forced=True):
-        # scroll if close to the last line of the log
-        scroll_current = self.chatArea.verticalScrollBar().value()
-        scroll_needed = scroll_forced or ((self.chatArea.verticalScrollBar().maximum() - scroll_current) < 20)
+    def _append_line(self, line, scroll_forced):
+        """
+        Queues a formatted line for the chat area. Queued lines are inserted
+        once control returns to the event loop, so a burst of messages only
+        relayouts and scrolls the chat once.
+        """
+        self._pending_lines.append(line)
+        self._pending_scroll = self._pending_scroll or scroll_forced
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
 
-        cursor = self.chatArea.textCursor()
-        cursor.movePosition(QtGui.QTextCursor.End)
-        self.chatArea.setTextCursor(cursor)
+    @QtCore.pyqtSlot()
+    def _flush_lines(self):
+        lines = self._pending_lines
+        if not lines:
+            return
+        scroll_forced = self._pending_scroll
+        self._pending_lines = []
+        self._pending_scroll = False
 
-        formatter = Formatters.FORMATTER_ANNOUNCEMENT
-        line = formatter.format(size=size, color=color, text=util.irc_escape(text, self.chat_widget.a_style))
-        self.chatArea.insertHtml(line)
+        # scroll if close to the last line of the log
+        scrollbar = self.chatArea.verticalScrollBar()
+        scroll_current = scrollbar.value()
+        scroll_needed = scroll_forced or ((scrollbar.maximum() - scroll_current) < 20)
+
+        self._scrollback.append(lines, reading_back=not scroll_needed)
 
         if scroll_needed:
-            self.chatArea.verticalScrollBar().setValue(self.chatArea.verticalScrollBar().maximum())
+            scrollbar.setValue(scrollbar.maximum())
         else:
-            self.chatArea.verticalScrollBar().setValue(scroll_current)
+            scrollbar.setValue(scroll_current)
 
-    def print_line(self, chname, text, scroll_forced=False, formatter=Formatters.FORMATTER_MESSAGE):
-        if self.lines > CHAT_TEXT_LIMIT:
-            cursor = self.chatArea.textCursor()
-            cursor.movePosition(QtGui.QTextCursor.Start)
-            cursor.movePosition(QtGui.QTextCursor.Down, QtGui.QTextCursor.KeepAnchor, CHAT_REMOVEBLOCK)
-            cursor.removeSelectedText()
-            self.lines = self.lines - CHAT_REMOVEBLOCK
+    @QtCore.pyqtSlot(int)
+    def _at_scroll(self, value):
+        # Bring back older lines once the user scrolls to the top
+        scrollbar = self.chatArea.verticalScrollBar()
+        if value != scrollbar.minimum() or scrollbar.maximum() == value:
+            return
+        if not self._scrollback.has_older():
+            return
+        height = scrollbar.maximum()
+        self._scrollback.load_older()
+        # Keep showing the lines that were at the top
+        scrollbar.setValue(value + scrollbar.maximum() - height)
+
+    def print_announcement(self, text, color, size, scroll_forced=True):
+        formatter = Formatters.FORMATTER_ANNOUNCEMENT
+        line = formatter.format(size=size, color=color, text=util.irc_escape(text, self.chat_widget.a_style))
+        self._append_line(line, scroll_forced)
 
+    def print_line(self, chname, text, scroll_forced=False, formatter=Formatters.FORMATTER_MESSAGE):
         chatter = self._chatterset.get(chname)
         if chatter is not None and chatter.player is not None:
             player = chatter.player
         else:
             player = IRCPlayer(chname)
 
-        displayName = chname
-        if player.clan is not None:
-            displayName = "<b>[%s]</b>%s" % (player.clan, chname)
-
         sender_is_not_me = chatter.name != self._me.login
 
         # Play a ping sound and flash the title under certain circumstances
@@ -260,29 +275,25 @@ class Channel(FormClass, BaseClass):
 
         avatar = None
         avatarTip = ""
-        if chatter is not None and chatter in self.chatters:
-            chatwidget = self.chatters[chatter]
-            color = chatwidget.foreground().color().name()
-            avatarTip = chatwidget.avatarTip or ""
+        item = self._chatter_model.item(chatter) if chatter in self.chatters else None
+        if item is not None:
+            color = item.color_in(self.name)
+            displayName = item.chat_name
+            avatarTip = item.avatar_tip or ""
             if chatter.player is not None:
                 avatar = chatter.player.avatar
                 if avatar is not None:
                     avatar = avatar["url"]
         else:
             # Fallback and ask the client. We have no Idea who this is.
-            color = self.chat_widget.client.player_colors.getUserColor(player.id)
+            color = self.chat_widget.client.player_colors.getUserColor(player.id, chname)
+            displayName = chname
+            if player.clan is not None:
+                displayName = "<b>[%s]</b>%s" % (player.clan, chname)
 
         if mentioned and sender_is_not_me:
             color = self.chat_widget.client.player_colors.getColor("you")
 
-        # scroll if close to the last line of the log
-        scroll_current = self.chatArea.verticalScrollBar().value()
-        scroll_needed = scroll_forced or ((self.chatArea.verticalScrollBar().maximum() - scroll_current) < 20)
-
-        cursor = self.chatArea.textCursor()
-        cursor.movePosition(QtGui.QTextCursor.End)
-        self.chatArea.setTextCursor(cursor)
-
         chatter_has_avatar = False
         line = None
         if avatar is not None:
@@ -296,13 +307,7 @@ class Channel(FormClass, BaseClass):
 
         line = formatter.format(time=self.timestamp(), avatar=avatar, avatarTip=avatarTip, name=displayName,
                                 color=color, width=self.max_chatter_width, text=util.irc_escape(text, self.chat_widget.a_style))
-        self.chatArea.insertHtml(line)
-        self.lines += 1
-
-        if scroll_needed:
-            self.chatArea.verticalScrollBar().setValue(self.chatArea.verticalScrollBar().maximum())
-        else:
-            self.chatArea.verticalScrollBar().setValue(scroll_current)
+        self._append_line(line, scroll_forced)
 
     def _add_avatar_resource_to_chat_area(self, avatar, pic):
         doc = self.chatArea.document()
@@ -348,28 +353,15 @@ class Channel(FormClass, BaseClass):
         except AttributeError:
             _id = -1
 
-        color = self.chat_widget.client.player_colors.getUserColor(_id)
+        color = self.chat_widget.client.player_colors.getUserColor(_id, chname)
 
         # Play a ping sound
         if self.private and chname != self.chat_widget.client.login:
             self.ping_window()
 
-        # scroll if close to the last line of the log
-        scroll_current = self.chatArea.verticalScrollBar().value()
-        scroll_needed = scroll_forced or ((self.chatArea.verticalScrollBar().maximum() - scroll_current) < 20)
-
-        cursor = self.chatArea.textCursor()
-        cursor.movePosition(QtGui.QTextCursor.End)
-        self.chatArea.setTextCursor(cursor)
-
         formatter = Formatters.FORMATTER_RAW
         line = formatter.format(time=self.timestamp(), name=chname, color=color, width=self.max_chatter_width, text=text)
-        self.chatArea.insertHtml(line)
-
-        if scroll_needed:
-            self.chatArea.verticalScrollBar().setValue(self.chatArea.verticalScrollBar().maximum())
-        else:
-            self.chatArea.verticalScrollBar().setValue(scroll_current)
+        self._append_line(line, scroll_forced)
 
     def timestamp(self):
         """ returns a fresh timestamp string once every minute, and an empty string otherwise """
@@ -384,53 +376,38 @@ class Channel(FormClass, BaseClass):
         timestamp = time.strftime("%H:%M")
         return self.last_timestamp != timestamp
 
-    @QtCore.pyqtSlot(QtWidgets.QTableWidgetItem)
-    def nick_double_clicked(self, item):
-        chatter = self.nickList.item(item.row(), Chatter.SORT_COLUMN)  # Look up the associated chatter object
-        chatter.double_clicked(item)
-
-    @QtCore.pyqtSlot(QtWidgets.QTableWidgetItem)
-    def nick_pressed(self, item):
-        if QtWidgets.QApplication.mouseButtons() == QtCore.Qt.RightButton:
-            # Look up the associated chatter object
-            chatter = self.nickList.item(item.row(), Chatter.SORT_COLUMN)
-            chatter.pressed(item)
-
-    def update_chatters(self):
-        """
-        Triggers all chatters to update their status. Called when toggling map icon display in settings
-        """
-        for _, chatter in self.chatters.items():
-            chatter.update()
-
-        self.resize_map_column()
-
     def resize_map_column(self):
         if util.settings.value("chat/chatmaps", False):
-            self.nickList.horizontalHeader().resizeSection(Chatter.MAP_COLUMN, Formatters.NICKLIST_COLUMNS['MAP'])
+            self.nickList.horizontalHeader().resizeSection(ChatterModel.MAP_COLUMN, Formatters.NICKLIST_COLUMNS['MAP'])
         else:
-            self.nickList.horizontalHeader().resizeSection(Chatter.MAP_COLUMN, 0)
+            self.nickList.horizontalHeader().resizeSection(ChatterModel.MAP_COLUMN, 0)
 
     def add_chatter(self, chatter, join=False):
         """
         Adds an user to this chat channel, and assigns an appropriate icon depending on friendship and FAF player status
         """
         if chatter not in self.chatters:
-            item = Chatter(self.nickList, chatter, self,
-                           self.chat_widget, self._me)
-            self.chatters[chatter] = item
-
-        self.chatters[chatter].update()
+            self.chatters.add(chatter)
+            self._chatter_model.add_chatter(chatter, self.name)
 
         self.update_user_count()
 
         if join and self.chat_widget.client.joinsparts:
             self.print_action(chatter.name, "joined the channel.", server_action=True)
 
+    def add_chatters(self, chatters):
+        """
+        Adds all users listed when joining the channel at once.
+        """
+        new = [c for c in chatters if c not in self.chatters]
+        self.chatters.update(new)
+        self._chatter_model.add_chatters(new, self.name)
+        self.update_user_count()
+
     def remove_chatter(self, chatter, server_action=None):
         if chatter in self.chatters:
-            self.nickList.removeRow(self.chatters[chatter].row())
-            del self.chatters[chatter]
+            self.chatters.remove(chatter)
+            self._chatter_model.remove_chatter(chatter, self.name)
 
             if server_action and (self.chat_widget.client.joinsparts or self.private):
                 self.print_action(chatter.name, server_action, server_action=True)
@@ -438,15 +415,6 @@ class Channel(FormClass, BaseClass):
 
         self.update_user_count()
 
-    def verify_sort_order(self, chatter):
-        row = chatter.row()
-        next_chatter = self.nickList.item(row + 1, Chatter.SORT_COLUMN)
-        prev_chatter = self.nickList.item(row - 1, Chatter.SORT_COLUMN)
-
-        if (next_chatter is not None and chatter > next_chatter or
-           prev_chatter is not None and chatter < prev_chatter):
-            self.sort_call.schedule_call()
-
     def set_announce_text(self, text):
         self.announceLine.clear()
         self.announceLine.setText("<style>a{color:cornflowerblue}</style><b><font color=white>" + util.irc_escape(text) + "</font></b>")
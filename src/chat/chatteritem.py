@@ -0,0 +1,184 @@
+from PyQt5 import QtWidgets, QtCore, QtGui
+from PyQt5.QtCore import QUrl
+import time
+
+from fa.replay import replay
+from config import Settings
+
+from model.game import GameState
+from client.aliasviewer import AliasWindow
+from chat._avatarWidget import AvatarWidget
+from chat.chattermodel import ChatterModel
+
+
+class ChatterItemDelegate(QtWidgets.QStyledItemDelegate):
+    """
+    Paints the nick list. Rank, avatar, status and map columns are a single
+    centered icon, the name column is left to the default delegate.
+    """
+    def paint(self, painter, option, index):
+        if index.column() == ChatterModel.SORT_COLUMN:
+            QtWidgets.QStyledItemDelegate.paint(self, painter, option, index)
+            return
+
+        self.initStyleOption(option, index)
+        icon = option.icon
+        option.icon = QtGui.QIcon()
+        option.text = ""
+        widget = option.widget
+        style = widget.style() if widget is not None else QtWidgets.QApplication.style()
+        style.drawControl(QtWidgets.QStyle.CE_ItemViewItem, option, painter, widget)
+        if not icon.isNull():
+            icon.paint(painter, option.rect, QtCore.Qt.AlignCenter)
+
+
+class ChatterView(QtCore.QObject):
+    """
+    Shows the nick list of a channel in a table view. Forwards interaction
+    with the view - double clicks and the context menu of a chatter.
+    """
+    def __init__(self, channel, model, view, delegate, chat_widget, me):
+        QtCore.QObject.__init__(self)
+        self._channel = channel
+        self._model = model
+        self._view = view
+        self._delegate = delegate
+        self._chat_widget = chat_widget
+        self._me = me
+        self._aliases = AliasWindow(view)
+
+        self._view.setModel(self._model)
+        self._view.setItemDelegate(self._delegate)
+        self._view.doubleClicked.connect(self._double_clicked)
+        self._view.pressed.connect(self._pressed)
+
+    def _double_clicked(self, index):
+        item = self._model.item(index)
+        if item is None:
+            return
+        # filter yourself
+        if self._me.login is not None and self._me.login == item.user.name:
+            return
+        # Chatter name clicked
+        if index.column() == ChatterModel.SORT_COLUMN:
+            self._chat_widget.open_query(item.user, activate=True)  # open and activate query window
+        elif index.column() == ChatterModel.STATUS_COLUMN:
+            self._interact_with_game(item)
+
+    def _pressed(self, index):
+        if QtWidgets.QApplication.mouseButtons() != QtCore.Qt.RightButton:
+            return
+        item = self._model.item(index)
+        if item is not None:
+            self._show_menu(item)
+
+    def _interact_with_game(self, item):
+        game = item.game
+        if game is None or game.closed():
+            return
+
+        url = game.url(item.player.id)
+        if game.state == GameState.OPEN:
+            self._chat_widget.client.joinGameFromURL(url)
+        elif game.state == GameState.PLAYING:
+            replay(url)
+
+    def _show_menu(self, item):
+        menu = QtWidgets.QMenu(self._view)
+        client = self._chat_widget.client
+
+        def menu_add(action_str, action_connect, separator=False):
+            if separator:
+                menu.addSeparator()
+            action = QtWidgets.QAction(action_str, menu)
+            action.triggered.connect(action_connect)  # Triggers
+            menu.addAction(action)
+
+        player = item.player
+        game = item.game
+        name = item.user.name
+        _id = -1 if player is None else player.id
+
+        if player is None or self._me.player is None:
+            is_me = False
+        else:
+            is_me = player.id == self._me.player.id
+
+        if is_me:  # only for us. Either way, it will display our avatar, not anyone avatar.
+            menu_add("Select Avatar", lambda: self._select_avatar(name))
+
+        # power menu
+        if client.power > 1:
+            # admin and mod menus
+            menu_add("Assign avatar", lambda: self._add_avatar(name), True)
+
+            if client.power == 2:
+
+                def send_the_orcs():
+                    route = Settings.get('mordor/host')
+                    if _id != -1:
+                        QtGui.QDesktopServices.openUrl(QUrl("{}/users/{}".format(route, _id)))
+                    else:
+                        QtGui.QDesktopServices.openUrl(QUrl("{}/users/{}".format(route, name)))
+
+                menu_add("Send the Orcs", send_the_orcs, True)
+                menu_add("Close Game", lambda: client.closeFA(name))
+                menu_add("Close FAF Client", lambda: client.closeLobby(name))
+
+        menu_add("View Aliases", lambda: self._view_aliases(item), True)
+        if player is not None:  # not for irc user
+            if int(player.ladder_estimate()) != 0:  # not for 'never played ladder'
+                menu_add("View in Leaderboards", lambda: client.viewUserLeaderboards(player))
+
+        # Don't allow self to be invited to a game, or join one
+        if game is not None and not is_me:
+            if game.state == GameState.OPEN:
+                menu_add("Join hosted Game", lambda: self._interact_with_game(item), True)
+            elif game.state == GameState.PLAYING:
+                time_running = time.time() - game.launched_at
+                if game.has_live_replay:
+                    time_format = '%M:%S' if time_running < 60 * 60 else '%H:%M:%S'
+                    duration_str = time.strftime(time_format, time.gmtime(time_running))
+                    action_str = "View Live Replay (runs " + duration_str + ")"
+                else:
+                    wait_str = time.strftime('%M:%S', time.gmtime(game.LIVE_REPLAY_DELAY_SECS - time_running))
+                    action_str = "WAIT " + wait_str + " to view Live Replay"
+                menu_add(action_str, lambda: self._interact_with_game(item), True)
+
+        if player is not None:  # not for irc user
+            menu_add("View Replays in Vault", lambda: client.searchUserReplays(name), True)
+
+        # Friends and Foes Lists
+        def player_or_irc_action(f, irc_f):
+            if player is not None:
+                return lambda: f(_id)
+            else:
+                return lambda: irc_f(name)
+
+        me = self._me
+        if is_me:  # We're ourselves
+            pass
+        elif me.isFriend(_id, name):  # We're a friend
+            menu_add("Remove friend", player_or_irc_action(client.remFriend, me.remIrcFriend), True)
+        elif me.isFoe(_id, name):  # We're a foe
+            menu_add("Remove foe", player_or_irc_action(client.remFoe, me.remIrcFoe), True)
+        else:  # We're neither
+            menu_add("Add friend", player_or_irc_action(client.addFriend, me.addIrcFriend), True)
+            # FIXME - chatwidget sets mod status very inconsistently
+            if item.mod_elevation(self._channel) is None:  # so disable foeing mods for now
+                menu_add("Add foe", player_or_irc_action(client.addFoe, me.addIrcFoe))
+
+        # Finally: Show the popup
+        menu.popup(QtGui.QCursor.pos())
+
+    def _view_aliases(self, item):
+        player_id = None if item.player is None else item.player.id
+        self._aliases.view_aliases(item.user.name, player_id)
+
+    def _select_avatar(self, name):
+        avatarSelection = AvatarWidget(self._chat_widget.client, name, personal=True)
+        avatarSelection.exec_()
+
+    def _add_avatar(self, name):
+        avatarSelection = AvatarWidget(self._chat_widget.client, name)
+        avatarSelection.exec_()
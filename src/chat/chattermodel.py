@@ -0,0 +1,747 @@
+from PyQt5 import QtGui
+from PyQt5.QtCore import QObject, pyqtSignal, Qt, QAbstractTableModel, \
+    QModelIndex, QSortFilterProxyModel
+from urllib import parse
+
+from fa import maps
+import util
+
+from model.game import GameState
+from chat.gameinfo import SensitiveMapInfoChecker
+from downloadManager import PreviewDownloadRequest
+
+"""
+Nick lists of all channels show rows of one ChatterModel. It holds a
+ChatterModelItem per IRC user in any channel. Each channel's list is a
+ChatterSortFilterModel that picks the users in the channel and sorts them.
+"""
+
+
+class ChatterModelItem(QObject):
+    """
+    Everything the nick lists show about an IRC user, kept up to date as the
+    user, their player and the player's game change. Icons are kept as theme
+    paths, the model turns them into icons once they are shown.
+    """
+    updated = pyqtSignal(object)
+
+    RANK_SELF = -2
+    RANK_ELEVATION = 0
+    RANK_FRIEND = 1
+    RANK_USER = 2
+    RANK_NONPLAYER = 3
+    RANK_FOE = 4
+
+    # Player and game fields that each part of the chatter displays
+    NAME_FIELDS = frozenset(["clan"])
+    RANK_FIELDS = frozenset(["global_rating", "ladder_rating",
+                             "number_of_games", "league"])
+    COUNTRY_FIELDS = frozenset(["country"])
+    AVATAR_FIELDS = frozenset(["avatar"])
+    GAME_INFO_FIELDS = frozenset(["state", "featured_mod", "teams"])
+    STATUS_TOOLTIP_FIELDS = frozenset(["host", "title", "mapname",
+                                       "num_players", "max_players",
+                                       "password_protected"])
+    STATUS_ICON_FIELDS = frozenset(["host"])
+    MAP_FIELDS = frozenset(["mapname"])
+
+    def __init__(self, user, me, player_colors, map_preview_dler,
+                 avatar_dler, game_info_hider):
+        QObject.__init__(self)
+
+        self.user = user
+        self.channels = set()
+
+        self._me = me
+        self._player_colors = player_colors
+        self._map_preview_dler = map_preview_dler
+        self._avatar_dler = avatar_dler
+        self._game_info_hider = game_info_hider
+        self._map_dl_request = None
+
+        self.name_text = user.name
+        self.chat_name = user.name
+        self.sort_name = user.name.lower()
+        self.rank = self.RANK_NONPLAYER
+        self.color = None
+        self.country_icon = None
+        self.country_tip = ""
+        self.rank_icon = None
+        self.rank_tip = ""
+        self.avatar_url = None
+        self.avatar_tip = ""
+        self.status_icon = None
+        self.status_tip = ""
+        self.map_icon = None
+        self.map_tip = ""
+
+        # Channel -> sort rank and channel -> name color
+        self._sort_ranks = {}
+        self._channel_colors = {}
+        self.friends_on_top = False
+
+        self._player = None
+        self._game = None
+        # Setting the player fills in the rest
+        self.user.updated.connect(self._at_user_updated)
+        self.user.newPlayer.connect(self._set_player)
+        self.player = self.user.player
+
+    def detach(self):
+        """
+        Stops following the user. Called once the item isn't shown anymore.
+        """
+        self.player = None
+        self.user.updated.disconnect(self._at_user_updated)
+        self.user.newPlayer.disconnect(self._set_player)
+        if self._map_dl_request is not None:
+            self._map_dl_request.done.disconnect(self._on_map_downloaded)
+            self._map_dl_request = None
+
+    @property
+    def player(self):
+        return self._player
+
+    @player.setter
+    def player(self, value):
+        if self._player is not None:
+            self.game = None
+            self._player.updated.disconnect(self._at_player_updated)
+            self._player.newCurrentGame.disconnect(self._set_game)
+
+        self._player = value
+        self._update_player()
+
+        if self._player is not None:
+            self._player.updated.connect(self._at_player_updated)
+            self._player.newCurrentGame.connect(self._set_game)
+            self.game = self._player.currentGame
+
+    def _set_player(self, user, player):
+        self.player = player
+        self._changed()
+
+    @property
+    def game(self):
+        return self._game
+
+    @game.setter
+    def game(self, value):
+        if self._game is not None:
+            self._game.gameUpdated.disconnect(self._at_game_updated)
+            self._game.liveReplayAvailable.disconnect(self._at_live_replay)
+
+        self._game = value
+        self.update_game()
+
+        if self._game is not None:
+            self._game.gameUpdated.connect(self._at_game_updated)
+            self._game.liveReplayAvailable.connect(self._at_live_replay)
+
+    def _set_game(self, player, game):
+        self.game = game
+        self._changed()
+
+    def _changed(self):
+        self.updated.emit(self)
+
+    def _id_name(self):
+        _id = -1 if self._player is None else self._player.id
+        return _id, self.user.name
+
+    def is_filtered(self, _filter):
+        clan = None if self._player is None else self._player.clan
+        clan = clan if clan is not None else ""
+        return _filter in clan.lower() or _filter in self.sort_name
+
+    def mod_elevation(self, channel):
+        if not self.user.is_mod(channel):
+            return None
+        return self.user.elevation[channel]
+
+    def sort_rank(self, channel):
+        """
+        Rank to sort the nick list of a channel by - ourselves first, then
+        mods, friends and so on. Users of the same rank are sorted by
+        sort_name.
+        """
+        try:
+            return self._sort_ranks[channel]
+        except KeyError:
+            pass
+        rank = self.rank
+        if rank != self.RANK_SELF and self.user.is_mod(channel):
+            rank = self.RANK_ELEVATION
+        elif rank == self.RANK_FRIEND and self.friends_on_top:
+            rank = self.RANK_FRIEND - 2
+        self._sort_ranks[channel] = rank
+        return rank
+
+    def color_in(self, channel):
+        """
+        Color of the user's name in a channel.
+        """
+        try:
+            return self._channel_colors[channel]
+        except KeyError:
+            pass
+        elevation = self.mod_elevation(channel)
+        if elevation is None:
+            color = self.color
+        else:
+            _id, name = self._id_name()
+            color = self._player_colors.getModColor(elevation, _id, name)
+        self._channel_colors[channel] = color
+        return color
+
+    def update_relation(self):
+        self._update_rank()
+        self._update_color()
+
+    def set_friends_on_top(self, on_top):
+        self.friends_on_top = on_top
+        self._sort_ranks.clear()
+
+    def _at_user_updated(self, user, old):
+        self._user_changed()
+        self._changed()
+
+    def _user_changed(self):
+        self.sort_name = self.user.name.lower()
+        self._set_name_text()
+        self.update_relation()
+
+    def _update_rank(self):
+        me = self._me
+        _id, name = self._id_name()
+        if me.login is not None and name == me.login:
+            self.rank = self.RANK_SELF
+        elif me.isFriend(_id, name):
+            self.rank = self.RANK_FRIEND
+        elif me.isFoe(_id, name):
+            self.rank = self.RANK_FOE
+        elif self._player is not None:
+            self.rank = self.RANK_USER
+        else:
+            self.rank = self.RANK_NONPLAYER
+        self._sort_ranks.clear()
+
+    def _update_color(self):
+        _id, name = self._id_name()
+        self.color = self._player_colors.getUserColor(_id, name)
+        self._channel_colors.clear()
+
+    def _set_name_text(self):
+        if self._player is not None and self._player.clan is not None:
+            self.name_text = "[{}]{}".format(self._player.clan, self.user.name)
+            self.chat_name = "<b>[{}]</b>{}".format(self._player.clan, self.user.name)
+        else:
+            self.name_text = self.user.name
+            self.chat_name = self.user.name
+
+    def _update_player(self):
+        self._set_name_text()
+        self.update_relation()
+        self._update_player_rank()
+        self._update_country()
+        self.update_avatar()
+
+    def _at_player_updated(self, player, old, changed):
+        shown = False
+        if not changed.isdisjoint(self.NAME_FIELDS):
+            self._set_name_text()
+            shown = True
+        if not changed.isdisjoint(self.RANK_FIELDS):
+            self._update_player_rank()
+            shown = True
+        if not changed.isdisjoint(self.COUNTRY_FIELDS):
+            self._update_country()
+            shown = True
+        if not changed.isdisjoint(self.AVATAR_FIELDS):
+            self.update_avatar()
+            shown = True
+        if shown:
+            self._changed()
+
+    def _update_country(self):
+        player = self._player
+        if player is None:
+            self.country_icon = None
+            self.country_tip = ""
+            return
+        # server sends '' for no ip2country-resolution
+        if player.country is None or player.country == '':
+            country = '__'
+        else:
+            country = player.country
+        self.country_icon = "chat/countries/{}.png".format(country.lower())
+        self.country_tip = country
+
+    def _update_player_rank(self):
+        player = self._player
+        if player is None:
+            self.rank_icon = "chat/rank/civilian.png"
+            self.rank_tip = "IRC User"
+            return
+        # chr(0xB1) = +-
+        formatting = ("Global Rating: {} ({} Games) [{}\xb1{}]\n"
+                      "Ladder Rating: {} [{}\xb1{}]")
+        tooltip_str = formatting.format((int(player.rating_estimate())),
+                                        player.number_of_games,
+                                        int(player.rating_mean),
+                                        int(player.rating_deviation),
+                                        int(player.ladder_estimate()),
+                                        int(player.ladder_rating_mean),
+                                        int(player.ladder_rating_deviation))
+        league = player.league
+        if league is not None:
+            icon_str = league["league"]
+            tooltip_str = "Division : {}\n{}".format(league["division"],
+                                                     tooltip_str)
+        else:
+            icon_str = "newplayer"
+        self.rank_icon = "chat/rank/{}.png".format(icon_str)
+        self.rank_tip = tooltip_str
+
+    def update_avatar(self):
+        avatar = None if self._player is None else self._player.avatar
+        if avatar is None:
+            self.avatar_url = None
+            self.avatar_tip = ""
+            return
+
+        self.avatar_tip = avatar["tooltip"]
+        url = parse.unquote(avatar["url"])
+        if util.respix(url):
+            self.avatar_url = url
+            return
+        # Shown once the download finishes and calls us again
+        self.avatar_url = None
+        if util.addcurDownloadAvatar(url, self):
+            self._avatar_dler.download_avatar(url)
+
+    def avatar_downloaded(self):
+        self.update_avatar()
+        self._changed()
+
+    def update_game(self):
+        self._update_status_tooltip()
+        self._update_status_icon()
+        self._update_map()
+
+    def _at_game_updated(self, game, old, changed):
+        if not changed.isdisjoint(self.GAME_INFO_FIELDS):
+            self.update_game()
+        else:
+            if not changed.isdisjoint(self.STATUS_TOOLTIP_FIELDS):
+                self._update_status_tooltip()
+            if not changed.isdisjoint(self.STATUS_ICON_FIELDS):
+                self._update_status_icon()
+            if not changed.isdisjoint(self.MAP_FIELDS):
+                self._update_map()
+        self._changed()
+
+    def _at_live_replay(self, game):
+        self.update_game()
+        self._changed()
+
+    def _update_status_tooltip(self):
+        # Status tooltip handling
+        game = self._game
+        should_hide_info = self._game_info_hider.has_sensitive_data(game)
+        if game is not None and not game.closed():
+            if should_hide_info:
+                game_map = "<i>[delayed reveal]</i>"
+                game_title = "<i>[delayed reveal]</i>"
+            else:
+                game_map = game.mapdisplayname
+                game_title = game.title
+            private_str = " (private)" if game.password_protected else ""
+            delay_str = ""
+            if game.state == GameState.OPEN:
+                if game.host == self.user.name:
+                    head_str = "Hosting{private} game</b>"
+                else:
+                    head_str = "In{private} Lobby</b> (host {host})"
+            elif game.state == GameState.PLAYING:
+                head_str = "Playing</b>{delay}"
+                if not game.has_live_replay:
+                    delay_str = " - LIVE DELAY (5 Min)"
+            else:  # game.state == something else
+                head_str = "Playing maybe ...</b>"
+            formatting = "<b>{}<br/>title: {}<br/>mod: {}<br/>map: {}<br/>players: {} / {}<br/>id: {}"
+            game_str = formatting.format(head_str.format(private=private_str, delay=delay_str, host=game.host),
+                                         game_title, game.featured_mod, game_map,
+                                         game.num_players, game.max_players, game.uid)
+        else:  # game is None or closed
+            game_str = "Idle"
+
+        self.status_tip = game_str
+
+    def _update_status_icon(self):
+        # Status icon handling
+        game = self._game
+        if game is not None and not game.closed():
+            if game.state == GameState.OPEN:
+                if game.host == self.user.name:
+                    icon_str = "host"
+                else:
+                    icon_str = "lobby"
+            elif game.state == GameState.PLAYING:
+                if game.has_live_replay:
+                    icon_str = "playing"
+                else:
+                    icon_str = "playing5"
+            else:  # game.state == something else
+                icon_str = "unknown"
+        else:  # game is None or closed
+            icon_str = "none"
+
+        self.status_icon = "chat/status/%s.png" % icon_str
+
+    def _update_map(self):
+        # Map icon handling - if we're in game, show the map if toggled on
+        game = self._game
+        if game is None or game.closed() or not util.settings.value("chat/chatmaps", False):
+            self.map_icon = None
+            self.map_tip = ""
+            return
+
+        if self._game_info_hider.has_sensitive_data(game):
+            self.map_icon = util.THEME.icon("chat/status/unknown.png")
+            self.map_tip = "<i>[delayed reveal]</i>"
+            return
+
+        mapname = game.mapname
+        icon = maps.preview(mapname, generate=False)
+        if not icon:
+            if self._map_dl_request is None:
+                self._map_dl_request = PreviewDownloadRequest()
+                self._map_dl_request.done.connect(self._on_map_downloaded)
+            self._map_preview_dler.download_preview(mapname, self._map_dl_request)
+        else:
+            self.map_icon = icon
+        self.map_tip = game.mapdisplayname
+
+    def _on_map_downloaded(self, mapname, result):
+        if self._game is None or self._game.mapname != mapname:
+            return
+        path, is_local = result
+        icon = maps.preview(mapname, generate=False)
+        if icon is None:
+            icon = util.THEME.icon(path, is_local)
+        self.map_icon = icon
+        self._changed()
+
+
+class ChatterModel(QAbstractTableModel):
+    """
+    Table of the IRC users in any of the channels we're in, one row each.
+    Channels a user is in are kept by their item. Rows don't have any order,
+    views sort them by themselves.
+    """
+    RANK_COLUMN = 0
+    AVATAR_COLUMN = 1
+    SORT_COLUMN = 2
+    STATUS_COLUMN = 3
+    MAP_COLUMN = 4
+    COLUMN_COUNT = 5
+
+    def __init__(self, me, player_colors, map_preview_dler, avatar_dler):
+        QAbstractTableModel.__init__(self)
+        self._me = me
+        self._player_colors = player_colors
+        self._map_preview_dler = map_preview_dler
+        self._avatar_dler = avatar_dler
+        self._game_info_hider = SensitiveMapInfoChecker(me)
+        self._friends_on_top = False
+
+        self._items = {}     # IrcUser -> item
+        self._itemlist = []  # For queries
+        self._itemrows = {}  # Item -> row in _itemlist
+        self._icons = {}     # Theme path -> icon
+
+        self._me.relationsUpdated.connect(self._at_relations_updated)
+        self._me.ircRelationsUpdated.connect(self._at_irc_relations_updated)
+
+    def rowCount(self, parent):
+        if parent.isValid():
+            return 0
+        return len(self._itemlist)
+
+    def columnCount(self, parent):
+        if parent.isValid():
+            return 0
+        return self.COLUMN_COUNT
+
+    def data(self, index, role):
+        if not index.isValid() or index.row() >= len(self._itemlist):
+            return None
+        item = self._itemlist[index.row()]
+        column = index.column()
+
+        if role == Qt.DisplayRole:
+            if column == self.SORT_COLUMN:
+                return item.name_text
+            return None
+        if role == Qt.DecorationRole:
+            return self._decoration(item, column)
+        if role == Qt.ToolTipRole:
+            return self._tooltip(item, column)
+        if role == Qt.ForegroundRole:
+            if column == self.SORT_COLUMN and item.color is not None:
+                return QtGui.QColor(item.color)
+        return None
+
+    def _decoration(self, item, column):
+        if column == self.RANK_COLUMN:
+            return self._icon(item.rank_icon)
+        if column == self.AVATAR_COLUMN:
+            if item.avatar_url is None:
+                return None
+            pix = util.respix(item.avatar_url)
+            return None if not pix else QtGui.QIcon(pix)
+        if column == self.SORT_COLUMN:
+            return self._icon(item.country_icon)
+        if column == self.STATUS_COLUMN:
+            return self._icon(item.status_icon)
+        if column == self.MAP_COLUMN:
+            return item.map_icon
+        return None
+
+    def _tooltip(self, item, column):
+        tips = {
+            self.RANK_COLUMN: item.rank_tip,
+            self.AVATAR_COLUMN: item.avatar_tip,
+            self.SORT_COLUMN: item.country_tip,
+            self.STATUS_COLUMN: item.status_tip,
+            self.MAP_COLUMN: item.map_tip,
+        }
+        return tips.get(column) or None
+
+    def _icon(self, path):
+        if path is None:
+            return None
+        try:
+            return self._icons[path]
+        except KeyError:
+            icon = util.THEME.icon(path)
+            self._icons[path] = icon
+            return icon
+
+    def item(self, user):
+        return self._items.get(user)
+
+    def item_at(self, row):
+        return self._itemlist[row]
+
+    @property
+    def friends_on_top(self):
+        return self._friends_on_top
+
+    @friends_on_top.setter
+    def friends_on_top(self, value):
+        self._friends_on_top = value
+        for item in self._itemlist:
+            item.set_friends_on_top(value)
+
+    def add_chatter(self, user, channel):
+        item = self._items.get(user)
+        if item is None:
+            item = self._new_item(user)
+            item.channels.add(channel)
+            row = len(self._itemlist)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self._insert_item(item)
+            self.endInsertRows()
+        elif channel not in item.channels:
+            item.channels.add(channel)
+            self._emit_item_changed(item)
+
+    def add_chatters(self, users, channel):
+        """
+        Adds many users to a channel at once, e.g. all users listed when we
+        join it. New rows are inserted in one go and users already known
+        are reported changed with a single signal, so that views filter and
+        sort once.
+        """
+        new_items = []
+        changed_rows = []
+        for user in users:
+            item = self._items.get(user)
+            if item is None:
+                item = self._new_item(user)
+                item.channels.add(channel)
+                new_items.append(item)
+            elif channel not in item.channels:
+                item.channels.add(channel)
+                changed_rows.append(self._itemrows[item])
+
+        if changed_rows:
+            self.dataChanged.emit(self.index(min(changed_rows), 0),
+                                  self.index(max(changed_rows),
+                                             self.COLUMN_COUNT - 1))
+        if new_items:
+            first = len(self._itemlist)
+            self.beginInsertRows(QModelIndex(), first,
+                                 first + len(new_items) - 1)
+            for item in new_items:
+                self._insert_item(item)
+            self.endInsertRows()
+
+    def remove_chatter(self, user, channel):
+        item = self._items.get(user)
+        if item is None or channel not in item.channels:
+            return
+        item.channels.discard(channel)
+        if item.channels:
+            self._emit_item_changed(item)
+        else:
+            self._remove_item(item)
+
+    def remove_user(self, user):
+        item = self._items.get(user)
+        if item is not None:
+            self._remove_item(item)
+
+    def remove_channel(self, channel):
+        gone = []
+        for item in self._itemlist:
+            if channel not in item.channels:
+                continue
+            item.channels.discard(channel)
+            if item.channels:
+                self._emit_item_changed(item)
+            else:
+                gone.append(item)
+        self._remove_items(gone)
+
+    def update_games(self):
+        """
+        Refreshes game info of all users, e.g. after map icons were toggled.
+        """
+        for item in self._itemlist:
+            item.update_game()
+        self._emit_all_changed()
+
+    def _new_item(self, user):
+        item = ChatterModelItem(user, self._me, self._player_colors,
+                                self._map_preview_dler, self._avatar_dler,
+                                self._game_info_hider)
+        item.set_friends_on_top(self._friends_on_top)
+        return item
+
+    def _insert_item(self, item):
+        item.updated.connect(self._emit_item_changed)
+        self._items[item.user] = item
+        self._itemrows[item] = len(self._itemlist)
+        self._itemlist.append(item)
+
+    def _remove_item(self, item):
+        self._remove_items([item])
+
+    def _remove_items(self, items):
+        if not items:
+            return
+        rows = []
+        for item in items:
+            del self._items[item.user]
+            item.updated.disconnect(self._emit_item_changed)
+            item.detach()
+            rows.append(self._itemrows.pop(item))
+
+        # Remove the items' own rows, so persistent indexes, selections and
+        # the current index of views keep pointing at the same users. Runs
+        # of adjacent rows go at once, from the bottom up so that the rows
+        # of the next run stay the same.
+        rows.sort(reverse=True)
+        last = first = rows[0]
+        for row in rows[1:] + [None]:
+            if row == first - 1:
+                first = row
+                continue
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self._itemlist[first:last + 1]
+            self.endRemoveRows()
+            last = first = row
+        self._renumber_rows(rows[-1])
+
+    def _renumber_rows(self, first):
+        itemlist = self._itemlist
+        itemrows = self._itemrows
+        for row in range(first, len(itemlist)):
+            itemrows[itemlist[row]] = row
+
+    def _emit_item_changed(self, item):
+        self._emit_row_changed(self._itemrows[item])
+
+    def _emit_row_changed(self, row):
+        self.dataChanged.emit(self.index(row, 0),
+                              self.index(row, self.COLUMN_COUNT - 1))
+
+    def _emit_all_changed(self):
+        if not self._itemlist:
+            return
+        self.dataChanged.emit(self.index(0, 0),
+                              self.index(len(self._itemlist) - 1,
+                                         self.COLUMN_COUNT - 1))
+
+    def _at_relations_updated(self, players):
+        for item in self._itemlist:
+            if item.player is not None and item.player.id in players:
+                item.update_relation()
+                self._emit_item_changed(item)
+
+    def _at_irc_relations_updated(self, users):
+        for item in self._itemlist:
+            if item.user.name in users:
+                item.update_relation()
+                self._emit_item_changed(item)
+
+
+class ChatterSortFilterModel(QSortFilterProxyModel):
+    """
+    Nick list of a single channel - the users in it, ordered by their sort
+    keys and filtered by the nick filter.
+    """
+    def __init__(self, model, channel):
+        QSortFilterProxyModel.__init__(self)
+        self._channel = channel
+        self._nick_filter = ""
+        self.setSourceModel(model)
+        self.setDynamicSortFilter(True)
+        self.sort(ChatterModel.SORT_COLUMN)
+
+    def item(self, index):
+        source = self.mapToSource(index)
+        if not source.isValid():
+            return None
+        return self.sourceModel().item_at(source.row())
+
+    def set_nick_filter(self, text):
+        self._nick_filter = text.lower()
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, row, parent):
+        item = self.sourceModel().item_at(row)
+        if self._channel not in item.channels:
+            return False
+        return not self._nick_filter or item.is_filtered(self._nick_filter)
+
+    def lessThan(self, leftIndex, rightIndex):
+        source = self.sourceModel()
+        left = source.item_at(leftIndex.row())
+        right = source.item_at(rightIndex.row())
+        left_rank = left.sort_rank(self._channel)
+        right_rank = right.sort_rank(self._channel)
+        if left_rank != right_rank:
+            return left_rank < right_rank
+        return left.sort_name < right.sort_name
+
+    def data(self, index, role=Qt.DisplayRole):
+        # Mods have their own name colors in channels they moderate
+        if role == Qt.ForegroundRole and index.column() == ChatterModel.SORT_COLUMN:
+            item = self.item(index)
+            if item is not None and item.mod_elevation(self._channel) is not None:
+                return QtGui.QColor(item.color_in(self._channel))
+        return QSortFilterProxyModel.data(self, index, role)
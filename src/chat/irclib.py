@@ -158,6 +158,7 @@ class IRC:
         self.fn_to_add_timeout = fn_to_add_timeout
         self.connections = []
         self.handlers = {}
+        self._handler_chains = {}
         self.delayed_commands = []  # list of tuples in the format (time, function, arguments)
 
         self.add_global_handler("ping", _ping_ponger, -42)
@@ -252,10 +253,16 @@ class IRC:
         The handler functions are called in priority order (lowest
         number is highest priority).  If a handler function returns
         \"NO MORE\", no more handlers will be called.
+
+        Handlers for \"all_events\" are called before the ones for the
+        specific event type.  They don't see \"all_raw_messages\"
+        events, which are only created if a handler is registered for
+        them by name.
         """
         if event not in self.handlers:
             self.handlers[event] = []
         bisect.insort(self.handlers[event], (priority, handler))
+        self._handler_chains.clear()
 
     def remove_global_handler(self, event, handler):
         """Removes a global handler function.
@@ -270,9 +277,9 @@ class IRC:
         """
         if event not in self.handlers:
             return 0
-        for h in self.handlers[event]:
-            if handler == h[1]:
-                self.handlers[event].remove(h)
+        self.handlers[event] = [h for h in self.handlers[event]
+                                if handler != h[1]]
+        self._handler_chains.clear()
         return 1
 
     def execute_at(self, at, function, arguments=()):
@@ -317,11 +324,26 @@ class IRC:
         self.connections.append(c)
         return c
 
+    def _handler_chain(self, eventtype):
+        """[Internal]
+
+        Returns the handler functions for an event type, in the order
+        they are called.  Chains are built on first use and dropped
+        whenever a global handler is added or removed.
+        """
+        chain = self._handler_chains.get(eventtype)
+        if chain is None:
+            handlers = self.handlers.get(eventtype, [])
+            if eventtype != "all_raw_messages":
+                handlers = self.handlers.get("all_events", []) + handlers
+            chain = tuple(handler for _, handler in handlers)
+            self._handler_chains[eventtype] = chain
+        return chain
+
     def _handle_event(self, connection, event):
         """[Internal]"""
-        h = self.handlers
-        for handler in h.get("all_events", []) + h.get(event.eventtype(), []):
-            if handler[1](connection, event) == "NO MORE":
+        for handler in self._handler_chain(event._eventtype):
+            if handler(connection, event) == "NO MORE":
                 return
 
     def _remove_connection(self, connection):
@@ -330,7 +352,67 @@ class IRC:
         if self.fn_to_remove_socket:
             self.fn_to_remove_socket(connection._get_socket())
 
-_rfc_1459_command_regexp = re.compile("^(:(?P<prefix>[^ ]+) +)?(?P<command>[^ ]+)( *(?P<argument> .+))?")
+
+def _parse_line(line):
+    """[Internal]
+
+    Splits an RFC 1459 message into prefix, command and arguments.  The
+    prefix is None if the message has none, the command is lowercase.
+    A trailing argument (introduced by \" :\") may contain spaces.
+    """
+    prefix = None
+    pos = 0
+    if line.startswith(":"):
+        end = line.find(" ")
+        if end > 1:
+            pos = end
+            while line.startswith(" ", pos):
+                pos += 1
+            if pos < len(line):
+                prefix = line[1:end]
+            else:
+                # Nothing but a prefix - read it as the command
+                pos = 0
+
+    end = line.find(" ", pos)
+    if end < 0:
+        return prefix, line[pos:].lower() or None, []
+    command = line[pos:end].lower()
+    rest = line[end:].lstrip(" ")
+
+    if rest.startswith(":"):
+        return prefix, command, [rest[1:]]
+    trailing = rest.find(" :")
+    if trailing < 0:
+        return prefix, command, rest.split()
+    arguments = rest[:trailing].split()
+    arguments.append(rest[trailing + 2:])
+    return prefix, command, arguments
+
+
+def _split_lines(buffer):
+    """[Internal]
+
+    Removes all complete lines from a bytearray and returns them,
+    without their line endings.  An unfinished line stays in the
+    buffer until the rest of it arrives.
+    """
+    lines = []
+    pos = 0
+    find = buffer.find
+    end = find(b"\n")
+    while end >= 0:
+        # Huh!?  Crrrrazy EFNet doesn't follow the RFC: their ircd seems to
+        # use \n as message separator!  :P
+        if end > pos and buffer[end - 1] == 13:  # \r
+            lines.append(bytes(buffer[pos:end - 1]))
+        else:
+            lines.append(bytes(buffer[pos:end]))
+        pos = end + 1
+        end = find(b"\n", pos)
+    if pos:
+        del buffer[:pos]
+    return lines
 
 
 class Connection:
@@ -362,11 +444,6 @@ class ServerNotConnectedError(ServerConnectionError):
     pass
 
 
-# Huh!?  Crrrrazy EFNet doesn't follow the RFC: their ircd seems to
-# use \n as message separator!  :P
-_linesep_regexp = re.compile(b"\r?\n")
-
-
 class ServerConnection(Connection):
     """This class represents an IRC server connection.
 
@@ -379,6 +456,10 @@ class ServerConnection(Connection):
         self.connected = 0  # Not connected yet.
         self.socket = None
         self.ssl = None
+        self.previous_buffer = bytearray()
+        self.handlers = {}
+        self.real_server_name = ""
+        self.real_nickname = None
 
     def connect(self, server, port, nickname, password=None, username=None,
                 ircname=None, localaddress="", localport=0, use_ssl=False, ipv6=False):
@@ -413,7 +494,7 @@ class ServerConnection(Connection):
         if self.connected:
             self.disconnect("Changing servers")
 
-        self.previous_buffer = b""
+        self.previous_buffer = bytearray()
         self.handlers = {}
         self.real_server_name = ""
         self.real_nickname = nickname
@@ -497,16 +578,29 @@ class ServerConnection(Connection):
                 new_data = self.socket.recv(2**14)
         except socket.timeout:
             # Nothing was interesting
-            pass
+            return
         except socket.error as x:
             # The server hung up.
             self.disconnect("Connection reset by peer")
             return
 
-        lines = _linesep_regexp.split(self.previous_buffer + new_data)
+        self._feed(new_data)
 
-        # Save the last, unfinished line.
-        self.previous_buffer = lines.pop()
+    def _feed(self, new_data):
+        """[Internal]
+
+        Handles data received from the server.  Complete lines are
+        turned into events, an unfinished one is kept for later.
+        """
+        buffer = self.previous_buffer
+        buffer += new_data
+        lines = _split_lines(buffer)
+        if not lines:
+            return
+
+        # Raw message events are only worth creating if anyone listens.
+        raw_messages = ("all_raw_messages" in self.handlers or
+                        self.irclibobj._handler_chain("all_raw_messages"))
 
         for line in lines:
             if DEBUG:
@@ -515,34 +609,17 @@ class ServerConnection(Connection):
             if not line:
                 continue
 
-            try:
-                line = line.decode("utf-8", "replace")   # utf-8 support hacked in by thygrrr (may break in some scenarios - see chardet python package)
-            except:            
-                print("irclib: non-utf-8 line, unexpected encoding error " + line)
-                line = "** encoding error - replaced by irclib.py **"
-                
-            prefix = None
-            command = None
-            arguments = None
-            self._handle_event(Event("all_raw_messages",
-                                     self.get_server_name(),
-                                     None,
-                                     [line]))
-
-            m = _rfc_1459_command_regexp.match(line)
-            if m.group("prefix"):
-                prefix = m.group("prefix")
-                if not self.real_server_name:
-                    self.real_server_name = prefix
-
-            if m.group("command"):
-                command = m.group("command").lower()
-
-            if m.group("argument"):
-                a = m.group("argument").split(" :", 1)
-                arguments = a[0].split()
-                if len(a) == 2:
-                    arguments.append(a[1])
+            line = line.decode("utf-8", "replace")   # utf-8 support hacked in by thygrrr (may break in some scenarios - see chardet python package)
+
+            if raw_messages:
+                self._handle_event(Event("all_raw_messages",
+                                         self.get_server_name(),
+                                         None,
+                                         [line]))
+
+            prefix, command, arguments = _parse_line(line)
+            if prefix and not self.real_server_name:
+                self.real_server_name = prefix
 
             # Translate numerics into more readable strings.
             if command in numeric_events:
@@ -895,7 +972,7 @@ class DCCConnection(Connection):
         self.peeraddress = socket.gethostbyname(address)
         self.peerport = port
         self.socket = None
-        self.previous_buffer = b""
+        self.previous_buffer = bytearray()
         self.handlers = {}
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.passive = 0
@@ -918,7 +995,7 @@ class DCCConnection(Connection):
         peer, the peer address and port are available as
         self.peeraddress and self.peerport.
         """
-        self.previous_buffer = b""
+        self.previous_buffer = bytearray()
         self.handlers = {}
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.passive = 1
@@ -981,15 +1058,14 @@ class DCCConnection(Connection):
         if self.dcctype == "chat":
             # The specification says lines are terminated with LF, but
             # it seems safer to handle CR LF terminations too.
-            chunks = _linesep_regexp.split(self.previous_buffer + new_data)
+            self.previous_buffer += new_data
+            chunks = _split_lines(self.previous_buffer)
 
-            # Save the last, unfinished line.
-            self.previous_buffer = chunks[-1]
+            # The last, unfinished line stays in the buffer.
             if len(self.previous_buffer) > 2**14:
                 # Bad peer! Naughty peer!
                 self.disconnect()
                 return
-            chunks = chunks[:-1]
         else:
             chunks = [new_data]
 
@@ -1054,6 +1130,8 @@ class SimpleIRCClient:
         self.connection = self.ircobj.server()
         self.dcc_connections = []
         self.ircobj.add_global_handler("all_events", self._dispatcher, -10)
+        if hasattr(self, "on_all_raw_messages"):
+            self.ircobj.add_global_handler("all_raw_messages", self._dispatcher, -10)
         self.ircobj.add_global_handler("dcc_disconnect", self._dcc_disconnect, -10)
 
     def _dispatcher(self, c, e):
@@ -1141,6 +1219,8 @@ class SimpleIRCClient:
 
 class Event:
     """Class representing an IRC event."""
+    __slots__ = ("_eventtype", "_source", "_target", "_arguments")
+
     def __init__(self, eventtype, source, target, arguments=None):
         """Constructor of Event objects.
 
@@ -0,0 +1,182 @@
+from collections import deque
+from urllib.parse import quote
+import gzip
+import json
+import os
+
+from PyQt5 import QtGui
+
+from chat import logger
+
+# Lines kept in a chat window, and how many are dropped at once past that
+CHAT_TEXT_LIMIT = 350
+CHAT_REMOVEBLOCK = 50
+# While the user reads back, lines are kept up to this many times the limit
+READING_BACK_FACTOR = 4
+
+
+class ChatHistory:
+    """
+    Append-only, gzip compressed file of chat lines that no longer fit in a
+    chat window. Every batch of lines is written as a gzip member of its own,
+    so batches written in this session can be read back one at a time.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        # (offset, length) of the batches written in this session
+        self._batches = []
+
+    def __len__(self):
+        return len(self._batches)
+
+    def append(self, lines):
+        data = "".join(json.dumps(line) + "\n" for line in lines)
+        data = gzip.compress(data.encode("utf-8"))
+        with open(self.filename, "ab") as f:
+            offset = f.tell()
+            f.write(data)
+        self._batches.append((offset, len(data)))
+
+    def read(self, index):
+        """
+        Returns the lines of a batch, the first one written being 0.
+        """
+        offset, length = self._batches[index]
+        with open(self.filename, "rb") as f:
+            f.seek(offset)
+            data = f.read(length)
+        return [json.loads(line) for line in
+                gzip.decompress(data).decode("utf-8").splitlines()]
+
+
+def open_history(directory, channel):
+    """
+    Returns the history for a channel, or None if it can't be written.
+    """
+    try:
+        os.makedirs(directory, exist_ok=True)
+    except OSError:
+        logger.exception("Can't create chat history directory")
+        return None
+    return ChatHistory(os.path.join(directory, quote(channel, safe="") + ".gz"))
+
+
+class Scrollback:
+    """
+    Keeps the lines of a chat in a text document. Lines are formatted html,
+    each one a few blocks of the document. Past the limit the oldest lines
+    are dropped in chunks; with a history they go to disk, from where
+    load_older brings them back.
+    """
+    def __init__(self, document, history=None, limit=CHAT_TEXT_LIMIT,
+                 chunk=CHAT_REMOVEBLOCK):
+        self._document = document
+        self._history = history
+        self._limit = limit
+        self._chunk = chunk
+        # (html, block count) of lines appended, oldest first
+        self._lines = deque()
+        # Block counts of lines loaded back from the history, and the number
+        # of lines of each batch loaded, oldest first
+        self._loaded = deque()
+        self._loaded_sizes = deque()
+        self._loaded_batches = 0
+
+    def __len__(self):
+        return len(self._lines) + len(self._loaded)
+
+    def has_older(self):
+        return (self._history is not None and
+                self._loaded_batches < len(self._history))
+
+    def append(self, lines, reading_back=False):
+        """
+        Adds lines at the end. If the user is reading back, the lines above
+        are kept a while longer so the view doesn't move.
+        """
+        document = self._document
+        # Our own cursor leaves the user's selection alone
+        cursor = QtGui.QTextCursor(document)
+        cursor.movePosition(QtGui.QTextCursor.End)
+        cursor.beginEditBlock()
+        for line in lines:
+            blocks = document.blockCount()
+            cursor.insertHtml(line)
+            self._lines.append((line, document.blockCount() - blocks))
+        cursor.endEditBlock()
+
+        limit = self._limit
+        if reading_back:
+            limit *= READING_BACK_FACTOR
+        if len(self) > limit:
+            self._trim(limit)
+
+    def load_older(self):
+        """
+        Puts the newest batch of the history that isn't shown yet above the
+        other lines. Returns False if there is none.
+        """
+        if not self.has_older():
+            return False
+        index = len(self._history) - self._loaded_batches - 1
+        try:
+            lines = self._history.read(index)
+        except (OSError, ValueError, EOFError):
+            logger.exception("Can't read chat history")
+            self._history = None
+            return False
+
+        document = self._document
+        cursor = QtGui.QTextCursor(document)
+        cursor.beginEditBlock()
+        counts = []
+        for line in lines:
+            blocks = document.blockCount()
+            cursor.insertHtml(line)
+            counts.append(document.blockCount() - blocks)
+        cursor.endEditBlock()
+        self._loaded.extendleft(reversed(counts))
+        self._loaded_sizes.appendleft(len(counts))
+        self._loaded_batches += 1
+        return True
+
+    def clear(self):
+        """
+        Forgets the lines shown, after the document has been cleared.
+        """
+        self._lines.clear()
+        self._loaded.clear()
+        self._loaded_sizes.clear()
+        self._loaded_batches = 0
+
+    def _trim(self, limit):
+        # Lines loaded back are already on disk, so they go first, a batch at
+        # a time. The oldest batch is the last one loaded.
+        blocks = 0
+        while len(self) > limit and self._loaded_sizes:
+            for _ in range(self._loaded_sizes.popleft()):
+                blocks += self._loaded.popleft()
+            self._loaded_batches -= 1
+
+        dropped = []
+        excess = len(self) - limit
+        if excess > 0:
+            for _ in range(min(len(self._lines), max(excess, self._chunk))):
+                line, count = self._lines.popleft()
+                dropped.append(line)
+                blocks += count
+
+        cursor = QtGui.QTextCursor(self._document)
+        end = self._document.findBlockByNumber(blocks)
+        if end.isValid():
+            cursor.setPosition(end.position(), QtGui.QTextCursor.KeepAnchor)
+        else:
+            cursor.movePosition(QtGui.QTextCursor.End, QtGui.QTextCursor.KeepAnchor)
+        cursor.removeSelectedText()
+
+        if self._history is not None and dropped:
+            try:
+                self._history.append(dropped)
+            except OSError:
+                logger.exception("Can't write chat history")
+                self._history = None
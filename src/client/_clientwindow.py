@@ -6,7 +6,7 @@ from connectivity.helper import ConnectivityHelper
 from client import ClientState, LOBBY_HOST, LOBBY_PORT, LOCAL_REPLAY_PORT
 from client.aliasviewer import AliasSearchWindow
 from client.connection import LobbyInfo, ServerConnection, \
-        Dispatcher, ConnectionState, ServerReconnecter
+        BatchingDispatcher, ConnectionState, ServerReconnecter
 from client.gameannouncer import GameAnnouncer
 from client.kick_dialog import KickDialog
 from client.login import LoginWidget
@@ -18,17 +18,17 @@ from client.user import User
 from downloadManager import PreviewDownloader, MAP_PREVIEW_ROOT
 import fa
 from fa.factions import Factions
-from fa.maps import getUserMapsFolder
+from fa.maps import getUserMapsFolder, PreviewGenerator, invalidatePreview
 from functools import partial
 from games.gamemodel import GameModel
 from games.gameitem import GameViewBuilder
 from games.hostgamewidget import build_launcher
 import json
 from model.gameset import Gameset
-from model.player import Player
 from model.playerset import Playerset
 from modvault.utils import MODFOLDER
 import notifications as ns
+import os
 from secondaryServer import SecondaryServer
 import time
 import util
@@ -143,10 +143,15 @@ class ClientWindow(FormClass, BaseClass):
         # encounter a serious server error.
         self._autorelogin = self.remember
 
-        self.lobby_dispatch = Dispatcher()
+        # Game and player updates are handled in batches, so that bursts
+        # of them don't update the views for every single message
+        self.lobby_dispatch = BatchingDispatcher()
         self.lobby_connection = ServerConnection(LOBBY_HOST, LOBBY_PORT,
                                                  self.lobby_dispatch.dispatch)
         self.lobby_connection.state_changed.connect(self.on_connection_state_changed)
+        if config.Settings.get('lobby/record_traffic', type=bool, default=False):
+            self.lobby_connection.start_recording(os.path.join(
+                util.LOG_DIR, time.strftime("lobby-%Y%m%d-%H%M%S.rec.gz")))
         self.lobby_reconnecter = ServerReconnecter(self.lobby_connection)
 
         self.players = Playerset()  # Players known to the client
@@ -157,7 +162,9 @@ class ClientWindow(FormClass, BaseClass):
         # Handy reference to the User object representing the logged-in user.
         self.me = User(self.players)
 
-        self.map_downloader = PreviewDownloader(util.MAP_PREVIEW_DIR, MAP_PREVIEW_ROOT)
+        self.map_downloader = PreviewDownloader(util.MAP_PREVIEW_DIR, MAP_PREVIEW_ROOT,
+                                                PreviewGenerator())
+        self.map_downloader.previewAvailable.connect(invalidatePreview)
         self.mod_downloader = PreviewDownloader(util.MOD_PREVIEW_DIR, None)
 
         # Qt model for displaying active games.
@@ -165,13 +172,13 @@ class ClientWindow(FormClass, BaseClass):
 
         self.lobby_info = LobbyInfo(self.lobby_dispatch, self.gameset, self.players)
         self.gameset.newGame.connect(self.fill_in_session_info)
+        self.gameset.gamesBulkAdded.connect(self._at_games_bulk_added)
 
         self.lobby_dispatch["session"] = self.handle_session
         self.lobby_dispatch["registration_response"] = self.handle_registration_response
         self.lobby_dispatch["game_launch"] = self.handle_game_launch
         self.lobby_dispatch["matchmaker_info"] = self.handle_matchmaker_info
         self.lobby_dispatch["social"] = self.handle_social
-        self.lobby_dispatch["player_info"] = self.handle_player_info
         self.lobby_dispatch["notice"] = self.handle_notice
         self.lobby_dispatch["invalid"] = self.handle_invalid
         self.lobby_dispatch["update"] = self.handle_update
@@ -345,6 +352,7 @@ class ClientWindow(FormClass, BaseClass):
 
     def on_disconnected(self):
         logger.warning("Disconnected from lobby server.")
+        self.lobby_dispatch.clear()
         self.gameset.clear()
         self.clear_players()
 
@@ -660,6 +668,13 @@ class ClientWindow(FormClass, BaseClass):
         if self.lobby_connection.socket_connected():
             progress.setLabelText("Closing main connection.")
             self.lobby_connection.disconnect()
+        self.lobby_connection.stop_recording()
+
+        # Stop relaying game traffic
+        if self.connectivity:
+            progress.setLabelText("Closing game relay")
+            self.connectivity.stop()
+            self.connectivity = None
 
         # Clear UPnP Mappings...
         if self.useUPnP:
@@ -1181,7 +1196,9 @@ class ClientWindow(FormClass, BaseClass):
         self.authorized.emit(self.me)
 
         # Run an initial connectivity test and initialize a gamesession object
-        # when done
+        # when done. The helper of an earlier login still holds the game port.
+        if self.connectivity is not None:
+            self.connectivity.stop()
         self.connectivity = ConnectivityHelper(self, self.gamePort)
         self.connectivity.connectivity_status_established.connect(self.initialize_game_session)
         self.connectivity.start_test()
@@ -1318,6 +1335,11 @@ class ClientWindow(FormClass, BaseClass):
             self.game_session.game_name = game.title
             self.game_session.game_visibility = game.visibility.value
 
+    def _at_games_bulk_added(self, games):
+        for game in games:
+            self.fill_in_session_info(game)
+            fa.instance.newServerGame(game)
+
     def handle_matchmaker_info(self, message):
         if not self.me.player:
             return
@@ -1358,21 +1380,6 @@ class ClientWindow(FormClass, BaseClass):
             self.power = message["power"]
             self.manage_power()
 
-    def handle_player_info(self, message):
-        players = message["players"]
-
-        # Fix id being a Python keyword
-        for player in players:
-            player["id_"] = player["id"]
-            del player["id"]
-
-        for player in players:
-            id_ = int(player["id_"])
-            if id_ in self.players:
-                self.players[id_].update(**player)
-            else:
-                self.players[id_] = Player(**player)
-
     def avatarManager(self):
         self.requestAvatars(0)
         self.avatarSelection.show()
@@ -7,7 +7,10 @@ import sys
 
 from enum import IntEnum
 
+from lobbyprotocol import FrameReader, TrafficRecorder, pack_frame, \
+        decode_json, FROM_CLIENT, FROM_SERVER
 from model.game import Game, message_to_game_args
+from model.player import Player
 
 logger = logging.getLogger(__name__)
 
@@ -156,8 +159,9 @@ class ServerConnection(QtCore.QObject):
         self._host = host
         self._port = port
         self._state = ConnectionState.INITIAL
-        self.blockSize = 0
+        self._frames = FrameReader()
         self._disconnect_requested = False
+        self._recorder = None
 
         self._dispatch = dispatch
 
@@ -211,51 +215,47 @@ class ServerConnection(QtCore.QObject):
     def set_upnp(self, port):
         fa.upnp.createPortMapping(self.socket.localAddress().toString(), port, "UDP")
 
-    @QtCore.pyqtSlot()
-    def readFromServer(self):
-        ins = QtCore.QDataStream(self.socket)
-        ins.setVersion(QtCore.QDataStream.Qt_4_2)
-
-        while not ins.atEnd():
-            if self.blockSize == 0:
-                if self.socket.bytesAvailable() < 4:
-                    return
-                self.blockSize = ins.readUInt32()
-            if self.socket.bytesAvailable() < self.blockSize:
-                return
-
-            action = ins.readQString()
-#            logger.debug("Server: '%s'" % action)
+    def start_recording(self, filename):
+        """
+        Records all traffic to a file, see lobbyprotocol.TrafficRecorder.
+        """
+        self.stop_recording()
+        logger.info("Recording lobby traffic to {}".format(filename))
+        self._recorder = TrafficRecorder(filename)
 
-            if action == "PING":
-                self.writeToServer("PONG")
-                self.blockSize = 0
-                return
-            elif action == "PONG":
-                self.blockSize = 0
-                self.received_pong.emit()
-                return
-            try:
-                self._dispatch(json.loads(action))
-            except:
-                logger.error("Error dispatching JSON: " + action, exc_info=sys.exc_info())
+    def stop_recording(self):
+        if self._recorder is not None:
+            self._recorder.close()
+            self._recorder = None
 
-            self.blockSize = 0
+    @QtCore.pyqtSlot()
+    def readFromServer(self):
+        # Handle every complete frame, not just the first one
+        for action in self._frames.feed(self.socket.readAll().data()):
+            if self._recorder is not None:
+                self._recorder.record(FROM_SERVER, action)
+            self._handle_action(action)
+
+    def _handle_action(self, action):
+        if action == "PING":
+            self.writeToServer("PONG")
+            return
+        elif action == "PONG":
+            self.received_pong.emit()
+            return
+        try:
+            self._dispatch(decode_json(action))
+        except:
+            logger.error("Error dispatching JSON: " + action, exc_info=sys.exc_info())
 
     def writeToServer(self, action, *args, **kw):
         """
         Writes data to the deprecated stream API. Do not use.
         """
         logger.debug("Client: " + action)
-
-        block = QtCore.QByteArray()
-        out = QtCore.QDataStream(block, QtCore.QIODevice.ReadWrite)
-        out.setVersion(QtCore.QDataStream.Qt_4_2)
-
-        out.writeUInt32(2 * len(action) + 4)
-        out.writeQString(action)
-
-        self.socket.write(block)
+        if self._recorder is not None:
+            self._recorder.record(FROM_CLIENT, action)
+        self.socket.write(pack_frame(action))
 
     def send(self, message):
         data = json.dumps(message)
@@ -268,7 +268,7 @@ class ServerConnection(QtCore.QObject):
 
     def on_disconnect(self):
         logger.warning("Disconnected from lobby server.")
-        self.blockSize = 0
+        self._frames.clear()
         self.state = ConnectionState.DISCONNECTED
         self.disconnected.emit()
         if self._disconnect_requested:
@@ -324,6 +324,85 @@ class Dispatcher():
                 raise ValueError
 
 
+class BatchingDispatcher(Dispatcher):
+    """
+    Dispatcher that collects game_info and player_info messages and
+    dispatches them together, once control returns to the event loop or
+    after interval milliseconds. Only the latest state of each game and
+    player is kept, and they're dispatched as a single player_info and a
+    single game_info message with a list of games, so a burst of updates
+    ends up as one model update. A lone game is dispatched as it came, the
+    same way the plain Dispatcher would.
+
+    Any other message dispatches the collected ones first, so that the
+    order of messages is kept.
+    """
+    def __init__(self, interval=0):
+        Dispatcher.__init__(self)
+        self._games = {}    # uid -> latest game_info
+        self._players = {}  # id -> latest player info
+        self._timer = QtCore.QTimer()
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(interval)
+        self._timer.timeout.connect(self._flush_timeout)
+
+    def dispatch(self, message):
+        cmd = message.get("command")
+        if "target" not in message:
+            if cmd == "game_info":
+                for game in message.get("games", [message]):
+                    self._games[game.get("uid")] = game
+                self._schedule()
+                return
+            elif cmd == "player_info":
+                for player in message.get("players", []):
+                    self._players[player.get("id")] = player
+                self._schedule()
+                return
+        self.flush()
+        Dispatcher.dispatch(self, message)
+
+    def _schedule(self):
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def flush(self):
+        """
+        Dispatches collected messages right away.
+        """
+        self._timer.stop()
+        # Players first, so that games can find their players
+        if self._players:
+            players = list(self._players.values())
+            self._players = {}
+            Dispatcher.dispatch(self, {"command": "player_info",
+                                       "players": players})
+        if len(self._games) == 1:
+            game, = self._games.values()
+            self._games = {}
+            Dispatcher.dispatch(self, dict(game, command="game_info"))
+        elif self._games:
+            games = list(self._games.values())
+            self._games = {}
+            Dispatcher.dispatch(self, {"command": "game_info",
+                                       "games": games})
+
+    def clear(self):
+        """
+        Drops collected messages, e.g. after losing the connection.
+        """
+        self._timer.stop()
+        self._games = {}
+        self._players = {}
+
+    def _flush_timeout(self):
+        try:
+            self.flush()
+        except:
+            logger.error("Error dispatching batched messages",
+                         exc_info=sys.exc_info())
+
+
 class LobbyInfo(QtCore.QObject):
 
     # These signals propagate important client state changes to other modules
@@ -347,6 +426,7 @@ class LobbyInfo(QtCore.QObject):
         self._dispatcher["tutorials_info"] = self.handle_tutorials_info
         self._dispatcher["mod_info"] = self.handle_mod_info
         self._dispatcher["game_info"] = self.handle_game_info
+        self._dispatcher["player_info"] = self.handle_player_info
         self._dispatcher["modvault_list_info"] = self.handle_modvault_list_info
         self._dispatcher["modvault_info"] = self.handle_modvault_info
         self._dispatcher["replay_vault"] = self.handle_replay_vault
@@ -373,11 +453,34 @@ class LobbyInfo(QtCore.QObject):
 
     def handle_game_info(self, message):
         if 'games' in message:  # initial bunch of games from server after client start
-            for game in message['games']:
-                self._update_game(game)
+            self._gameset.begin_bulk_add()
+            try:
+                for game in message['games']:
+                    self._update_game(game)
+            finally:
+                self._gameset.commit_bulk_add()
         else:
             self._update_game(message)
 
+    def handle_player_info(self, message):
+        players = message["players"]
+
+        # Fix id being a Python keyword
+        for player in players:
+            player["id_"] = player["id"]
+            del player["id"]
+
+        self._playerset.begin_bulk_add()
+        try:
+            for player in players:
+                id_ = int(player["id_"])
+                if id_ in self._playerset:
+                    self._playerset[id_].update(**player)
+                else:
+                    self._playerset[id_] = Player(**player)
+        finally:
+            self._playerset.commit_bulk_add()
+
     def _update_game(self, m):
         if not message_to_game_args(m):
             return
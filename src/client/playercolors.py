@@ -26,6 +26,7 @@ class PlayerColors:
     def __init__(self, user):
         self._user = user
         self.coloredNicknames = False
+        self._random_colors = {}
 
     def getColor(self, name):
         if name in self.colors:
@@ -35,8 +36,14 @@ class PlayerColors:
 
     def getRandomColor(self, seed):
         '''Generate a random color from a seed'''
-        random.seed(seed)
-        return random.choice(self.randomcolors)
+        try:
+            return self._random_colors[seed]
+        except KeyError:
+            pass
+        # Own generator, so we don't reseed everyone else's
+        color = random.Random(seed).choice(self.randomcolors)
+        self._random_colors[seed] = color
+        return color
 
     def getAffiliation(self, id_=-1, name=None):
         if self._user.player and self._user.player.id == id_:
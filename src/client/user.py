@@ -94,6 +94,7 @@ class User(QtCore.QObject):
 
         self._players = playerset
         self._players.playerAdded.connect(self._on_player_change)
+        self._players.playersBulkAdded.connect(self._on_players_bulk_added)
         self._players.playerRemoved.connect(self._on_player_change)
 
         self._friends = UserRelation()
@@ -129,6 +130,11 @@ class User(QtCore.QObject):
             return
         self._update_player()
 
+    def _on_players_bulk_added(self, players):
+        if self.id is None or self.id not in self._players:
+            return
+        self._update_player()
+
     def _irc_key(self, name):
         if self.player is None:
             return None
@@ -1,12 +1,14 @@
 
+import logging
 from functools import partial
 
-from PyQt5.QtCore import QObject, pyqtSignal, QTimer, Qt
+from PyQt5.QtCore import QCoreApplication, QObject, pyqtSignal, pyqtSlot, QTimer, Qt
 from PyQt5.QtNetwork import QUdpSocket, QHostAddress, QAbstractSocket
 import time
 
 from connectivity import QTurnSocket
 from connectivity.relay import Relay
+from connectivity.thread import NetworkThread
 from connectivity.turn import TURNState
 from decorators import with_logger
 
@@ -15,6 +17,10 @@ from PyQt5 import QtWidgets, uic
 
 @with_logger
 class RelayTest(QObject):
+    """
+    Sends packets to our own relay address and counts what comes back.
+    Lives in the network thread together with the socket.
+    """
     finished = pyqtSignal()
     progress = pyqtSignal(str)
 
@@ -23,24 +29,23 @@ class RelayTest(QObject):
         self._socket = socket
         self.start_time, self.end_time = None, None
         self.addr = None
-        self.received = set()
-        self._sent, self._total = 0, 250
-        self.host, self.port = None, None
-        self._sendtimer = QTimer()
+        self._peer = None   # PeerStats of the relay address
+        self._owns_stats = False
+        self._total = 250
+        self._sendtimer = QTimer(self)
         self._sendtimer.timeout.connect(self.send)
 
+    @pyqtSlot(tuple)
     def start_relay_test(self, address):
-        self.addr = address
+        host, port = address
+        self.addr = (host, int(port))
         self._logger.info("Starting relay test")
-        self._socket.data.connect(self.receive)
         self._socket.permit(self.addr)
 
         self.start_time, self.end_time = time.time(), None
-        host, port = self.addr
-        self.host, self.port = QHostAddress(host), port
-
-        self._sent = 0
-        self.received = set()
+        self._owns_stats = self._socket.stats is None
+        self._peer = self._socket.enable_stats().peer(self.addr)
+        self._peer.reset()
         self._sendtimer.start(20)
 
         end_timer = QTimer()
@@ -48,17 +53,23 @@ class RelayTest(QObject):
 
     @property
     def report(self):
+        sent, received = self._peer.packets_out, self._peer.packets_in
+        loss = 100 - received / sent * 100 if sent else 0
         return "Relay address: {}\nReceived {} packets in {}s. {}% loss.". \
                     format("{}:{}".format(*self.addr),
-                           len(self.received),
+                           received,
                            round((time.time()-self.start_time), 2),
-                           round(100-(len(self.received)/self._sent) * 100), 2)
+                           round(loss, 2))
 
     def send(self):
-        self._socket.writeDatagram(('{}'.format(self._sent)).encode(), self.host, self.port)
-        if self._sent >= self._total:
-            self._sendtimer.stop()
-        self._sent += 1
+        if self._peer.packets_out < self._total:
+            self._socket.sendto(('{}'.format(self._peer.packets_out)).encode(), self.addr)
+        self.progress.emit(self.report)
+        if self._peer.packets_in >= self._total:
+            self.end()
+
+    def stop(self):
+        self._sendtimer.stop()
 
     def end(self):
         if self.end_time:
@@ -66,18 +77,21 @@ class RelayTest(QObject):
         self.end_time = time.time()
         self._sendtimer.stop()
         self._logger.info('Relay test finished')
+        if self._owns_stats:
+            self._socket.disable_stats()
         self.finished.emit()
-        self.socket.data.disconnect(self.receive)
-
-    def receive(self, sender, data):
-        self.received.add(int(data.decode()))
-        self.progress.emit(self.report)
-        if len(self.received) == self._total:
-            self.end()
 
 
 @with_logger
 class ConnectivityHelper(QObject):
+    """
+    Sets up connectivity for games and relays their traffic.
+
+    The relay sockets live in a NetworkThread, the helper itself in the GUI
+    thread. Methods touching the sockets are run in the network thread,
+    as are _on_data and everything it calls. Don't access the sockets or
+    relays directly from the GUI thread.
+    """
     connectivity_status_established = pyqtSignal(str, str)
 
     # Emitted when a peer is bound to a local port
@@ -90,14 +104,20 @@ class ConnectivityHelper(QObject):
 
     error = pyqtSignal(str)
 
+    # Forwards NAT packets from the network thread
+    _natpacket_received = pyqtSignal(str, str)
+
     def __init__(self, client, port):
         QObject.__init__(self)
         self._client = client
         self._port = port
         self.game_port = port+1
 
-        self._socket = QTurnSocket(port, self._on_data)
+        self._thread = NetworkThread()
+        self._thread.start()
+        self._socket = self._thread.call_blocking(QTurnSocket, port, self._on_data)
         self._socket.state_changed.connect(self.turn_state_changed)
+        self._natpacket_received.connect(self._send_natpacket, Qt.QueuedConnection)
 
         dispatch = self._client.lobby_dispatch
         dispatch.subscribe_to('connectivity', self.handle_SendNatPacket, "SendNatPacket")
@@ -106,10 +126,67 @@ class ConnectivityHelper(QObject):
 
         self.relay_address, self.mapped_address = None, None
         self._relay_test = None
-        self._relays = {}
+        self._relays = {}   # Peer address -> Relay, used in network thread
         self.state = None
         self.addr = None
 
+    def stop(self):
+        """
+        Closes the sockets and stops the network thread. Must be called
+        before the helper is dropped, or its port stays bound.
+        """
+        if not self._thread.isRunning():
+            return
+        self._thread.call_blocking(self._close)
+        self._thread.stop()
+
+    def _close(self):
+        for relay in self._relays.values():
+            relay.close()
+        self._relays.clear()
+        self._socket.stop()
+        # Once the thread is gone, the objects we still hold are destroyed
+        # from the GUI thread, so hand them over to it
+        gui_thread = QCoreApplication.instance().thread()
+        self._socket.moveToThread(gui_thread)
+        if self._relay_test is not None:
+            self._relay_test.stop()
+            self._relay_test.moveToThread(gui_thread)
+
+    @property
+    def stats(self):
+        """
+        Traffic counters of the relay socket, None unless enabled. They are
+        updated in the network thread, use stats_report for a snapshot.
+        """
+        return self._socket.stats
+
+    def enable_stats(self):
+        return self._thread.call_blocking(self._socket.enable_stats)
+
+    def disable_stats(self):
+        self._thread.call_blocking(self._socket.disable_stats)
+
+    def stats_report(self):
+        """
+        Returns the traffic counters as a dict that can be dumped as json,
+        or None if they're not enabled. Peers are labeled with their login
+        and id if they are relayed to the game.
+        """
+        return self._thread.call_blocking(self._stats_report)
+
+    def _stats_report(self):
+        stats = self._socket.stats
+        if stats is None:
+            return None
+        report = stats.as_dict()
+        report["retransmits"] = self._socket.retransmits
+        for addr, relay in self._relays.items():
+            peer = report["peers"].get("{}:{}".format(*addr))
+            if peer is not None:
+                peer["login"], peer["peer_id"] = relay.login, relay.peer_id
+        return report
+
     @property
     def is_ready(self):
         return (self.relay_address is not None
@@ -122,12 +199,11 @@ class ConnectivityHelper(QObject):
 
     def start_relay_test(self):
         if not self._relay_test:
-            self._relay_test = RelayTest(self._socket)
-            self._relay_test.finished.connect(self.relay_test_finished.emit)
-            self._relay_test.progress.connect(self.relay_test_progress.emit)
+            self._relay_test = self._thread.call_blocking(RelayTest, self._socket)
+            self._relay_test.finished.connect(self.relay_test_finished)
+            self._relay_test.progress.connect(self.relay_test_progress)
 
         if not self._socket.turn_state == TURNState.BOUND:
-            self._socket.connect_to_relay()
             self._socket.bound.connect(self._relay_test.start_relay_test, Qt.UniqueConnection)
 
             def _cleanup():
@@ -138,8 +214,9 @@ class ConnectivityHelper(QObject):
                     pass
 
             self._relay_test.finished.connect(_cleanup, Qt.UniqueConnection)
+            self._thread.call(self._socket.connect_to_relay)
         else:
-            self._relay_test.start_relay_test(self.mapped_address)
+            self._thread.call(self._relay_test.start_relay_test, self.mapped_address)
 
     def turn_state_changed(self, state):
         if state == TURNState.BOUND:
@@ -150,9 +227,13 @@ class ConnectivityHelper(QObject):
     def handle_SendNatPacket(self, msg):
         target, message = msg['args']
         host, port = target.split(':')
-        if self.state is None and self._socket.localPort() == self._port:
+        self._thread.call(self._send_natpacket_to, (host, int(port)), message, self.state is None)
+
+    def _send_natpacket_to(self, addr, message, randomize):
+        host, port = addr
+        if randomize and self._socket.localPort() == self._port:
             self._socket.randomize_port()
-        self._socket.writeDatagram(b'\x08'+message.encode(), QHostAddress(host), int(port))
+        self._socket.writeDatagram(b'\x08'+message.encode(), QHostAddress(host), port)
 
     def handle_ConnectivityState(self, msg):
         state, addr = msg['args']
@@ -171,15 +252,18 @@ class ConnectivityHelper(QObject):
     def handle_message(self, msg):
         command = msg.get('command')
         if command == 'CreatePermission':
-            self._socket.permit(msg['args'])
+            self._thread.call(self._socket.permit, msg['args'])
 
     def bind(self, addr, login, peer_id):
         (host, port) = addr
         host, port = host, int(port)
-        relay = Relay(self.game_port, login, peer_id, partial(self.send_udp, (host, port)))
+        self._thread.call(self._bind, (host, port), login, peer_id)
+
+    def _bind(self, addr, login, peer_id):
+        relay = Relay(self.game_port, login, peer_id, partial(self._socket.sendto, addr))
         relay.bound.connect(partial(self.peer_bound.emit, login, peer_id))
         relay.listen()
-        self._relays[(host, port)] = relay
+        self._relays[addr] = relay
 
     def send(self, command, args):
         self._client.lobby_connection.send({
@@ -190,7 +274,7 @@ class ConnectivityHelper(QObject):
 
     def prepare(self):
         if self.state == 'STUN' and not self._socket.turn_state == TURNState.BOUND:
-            self._socket.connect_to_relay()
+            self._thread.call(self._socket.connect_to_relay)
         elif self.state == 'BLOCKED':
             pass
         else:
@@ -199,17 +283,24 @@ class ConnectivityHelper(QObject):
     def send_udp(self, addr, data):
         (host, port) = addr
         host, port = host, int(port)
-        self._socket.sendto(data, (host, port))
+        self._thread.call(self._socket.sendto, data, (host, port))
 
     def _on_data(self, addr, data):
-        host, port = addr
-        if not self._process_natpacket(data, addr):
-            try:
-                relay = self._relays[(host, int(port))]
+        # Called in the network thread for every packet from a peer.
+        # Addresses from the socket have an int port already, so they can be
+        # looked up as they are.
+        if data[:1] == b'\x08' and self._process_natpacket(data, addr):
+            return
+        relay = self._relays.get(addr)
+        if relay is not None:
+            if self._logger.isEnabledFor(logging.DEBUG):
                 self._logger.debug('{}<<{} len: {}'.format(relay.peer_id, addr, len(data)))
-                relay.send(data)
-            except KeyError:
-                self._logger.debug("No relay for data from {}:{}".format(host, port))
+            relay.send(data)
+        elif self._logger.isEnabledFor(logging.DEBUG):
+            self._logger.debug("No relay for data from {}:{}".format(*addr))
+
+    def _send_natpacket(self, addr, msg):
+        self.send('ProcessNatPacket', [addr, msg])
 
     def _process_natpacket(self, data, addr):
         """
@@ -221,11 +312,10 @@ class ConnectivityHelper(QObject):
         :return:
         """
         try:
-            if data.startswith(b'\x08'):
+            if data[:1] == b'\x08':
                 host, port = addr
-                msg = data[1:].decode()
-                self.send('ProcessNatPacket',
-                          ["{}:{}".format(host, port), msg])
+                msg = bytes(data[1:]).decode()
+                self._natpacket_received.emit("{}:{}".format(host, port), msg)
                 if msg.startswith('Bind'):
                     peer_id = int(msg[4:])
                     if (host, port) not in self._socket.bindings:
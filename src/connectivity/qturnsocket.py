@@ -1,8 +1,11 @@
+import logging
+
 import config
 
 from PyQt5.QtCore import QTimer, pyqtSignal
 from PyQt5.QtNetwork import QUdpSocket, QHostAddress, QHostInfo
 
+from connectivity.stats import RelayStats
 from connectivity.stun import STUNMessage
 from connectivity.turn import TURNSession, TURNState
 from decorators import with_logger
@@ -37,6 +40,12 @@ class QTurnSocket(QUdpSocket):
     """
     Qt based TURN client, abstracts a normal socket
     and provides transparent TURN tunnelling functionality.
+
+    Game traffic goes through sendto and the data callback. Peers bound to a
+    channel are looked up in a precomputed address -> channel table, and
+    addresses of direct peers are converted to QHostAddress only once.
+
+    Traffic is counted per peer in stats once enable_stats() is called.
     """
     # Emitted when the TURN session changes state
     state_changed = pyqtSignal(TURNState)
@@ -68,18 +77,35 @@ class QTurnSocket(QUdpSocket):
         QUdpSocket.__init__(self)
         self._session = QTurnSession(self)
         self._state = TURNState.UNBOUND
-        self.bindings = {}
+        self.bindings = {}      # Channel -> address
+        self._channels = {}     # Address -> channel
+        self._host_addresses = {}   # Host -> QHostAddress
+        self._ipv4_strings = {}     # IPv4 address as int -> host
+        self.stats = None
         self.initial_port = port
         self._data_cb = data_cb
         self.turn_host, self.turn_port = config.Settings.get('turn/host', type=str, default='dev.faforever.com'), \
                                config.Settings.get('turn/port', type=int, default=3478)
         self._logger.info("Turn socket initialized: {}".format(self.turn_host))
         self.turn_address = None
+        self._turn_peer = None
         QHostInfo.lookupHost(self.turn_host, self._looked_up)
         self.bind(port)
         self.readyRead.connect(self._readyRead)
         self.error.connect(self._error)
 
+    @property
+    def retransmits(self):
+        return self._session.retransmits
+
+    def enable_stats(self):
+        if self.stats is None:
+            self.stats = RelayStats()
+        return self.stats
+
+    def disable_stats(self):
+        self.stats = None
+
     def randomize_port(self):
         self.abort()
         self.bind()
@@ -90,6 +116,7 @@ class QTurnSocket(QUdpSocket):
 
     def _looked_up(self, info):
         self.turn_address = info.addresses()[0]
+        self._turn_peer = (self._ipv4_string(self.turn_address), self.turn_port)
 
     def connect_to_relay(self):
         self._session.start()
@@ -106,7 +133,9 @@ class QTurnSocket(QUdpSocket):
     def channel_bound(self, addr, channel):
         (host, port) = addr
         self._logger.info("Bound channel {} to {}".format(channel, (host, port)))
-        self.bindings[channel] = (host, int(port))
+        address = (host, int(port))
+        self.bindings[channel] = address
+        self._channels[address] = channel
 
     def call_in(self, func, sec):
         timer = QTimer(self)
@@ -116,13 +145,20 @@ class QTurnSocket(QUdpSocket):
         pass
 
     def recvfrom(self, sender, data):
+        if self.stats is not None:
+            self.stats.peer(sender).received(len(data), True)
         self._data_cb(sender, data)
 
     def recv(self, channel, data):
-        self._logger.debug("{}/TURNData<<: {}".format(channel, data))
-        try:
-            self._data_cb(self.bindings[channel], data)
-        except KeyError:
+        debug = self._logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            self._logger.debug("{}/TURNData<<: {}".format(channel, data))
+        address = self.bindings.get(channel)
+        if address is not None:
+            if self.stats is not None:
+                self.stats.peer(address).received(len(data), True)
+            self._data_cb(address, data)
+        elif debug:
             self._logger.debug("No binding for channel: {}. Known: {}".format(channel, self.bindings))
 
     def send(self, data):
@@ -134,28 +170,59 @@ class QTurnSocket(QUdpSocket):
         self.writeDatagram(data, self.turn_address, self.turn_port)
 
     def sendto(self, data, address):
-        if address in list(self.bindings.values()):
-            self._logger.debug("Sending to {} through relay".format(address))
-            self._session.send_to(data, address)
+        debug = self._logger.isEnabledFor(logging.DEBUG)
+        channel = self._channels.get(address)
+        if channel is not None:
+            if debug:
+                self._logger.debug("Sending to {} through relay".format(address))
+            self._session.send_to(data, channel)
         else:
             host, port = address
-            self._logger.debug("Sending to {} directly".format(address))
-            self.writeDatagram(data, QHostAddress(host), port)
+            if debug:
+                self._logger.debug("Sending to {} directly".format(address))
+            self.writeDatagram(data, self._host_address(host), port)
+        if self.stats is not None:
+            self.stats.peer(address).sent(len(data), channel is not None)
+
+    def _host_address(self, host):
+        try:
+            return self._host_addresses[host]
+        except KeyError:
+            qhost = QHostAddress(host)
+            self._host_addresses[host] = qhost
+            return qhost
+
+    def _ipv4_string(self, host):
+        # host.toString() is expressed as IPv6 otherwise e.g. ::ffff:91.64.56.230
+        ipv4 = host.toIPv4Address()
+        try:
+            return self._ipv4_strings[ipv4]
+        except KeyError:
+            string = QHostAddress(ipv4).toString()
+            self._ipv4_strings[ipv4] = string
+            return string
 
     def handle_data(self, addr, data):
-        (host, port) = addr
-        self._logger.debug("{}:{}/UDP<<".format(host, port))
+        if addr == self._turn_peer and self._session.handle_channel_data(data):
+            return
+        debug = self._logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            self._logger.debug("{}:{}/UDP<<".format(*addr))
         if self._session and self._session.is_stun_message(data):
-            self._logger.debug("Handling using turn session")
+            if debug:
+                self._logger.debug("Handling using turn session")
             response = STUNMessage.from_bytes(data)
             self._session.handle_response(response)
         else:
-            self._logger.debug("Emitting data, len: {}".format(len(data)))
-            self._data_cb((host, port), data)
+            if debug:
+                self._logger.debug("Emitting data, len: {}".format(len(data)))
+            if self.stats is not None:
+                self.stats.peer(addr).received(len(data), False)
+            self._data_cb(addr, data)
 
     def _readyRead(self):
+        # Drain everything that queued up since the last notification
         while self.hasPendingDatagrams():
             data, host, port = self.readDatagram(self.pendingDatagramSize())
-            ipv4_address_string = QHostAddress(host.toIPv4Address()).toString() # host.toString() is expressed as IPv6 otherwise e.g. ::ffff:91.64.56.230
             if data is not None:
-                self.handle_data((ipv4_address_string, int(port)), data)
+                self.handle_data((self._ipv4_string(host), port), data)
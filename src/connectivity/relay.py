@@ -1,3 +1,5 @@
+import logging
+
 from PyQt5.QtCore import QObject, pyqtSignal
 from PyQt5.QtNetwork import QUdpSocket, QHostAddress
 
@@ -6,6 +8,14 @@ from decorators import with_logger
 
 @with_logger
 class Relay(QObject):
+    """
+    Forwards traffic between the game and one peer. The game talks to a
+    local socket bound for that peer, datagrams from the game are passed to
+    recv and send() writes datagrams from the peer to the game.
+
+    This sits on the path of every in-game packet, so nothing is formatted
+    for the log unless debug logging is enabled.
+    """
     bound = pyqtSignal(int)
 
     def __init__(self, game_port, login, peer_id, recv):
@@ -14,6 +24,7 @@ class Relay(QObject):
         self._socket = QUdpSocket()
         self._socket.stateChanged.connect(self._state_changed)
         self._socket.readyRead.connect(self._ready_read)
+        self._game_address = QHostAddress(QHostAddress.LocalHost)
         self.game_port = game_port
         self.login, self.peer_id = login, peer_id
         self.recv = recv
@@ -21,18 +32,26 @@ class Relay(QObject):
     def listen(self):
         self._socket.bind()
 
+    def close(self):
+        self._socket.close()
+
     def send(self, message):
-        self._logger.debug("game at 127.0.0.1:{}<<{} len: {}".format(self.game_port, self.peer_id, len(message)))
-        self._socket.writeDatagram(message, QHostAddress.LocalHost, self.game_port)
+        if self._logger.isEnabledFor(logging.DEBUG):
+            self._logger.debug("game at 127.0.0.1:{}<<{} len: {}".format(self.game_port, self.peer_id, len(message)))
+        self._socket.writeDatagram(message, self._game_address, self.game_port)
 
     def _state_changed(self, state):
         if state == QUdpSocket.BoundState:
             self.bound.emit(self._socket.localPort())
 
     def _ready_read(self):
-        while self._socket.hasPendingDatagrams():
-            data, host, port = self._socket.readDatagram(self._socket.pendingDatagramSize())
+        # Drain everything that queued up since the last notification
+        socket, recv = self._socket, self.recv
+        debug = self._logger.isEnabledFor(logging.DEBUG)
+        while socket.hasPendingDatagrams():
+            data, _, _ = socket.readDatagram(socket.pendingDatagramSize())
             if data is None:    # Rare race condition when disconnecting
                 continue
-            self._logger.debug("{}>>{}/{}".format(self._socket.localPort(), self.login, self.peer_id))
-            self.recv(data)
+            if debug:
+                self._logger.debug("{}>>{}/{}".format(socket.localPort(), self.login, self.peer_id))
+            recv(data)
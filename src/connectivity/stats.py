@@ -0,0 +1,110 @@
+import time
+
+
+class PeerStats:
+    """
+    Traffic counters for one peer address. Packets are counted separately
+    for the path they took - through the TURN relay or directly.
+
+    Arrival jitter is the change between consecutive inter-arrival times of
+    received packets, counted in a histogram with JITTER_BUCKETS as upper
+    bounds in milliseconds and one more bucket for anything longer.
+    """
+    JITTER_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+    __slots__ = ("packets_in", "bytes_in", "packets_out", "bytes_out",
+                 "turn_in", "turn_out", "jitter", "_last_arrival",
+                 "_last_interval")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.packets_in = 0
+        self.bytes_in = 0
+        self.packets_out = 0
+        self.bytes_out = 0
+        self.turn_in = 0
+        self.turn_out = 0
+        self.jitter = [0] * (len(self.JITTER_BUCKETS) + 1)
+        self._last_arrival = None
+        self._last_interval = None
+
+    def received(self, size, turn, now=None):
+        if now is None:
+            now = time.perf_counter()
+        self.packets_in += 1
+        self.bytes_in += size
+        if turn:
+            self.turn_in += 1
+
+        if self._last_arrival is not None:
+            interval = now - self._last_arrival
+            if self._last_interval is not None:
+                self._count_jitter(abs(interval - self._last_interval) * 1000)
+            self._last_interval = interval
+        self._last_arrival = now
+
+    def sent(self, size, turn):
+        self.packets_out += 1
+        self.bytes_out += size
+        if turn:
+            self.turn_out += 1
+
+    def _count_jitter(self, ms):
+        for i, bound in enumerate(self.JITTER_BUCKETS):
+            if ms <= bound:
+                self.jitter[i] += 1
+                return
+        self.jitter[-1] += 1
+
+    @property
+    def path(self):
+        """
+        Which path traffic with the peer takes - 'turn', 'direct', 'mixed'
+        or None if there was no traffic yet.
+        """
+        turn = self.turn_in + self.turn_out
+        total = self.packets_in + self.packets_out
+        if total == 0:
+            return None
+        if turn == 0:
+            return 'direct'
+        if turn == total:
+            return 'turn'
+        return 'mixed'
+
+    def as_dict(self):
+        return {
+            "packets_in": self.packets_in,
+            "bytes_in": self.bytes_in,
+            "packets_out": self.packets_out,
+            "bytes_out": self.bytes_out,
+            "path": self.path,
+            "jitter_ms": dict(zip([str(b) for b in self.JITTER_BUCKETS] + ["more"],
+                                  self.jitter)),
+        }
+
+
+class RelayStats:
+    """
+    Per peer traffic counters of a TURN socket, keyed by peer address.
+    """
+    def __init__(self):
+        self.peers = {}
+        self.started = time.time()
+
+    def peer(self, addr):
+        try:
+            return self.peers[addr]
+        except KeyError:
+            stats = PeerStats()
+            self.peers[addr] = stats
+            return stats
+
+    def as_dict(self):
+        return {
+            "duration": round(time.time() - self.started, 1),
+            "peers": {"{}:{}".format(*addr): stats.as_dict()
+                      for addr, stats in self.peers.items()},
+        }
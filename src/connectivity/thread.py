@@ -0,0 +1,69 @@
+from functools import partial
+
+from PyQt5.QtCore import QObject, QThread, Qt, pyqtSignal, pyqtSlot
+
+from decorators import with_logger
+
+
+@with_logger
+class _Runner(QObject):
+    @pyqtSlot(object)
+    def run(self, fn):
+        # Exceptions must not escape into Qt
+        try:
+            fn()
+        except Exception:
+            self._logger.exception("Error in network thread")
+
+
+class NetworkThread(QThread):
+    """
+    Thread running the sockets that relay game traffic, so that packets
+    keep flowing while the GUI thread is busy, e.g. showing a modal dialog.
+
+    Objects living in the thread must only be used from it. Create them and
+    talk to them with call and call_blocking. Their signals can be
+    connected to objects in the GUI thread as usual, Qt delivers them
+    through the GUI event loop.
+    """
+    _call = pyqtSignal(object)
+    _call_blocking = pyqtSignal(object)
+
+    def __init__(self):
+        QThread.__init__(self)
+        self._runner = _Runner()
+        self._runner.moveToThread(self)
+        self._call.connect(self._runner.run, Qt.QueuedConnection)
+        self._call_blocking.connect(self._runner.run, Qt.BlockingQueuedConnection)
+
+    def call(self, fn, *args):
+        """
+        Runs fn(*args) in the thread without waiting for it.
+        """
+        self._call.emit(partial(fn, *args))
+
+    def call_blocking(self, fn, *args):
+        """
+        Runs fn(*args) in the thread and returns its result. Exceptions are
+        raised in the caller.
+        """
+        if QThread.currentThread() is self:
+            return fn(*args)
+
+        result = []
+
+        def run():
+            try:
+                result.append((True, fn(*args)))
+            except Exception as e:
+                result.append((False, e))
+
+        self._call_blocking.emit(run)
+        ok, value = result[0]
+        if not ok:
+            raise value
+        return value
+
+    def stop(self):
+        self.quit()
+        self.wait()
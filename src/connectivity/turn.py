@@ -24,7 +24,8 @@ class TURNSession(metaclass=ABCMeta):
     def __init__(self):
         self._pending_tx = {}
         self.logger = logging.getLogger(__name__)
-        self.bindings = {}
+        self.bindings = {}      # Address -> channel
+        self.channels = {}      # Channel -> address
         self._next_channel = 0x4000
         self.permissions = {}
         self._pending_bindings = []
@@ -32,6 +33,7 @@ class TURNSession(metaclass=ABCMeta):
         self.mapped_addr = (None, None)
         self.relayed_addr = (None, None)
         self.lifetime = 0
+        self.retransmits = 0
 
     @abstractmethod
     def _write(self, bytes):
@@ -91,6 +93,24 @@ class TURNSession(metaclass=ABCMeta):
         except:
             return False
 
+    def handle_channel_data(self, data):
+        """
+        Fast path for relayed peer traffic. Passes the payload of a
+        ChannelData frame on a bound channel to _recvfrom without going
+        through the STUN message parser.
+
+        :param data: buffer received from the TURN server
+        :return: whether data was such a frame
+        """
+        if len(data) < 4:
+            return False
+        channel, length = TURNSession._channeldata_format.unpack_from(data)
+        peer = self.channels.get(channel)
+        if peer is None:
+            return False
+        self._recvfrom(peer, memoryview(data)[4:4 + length])
+        return True
+
     def bind(self, addr):
         if addr in self.bindings or addr in [addr for (_, addr, _)
                                              in self._pending_bindings]:
@@ -117,8 +137,8 @@ class TURNSession(metaclass=ABCMeta):
     _channeldata_format = struct.Struct('!HH')
     def send_to(self, data, addr):
         if isinstance(addr, int):
-            msg = struct.pack('!HH', addr, len(data))
-            self._write(msg + data)
+            header = TURNSession._channeldata_format.pack(addr, len(data))
+            self._write(header + data)
         elif addr in self.bindings:
             header = TURNSession._channeldata_format.pack(self.bindings[addr], len(data))
             self._write(header + data)
@@ -131,6 +151,7 @@ class TURNSession(metaclass=ABCMeta):
         if not self.state == TURNState.STOPPED:
             for tx, msg in list(self._pending_tx.items()):
                 self.logger.debug("Retransmitting {}".format(tx))
+                self.retransmits += 1
                 # avoid retransmitting retransmissions
                 self._write(msg.to_bytes())
             self._call_in(self._retransmit, 1)
@@ -159,6 +180,7 @@ class TURNSession(metaclass=ABCMeta):
                 if txid == stun_msg.transaction_id:
                     self.logger.info("Successfully bound {}:{} to {}".format(addr, port, channel_id))
                     self.bindings[(addr, port)] = channel_id
+                    self.channels[channel_id] = (addr, port)
                     self.channel_bound((addr, port), channel_id)
                     self._pending_bindings.remove((txid, (addr,port), channel_id))
         elif stun_msg.method_str == 'CreatePermissionSuccess':
@@ -3,6 +3,7 @@ from PyQt5 import QtWidgets, QtCore
 import urllib.request, urllib.error, urllib.parse
 import logging
 import os
+import time
 import util
 import warnings
 from config import Settings
@@ -13,13 +14,23 @@ logger = logging.getLogger(__name__)
 class FileDownload(object):
     """
     A simple async one-shot file downloader.
+
+    If resume_from is given, only the rest of the file is requested, to be
+    appended to dest. resume_validator is the ETag or Last-Modified of the
+    reply the partial file came from; the rest is only sent if the file
+    didn't change since. If the server sends the whole file anyway, dest is
+    truncated first.
     """
     def __init__(self, nam, addr, dest, destpath=None,
-                 start=lambda _: None, progress=lambda _: None, finished=lambda _: None):
+                 start=lambda _: None, progress=lambda _: None, finished=lambda _: None,
+                 resume_from=0, resume_validator=None):
         self._nam = nam
         self.addr = addr
         self.dest = dest
         self.destpath = destpath
+        self.resume_from = resume_from
+        self.resume_validator = resume_validator
+        self._resume_checked = False
 
         self.canceled = False
         self.error = False
@@ -27,6 +38,8 @@ class FileDownload(object):
         self.blocksize = 8192
         self.bytes_total = 0
         self.bytes_progress = 0
+        # Size of the whole file, if the server told us
+        self.file_size = None
 
         self._dfile = None
 
@@ -51,11 +64,18 @@ class FileDownload(object):
     def cancel(self):
         self.canceled = True
         self._stop()
+        if self._dfile is not None:
+            self._dfile.abort()
+
+    def status_code(self):
+        if self._dfile is None:
+            return None
+        return self._dfile.attribute(QNetworkRequest.HttpStatusCodeAttribute)
 
     def _finish(self):
         # check status code
-        statusCode = self._dfile.attribute(QNetworkRequest.HttpStatusCodeAttribute)
-        if statusCode != 200:
+        statusCode = self.status_code()
+        if statusCode not in (200, 206):
             logger.warning('Download failed: %s -> %s', self.addr, statusCode)
             self.error = True
         self.cb_finished(self)
@@ -66,6 +86,10 @@ class FileDownload(object):
         req.setRawHeader(b'User-Agent', b"FAF Client")
         req.setAttribute(QNetworkRequest.FollowRedirectsAttribute, True)
         req.setMaximumRedirectsAllowed(3)
+        if self.resume_from > 0:
+            req.setRawHeader(b'Range', 'bytes={}-'.format(self.resume_from).encode())
+            if self.resume_validator:
+                req.setRawHeader(b'If-Range', self.resume_validator.encode())
 
         self.cb_start(self)
 
@@ -99,7 +123,56 @@ class FileDownload(object):
             # Either way we've read everything after it was marked
             self._stop()
 
+    def validator(self):
+        """
+        Returns the ETag or Last-Modified of the reply, to resume it with, or
+        None if the server sent neither.
+        """
+        if self._dfile is None:
+            return None
+        etag = bytes(self._dfile.rawHeader(b'ETag')).decode('latin-1')
+        # Weak ETags can't be used for ranges
+        if etag and not etag.startswith('W/'):
+            return etag
+        modified = bytes(self._dfile.rawHeader(b'Last-Modified')).decode('latin-1')
+        return modified or None
+
+    def _content_range(self):
+        # (first byte, file size) of a 206 reply, file size None if unknown
+        header = bytes(self._dfile.rawHeader(b'Content-Range')).decode('latin-1')
+        try:
+            _, _, rest = header.partition(' ')
+            span, _, size = rest.partition('/')
+            first = int(span.split('-')[0])
+            return first, (None if size == '*' else int(size))
+        except ValueError:
+            return None, None
+
+    def _check_resumed(self):
+        self._resume_checked = True
+        status = self.status_code()
+        if status == 206:
+            first, self.file_size = self._content_range()
+            if first != self.resume_from:
+                logger.warning('Server sent the wrong range for %s', self.addr)
+                self._error()
+                self._dfile.abort()
+            return
+        length = self._dfile.header(QNetworkRequest.ContentLengthHeader)
+        if status == 200 and length is not None:
+            self.file_size = int(length)
+        if self.resume_from == 0:
+            return
+        logger.debug('Server did not resume %s, starting over', self.addr)
+        self.dest.seek(0)
+        self.dest.truncate()
+        self.resume_from = 0
+
     def _readloop(self):
+            if not self._resume_checked:
+                self._check_resumed()
+                if not self._running:
+                    return
             bs = self.blocksize if self.blocksize is not None else self._dfile.bytesAvailable()
             self.dest.write(self._dfile.read(bs))
             self.cb_progress(self)
@@ -179,6 +252,80 @@ class PreviewDownload(QtCore.QObject):
         return not self._dl.succeeded()
 
 
+class BackgroundTask(QtCore.QObject):
+    """
+    Runs a function on a thread pool. The result is reported with the done
+    signal, which is delivered in the thread that connected to it. Errors
+    are logged and reported as a None result.
+
+    Pools should live as long as the application. Destroying one from
+    Python while a task is finishing deadlocks on the GIL.
+    """
+    done = QtCore.pyqtSignal(object)
+
+    def __init__(self, fn, *args):
+        QtCore.QObject.__init__(self)
+        self._fn = fn
+        self._args = args
+
+    def start(self, pool=None):
+        if pool is None:
+            pool = QtCore.QThreadPool.globalInstance()
+        pool.start(_BackgroundRunnable(self))
+
+    def _run(self):
+        try:
+            result = self._fn(*self._args)
+        except Exception:
+            logger.exception("Background task failed")
+            result = None
+        self.done.emit(result)
+
+
+class _BackgroundRunnable(QtCore.QRunnable):
+    def __init__(self, task):
+        QtCore.QRunnable.__init__(self)
+        self._task = task
+
+    def run(self):
+        self._task._run()
+
+
+class PreviewGeneration(QtCore.QObject):
+    """
+    Makes a preview locally instead of downloading it. Behaves like a
+    PreviewDownload, remembering the url to download from if it fails.
+    """
+    done = QtCore.pyqtSignal(object, object)
+
+    def __init__(self, pool, name, generate, url):
+        QtCore.QObject.__init__(self)
+        self.requests = set()
+        self.name = name
+        self.url = url
+        self._path = None
+        self._task = BackgroundTask(generate, name)
+        self._task.done.connect(self._finished)
+        self._task.start(pool)
+
+    def remove_request(self, req):
+        self.requests.remove(req)
+
+    def add_request(self, req):
+        self.requests.add(req)
+
+    def _finished(self, path):
+        self._path = path
+        if self.failed():
+            logger.debug("Local preview failed for: {}".format(self.name))
+        else:
+            logger.debug("Local preview made for: {}".format(self.name))
+        self.done.emit(self, (path, False))
+
+    def failed(self):
+        return self._path is None
+
+
 class PreviewDownloadRequest(QtCore.QObject):
     done = QtCore.pyqtSignal(object, object)
 
@@ -210,16 +357,30 @@ class PreviewDownloader(QtCore.QObject):
     we were downloading' issue).
 
     Requests can be resubmitted. That reclassifies them to a new name.
+
+    If a generator is given, previews it can make itself are made on the
+    global thread pool instead, falling back to a download if that fails.
+    The generator needs a can_generate(name) method, and a generate(name)
+    method returning a path or None that is safe to call from any thread.
+
+    Failed previews are remembered for PREVIEW_FAILED_TTL seconds. Requests
+    for them in the meantime fail right away.
     """
     PREVIEW_REDOWNLOAD_TIMEOUT = 5 * 60 * 1000
     PREVIEW_DOWN_FAILS_TO_TIMEOUT = 3
+    PREVIEW_FAILED_TTL = 60
+
+    previewAvailable = QtCore.pyqtSignal(str)
 
-    def __init__(self, target_dir, default_url_prefix):
+    def __init__(self, target_dir, default_url_prefix, generator=None):
         QtCore.QObject.__init__(self)
         self._nam = QNetworkAccessManager(self)
         self._target_dir = target_dir
         self._default_url_prefix = default_url_prefix
+        self._generator = generator
+        self._pool = QtCore.QThreadPool.globalInstance()
         self._downloads = {}
+        self._failed = {}   # Name -> (expiry time, result)
         self._timeouts = DownloadTimeouts(self.PREVIEW_REDOWNLOAD_TIMEOUT,
                                           self.PREVIEW_DOWN_FAILS_TO_TIMEOUT)
 
@@ -228,8 +389,28 @@ class PreviewDownloader(QtCore.QObject):
         if target_url is None:
             msg = "Missing url for a preview download {}".format(name)
             raise ValueError(msg)
+        failed = self._recently_failed(name)
+        if failed is not None:
+            req.dl = None
+            QtCore.QTimer.singleShot(0, lambda: req.finished(name, failed))
+            return
         self._add_request(name, req, target_url)
 
+    def _recently_failed(self, name):
+        try:
+            expiry, result = self._failed[name]
+        except KeyError:
+            return None
+        if time.monotonic() < expiry:
+            return result
+        del self._failed[name]
+        return None
+
+    def _add_failed(self, name, result):
+        now = time.monotonic()
+        self._failed = {k: v for k, v in self._failed.items() if v[0] > now}
+        self._failed[name] = (now + self.PREVIEW_FAILED_TTL, result)
+
     def _target_url(self, name, url):
         if url is not None:
             return url
@@ -243,21 +424,41 @@ class PreviewDownloader(QtCore.QObject):
         dl = self._downloads[name]
         req.dl = dl
 
-    def _add_download(self, name, url):
-        if self._timeouts.on_timeout(name):
-            delay = self._timeouts.timer
+    def _add_download(self, name, url, generate=True):
+        if (generate and self._generator is not None
+                and self._generator.can_generate(name)):
+            dl = PreviewGeneration(self._pool, name,
+                                   self._generator.generate, url)
         else:
-            delay = None
-        dl = PreviewDownload(self._nam, name, url, self._target_dir, delay)
+            if self._timeouts.on_timeout(name):
+                delay = self._timeouts.timer
+            else:
+                delay = None
+            dl = PreviewDownload(self._nam, name, url, self._target_dir,
+                                 delay)
         dl.done.connect(self._finished_download)
         self._downloads[name] = dl
 
     def _finished_download(self, dl, result):
-        self._timeouts.update_fail_count(dl.name, dl.failed())
+        generated = isinstance(dl, PreviewGeneration)
+        if not generated:
+            self._timeouts.update_fail_count(dl.name, dl.failed())
         requests = set(dl.requests)     # Don't change it during iteration
         for req in requests:
             req.dl = None
         del self._downloads[dl.name]
+
+        if generated and dl.failed():
+            # Try the server instead
+            self._add_download(dl.name, dl.url, generate=False)
+            for req in requests:
+                req.dl = self._downloads[dl.name]
+            return
+
+        if dl.failed():
+            self._add_failed(dl.name, result)
+        else:
+            self.previewAvailable.emit(dl.name)
         for req in requests:
             req.finished(dl.name, result)
 
@@ -1,7 +1,6 @@
 import logging
 import os
 import zipfile
-import binascii
 
 from PyQt5 import QtWidgets
 
@@ -11,6 +10,7 @@ from fa.mods import checkMods
 from fa.path import writeFAPathLua, validatePath
 from fa.wizards import Wizard
 import util
+from util import digests
 
 logger = logging.getLogger(__name__)
 
@@ -71,8 +71,7 @@ def game(parent):
 
 def crc32(fname):
     try:
-        with open(fname) as stream:
-            return binascii.crc32(stream.read())
+        return digests.cache().crc32(fname)
     except:
         logger.exception('CRC check fail!')
         return None
@@ -109,6 +108,8 @@ def checkMovies(files):
                     if not os.path.exists(tgtpath) or os.stat(tgtpath).st_size != zi.file_size or crc32(tgtpath) != zi.CRC:
                         zf.extract(zi, util.APPDATA_DIR)
 
+    digests.cache().save()
+
 
 def check(featured_mod, mapname=None, version=None, modVersions=None, sim_mods=None, silent=False):
     """
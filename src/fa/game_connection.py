@@ -1,8 +1,112 @@
-from PyQt5.QtCore import QObject, pyqtSignal, QDataStream
-from struct import pack, unpack
+from PyQt5.QtCore import QObject, pyqtSignal
+import struct
 
 from decorators import with_logger
 
+FIELD_INT = 0
+FIELD_STRING = 1
+
+
+def _unescape(value):
+    if "/" not in value:
+        return value
+    return value.replace("/t", "\t").replace("/n", "\n")
+
+
+def packMessage(command, args):
+    """
+    Encodes a GPGNet message - a command and a list of ints and strings.
+    """
+    command = command.encode()
+    parts = [struct.pack("<I", len(command)), command,
+             struct.pack("<I", len(args))]
+    for val in args:
+        if isinstance(val, int):
+            parts.append(struct.pack("<bi", FIELD_INT, val))
+        elif isinstance(val, str):
+            data = val.encode()
+            parts.append(struct.pack("<bi", FIELD_STRING, len(data)))
+            parts.append(data)
+        else:
+            raise Exception("Unknown GameConnection Field Type: %s" % type(val))
+    return b"".join(parts)
+
+
+class GPGNetParser:
+    """
+    Incremental parser for the GPGNet stream. Data is fed in as it arrives,
+    complete messages are returned as (command, args) and partial ones stay
+    buffered until the rest arrives.
+
+    A message is a length-prefixed command string, followed by a count of
+    fields, each an int or a length-prefixed string. All little endian.
+    """
+    _length = struct.Struct("<I")
+    _field = struct.Struct("<bi")
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        """
+        Adds received data and returns the list of messages completed by it.
+        Raises ValueError if the stream is corrupt.
+        """
+        buf = self._buffer
+        buf += data
+        messages = []
+        pos = 0
+        with memoryview(buf) as view:
+            while True:
+                message, end = self._parse(buf, view, pos)
+                if message is None:
+                    break
+                messages.append(message)
+                pos = end
+        if pos:
+            del buf[:pos]
+        return messages
+
+    def pending(self):
+        """
+        Number of buffered bytes that don't form a complete message yet.
+        """
+        return len(self._buffer)
+
+    def _parse(self, buf, view, pos):
+        length, field = self._length, self._field
+        end = len(buf)
+
+        if end - pos < 4:
+            return None, pos
+        size, = length.unpack_from(buf, pos)
+        pos += 4
+        if end - pos < size + 4:
+            return None, pos
+        command = str(view[pos:pos + size], "utf-8")
+        pos += size
+        nfields, = length.unpack_from(buf, pos)
+        pos += 4
+
+        args = []
+        for _ in range(nfields):
+            if end - pos < 5:
+                return None, pos
+            ftype, fsize = field.unpack_from(buf, pos)
+            pos += 5
+            if ftype == FIELD_INT:
+                args.append(fsize)
+            elif ftype == FIELD_STRING:
+                if fsize < 0:
+                    raise ValueError("Negative GameConnection string size")
+                if end - pos < fsize:
+                    return None, pos
+                args.append(_unescape(str(view[pos:pos + fsize], "utf-8")))
+                pos += fsize
+            else:
+                raise ValueError("Unknown GameConnection Field Type: %d" % ftype)
+        return (command, args), pos
+
 
 @with_logger
 class GPGNetConnection(QObject):
@@ -18,90 +122,21 @@ class GPGNetConnection(QObject):
         self._socket = tcp_connection
         self._socket.readyRead.connect(self._onReadyRead)
         self._socket.disconnected.connect(lambda: self.closed.emit())
-        self.header = None
-        self.nchunks = -1
-        self.chunks = None
+        self._parser = GPGNetParser()
 
     def send(self, command, *args):
         self._logger.info("GC<<: {}:{}".format(command, args))
-        ds = QDataStream(self._socket)
-        ds.setByteOrder(QDataStream.LittleEndian)
-
-        # Header
-        ds.writeUInt32(len(command))
-        ds.writeRawData(command.encode())
-
-        # Chunks
-        ds.writeUInt32(len(args))
-
-        for chunk in args:
-            ds.writeRawData(self._packLuaVal(chunk))
-
-    def _packLuaVal(self, val):
-        if isinstance(val, int):
-            return pack("=bi", 0, val)
-        elif isinstance(val, str) or isinstance(val, str):
-            return pack("=bi%ds" % len(val), 1, len(val), val.encode())
-        else:
-            raise Exception("Unknown GameConnection Field Type: %s" % type(val))
-
-    def _readLuaVal(self, ds):
-        if self._socket.bytesAvailable() < 5:
-            return None
-
-        fieldType, fieldSize = unpack('=bl', self._socket.peek(5))
-
-        if fieldType == 0:
-            ds.readRawData(5)
-            return fieldSize
-        elif fieldType == 1:
-            if self._socket.bytesAvailable() < fieldSize + 5:
-                return None
-
-            ds.readRawData(5)
-
-            datastring = ds.readRawData(fieldSize).decode('utf-8')
-            fixedStr = datastring.replace("/t","\t").replace("/n","\n")
-
-            return str(fixedStr)
-        else:
-            raise Exception("Unknown GameConnection Field Type: %d" % fieldType)
+        self._socket.write(packMessage(command, args))
 
     # Non-reentrant
     def _onReadyRead(self):
-        while self._socket.bytesAvailable() >= 4:
-            ds = QDataStream(self._socket)
-            ds.setByteOrder(QDataStream.LittleEndian)
-
-            # Header packet
-            if self.header is None:
-                size, = unpack('=l', self._socket.peek(4))
-
-                if self._socket.bytesAvailable() < size + 4:
-                    return
-
-                # Omit size
-                ds.readUInt32()
-
-                self.header = ds.readRawData(size).decode()
-
-            # Chunks packet
-            else:
-                if self.nchunks == -1:
-                    self.nchunks = ds.readUInt32()
-                    self.chunks = []
-
-                while len(self.chunks) < self.nchunks:
-                    chunk = self._readLuaVal(ds)
-
-                    if chunk is None:
-                        return
-
-                    self.chunks.append(chunk)
-
-                # Packet pair reading done.
-                self._logger.info("GC >> : %s : %s", self.header, self.chunks)
-                self.messageReceived.emit(self.header, self.chunks)
-                self.header = None
-                self.nchunks = -1
-                self.chunks = None
+        try:
+            messages = self._parser.feed(self._socket.readAll().data())
+        except (ValueError, UnicodeDecodeError):
+            self._logger.exception("Corrupt GPGNet stream, closing connection")
+            self._socket.abort()
+            return
+
+        for command, args in messages:
+            self._logger.info("GC >> : %s : %s", command, args)
+            self.messageReceived.emit(command, args)
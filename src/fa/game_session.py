@@ -1,9 +1,11 @@
-from PyQt5.QtCore import QObject, pyqtSignal
+import json
+
+from PyQt5.QtCore import QObject, pyqtSignal, QTimer
 from PyQt5.QtNetwork import QTcpServer, QHostAddress
 from enum import IntEnum
 
 from connectivity.turn import TURNState
-from config import setup_file_handler
+from config import Settings, setup_file_handler
 from fa.game_connection import GPGNetConnection
 from fa.game_process import instance
 
@@ -28,6 +30,9 @@ class GameSessionState(IntEnum):
 
 
 class GameSession(QObject):
+    # Seconds between relay statistics dumps while a game runs
+    RELAY_STATS_INTERVAL = 60
+
     ready = pyqtSignal()
     gameFullSignal = pyqtSignal()
 
@@ -69,6 +74,10 @@ class GameSession(QObject):
         # We only allow one game connection at a time
         self._game_connection = None
 
+        # Relay statistics are logged periodically during games if enabled
+        self._stats_timer = QTimer(self)
+        self._stats_timer.timeout.connect(self._dump_relay_stats)
+
         self._process = instance  # type:'GameProcess'
         self._process.started.connect(self._launched)
         self._process.finished.connect(self._exited)
@@ -154,6 +163,14 @@ class GameSession(QObject):
         self._game_connection = GPGNetConnection(self._game_listener.nextPendingConnection())
         self._game_connection.messageReceived.connect(self._on_game_message)
         self.state = GameSessionState.RUNNING
+        if Settings.get('game/relay_stats', type=bool, default=False):
+            self.connectivity.enable_stats()
+            self._stats_timer.start(self.RELAY_STATS_INTERVAL * 1000)
+
+    def _dump_relay_stats(self):
+        report = self.connectivity.stats_report()
+        if report is not None:
+            logger.info("Relay stats: {}".format(json.dumps(report)))
 
     @_needs_game_connection
     def _on_game_message(self, command, args):
@@ -186,6 +203,10 @@ class GameSession(QObject):
     def _exited(self, status):
         self._game_connection = None
         self.state = GameSessionState.OFF
+        if self._stats_timer.isActive():
+            self._stats_timer.stop()
+            self._dump_relay_stats()
+            self.connectivity.disable_stats()
         logger.info("Game has exited with status code: {}".format(status))
         self.send('GameState', ['Ended'])
 
@@ -13,7 +13,9 @@ import shutil
 import urllib.request, urllib.error, urllib.parse
 import zipfile
 import tempfile
+import time
 import re
+from collections import OrderedDict
 # module imports
 import fa
 # local imports
@@ -32,6 +34,72 @@ from model.game import OFFICIAL_MAPS as maps
 __exist_maps = None
 
 
+class DirectoryIndex:
+    """
+    Case-insensitive index of the entries of a directory, so that lookups
+    don't have to list the directory each time. The directory is relisted
+    when its mtime changes. The mtime is checked at most once every
+    CHECK_INTERVAL seconds, unless a lookup misses and asks for a check.
+    """
+    CHECK_INTERVAL = 2
+
+    def __init__(self, get_path):
+        self._get_path = get_path
+        self._path = None
+        self._mtime = None
+        self._last_check = None
+        self._names = {}
+
+    def path(self):
+        return self._get_path()
+
+    def invalidate(self):
+        self._last_check = None
+        self._mtime = None
+
+    def _refresh(self, force_check=False):
+        path = self._get_path()
+        now = time.monotonic()
+        if (not force_check and path == self._path
+                and self._last_check is not None
+                and now - self._last_check < self.CHECK_INTERVAL):
+            return
+        self._last_check = now
+
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if path == self._path and mtime == self._mtime:
+            return
+
+        self._path = path
+        self._mtime = mtime
+        try:
+            names = os.listdir(path) if mtime is not None else []
+        except OSError:
+            names = []
+        self._names = {name.lower(): name for name in names}
+
+    def get(self, name, check_on_miss=False):
+        """
+        Returns the actual name of the entry matching name, or None.
+        """
+        self._refresh()
+        found = self._names.get(name.lower())
+        if found is None and check_on_miss:
+            self._refresh(force_check=True)
+            found = self._names.get(name.lower())
+        return found
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def names(self):
+        self._refresh()
+        return list(self._names.values())
+
+
 def isBase(mapname):
     """
     Returns true if mapname is the name of an official map
@@ -40,10 +108,7 @@ def isBase(mapname):
 
 
 def getUserMaps():
-    maps = []
-    if os.path.isdir(getUserMapsFolder()):
-        maps = os.listdir(getUserMapsFolder())
-    return maps
+    return _user_maps.names()
 
 
 def getDisplayName(filename):
@@ -116,15 +181,11 @@ def isMapFolderValid(folder):
 
 def existMaps(force=False):
     global __exist_maps
+    if force:
+        _user_maps.invalidate()
+        _base_maps.invalidate()
     if force or __exist_maps is None:
-
-        __exist_maps = getUserMaps()
-
-        if os.path.isdir(getBaseMapsFolder()):
-            if __exist_maps is None:
-                __exist_maps = os.listdir(getBaseMapsFolder())
-            else:
-                __exist_maps.extend(os.listdir(getBaseMapsFolder()))
+        __exist_maps = _user_maps.names() + _base_maps.names()
     return __exist_maps
 
 
@@ -135,12 +196,7 @@ def isMapAvailable(mapname):
     if isBase(mapname):
         return True
 
-    if os.path.isdir(getUserMapsFolder()):
-        for infile in os.listdir(getUserMapsFolder()):
-            if infile.lower() == mapname.lower():
-                return True
-
-    return False
+    return mapname in _user_maps
 
 
 def folderForMap(mapname):
@@ -150,14 +206,20 @@ def folderForMap(mapname):
     if isBase(mapname):
         return os.path.join(getBaseMapsFolder(), mapname)
 
-    if os.path.isdir(getUserMapsFolder()):
-        for infile in os.listdir(getUserMapsFolder()):
-            if infile.lower() == mapname.lower():
-                return os.path.join(getUserMapsFolder(), mapname)
+    folder = _user_maps.get(mapname)
+    if folder is not None:
+        return os.path.join(getUserMapsFolder(), folder)
 
     return None
 
 
+def _is_local_map(mapname):
+    # Map folders given by path can be anywhere
+    if os.path.dirname(mapname):
+        return True
+    return mapname in _user_maps or mapname in _base_maps
+
+
 def getBaseMapsFolder():
     """
     Returns the folder containing all the base maps for this client.
@@ -181,36 +243,83 @@ def getUserMapsFolder():
         "Maps")
 
 
+_user_maps = DirectoryIndex(getUserMapsFolder)
+_base_maps = DirectoryIndex(getBaseMapsFolder)
+_cached_previews = DirectoryIndex(lambda: util.MAP_PREVIEW_DIR)
+
+
+DDS_HEADER_SIZE = 128
+
+
+def readDDSFromMap(mapfilename):
+    """
+    Returns the preview DDS embedded in a .scmap file
+    """
+    with open(mapfilename, "rb") as mapfile:
+        """
+        magic = struct.unpack('i', mapfile.read(4))[0]
+        version_major = struct.unpack('i', mapfile.read(4))[0]
+        unk_edfe = struct.unpack('i', mapfile.read(4))[0]
+        unk_efbe = struct.unpack('i', mapfile.read(4))[0]
+        width = struct.unpack('f', mapfile.read(4))[0]
+        height = struct.unpack('f', mapfile.read(4))[0]
+        unk_32 = struct.unpack('i', mapfile.read(4))[0]
+        unk_16 = struct.unpack('h', mapfile.read(2))[0]
+        """
+        mapfile.seek(30)  # Shortcut. Maybe want to clean out some of the magic numbers some day
+        size = struct.unpack('i', mapfile.read(4))[0]
+        return mapfile.read(size)
+
+
+def ddsToImage(data):
+    """
+    Converts supcom's dds data (format: bgra8888) to an opaque QImage
+    """
+    pixels = memoryview(data)[DDS_HEADER_SIZE:]
+    height, width = struct.unpack_from("<II", data, 12)
+    if width * height * 4 != len(pixels):
+        # Not a header we understand, assume a square image like supcom does
+        width = height = int((len(pixels) // 4) ** (1.0/2))
+    pixels = pixels[:width * height * 4]
+
+    if sys.byteorder == "little":
+        # BGRA bytes are exactly how QImage stores ARGB32 pixels in memory
+        image = QtGui.QImage(pixels.tobytes(), width, height, width * 4,
+                             QtGui.QImage.Format_ARGB32)
+        return image.convertToFormat(QtGui.QImage.Format_RGB32)
+
+    rgb = bytearray(width * height * 3)
+    rgb[0::3] = pixels[2::4]
+    rgb[1::3] = pixels[1::4]
+    rgb[2::3] = pixels[0::4]
+    image = QtGui.QImage(bytes(rgb), width, height, width * 3,
+                         QtGui.QImage.Format_RGB888)
+    return image.copy()
+
+
+def genPrevFromDDSData(data, destname, small=False):
+    """
+    Saves dds data (format: bgra8888) as a png
+    """
+    try:
+        image = ddsToImage(data)
+    except struct.error:
+        raise IOError("Invalid DDS data for {}".format(destname))
+    if small:
+        image = image.scaled(100, 100,
+                             transformMode=QtCore.Qt.SmoothTransformation)
+    if not image.save(destname):
+        raise IOError("Failed to save preview to {}".format(destname))
+
+
 def genPrevFromDDS(sourcename, destname, small=False):
     """
     this opens supcom's dds file (format: bgra8888) and saves to png
     """
     try:
-        img = bytearray()
-        buf = bytearray(16)
-        file = open(sourcename, "rb")
-        file.seek(128)  # skip header
-        while file.readinto(buf):
-            img += buf[:3] + buf[4:7] + buf[8:11] + buf[12:15]
-        file.close()
-
-        size = int((len(img)/3) ** (1.0/2))
-        if small:
-            imageFile = QtGui.QImage(
-                img,
-                size,
-                size,
-                QtGui.QImage.Format_RGB888).rgbSwapped().scaled(
-                    100,
-                    100,
-                    transformMode=QtCore.Qt.SmoothTransformation)
-        else:
-            imageFile = QtGui.QImage(
-                img,
-                size,
-                size,
-                QtGui.QImage.Format_RGB888).rgbSwapped()
-        imageFile.save(destname)
+        with open(sourcename, "rb") as ddsfile:
+            data = ddsfile.read()
+        genPrevFromDDSData(data, destname, small)
     except IOError:
         logger.debug('IOError exception in genPrevFromDDS', exc_info=True)
         raise
@@ -271,6 +380,7 @@ def __exportPreviewFromMap(mapname, positions=None):
         smallExists = True
         # save it in cache folder
         shutil.copyfile(previewsmallname, cachepngname)
+        _cached_previews.invalidate()
         # checking if file was copied correctly, just in case
         if os.path.isfile(cachepngname):
             previews["cache"] = cachepngname
@@ -290,29 +400,17 @@ def __exportPreviewFromMap(mapname, positions=None):
         previews["tozip"].append(previewddsname)
         ddsExists = True
 
-    if not ddsExists:
+    # The DDS file is only needed when packing the map for upload,
+    # previews can be made straight from the .scmap
+    ddsdata = None
+    if not ddsExists and (not smallExists or positions is not None):
         logger.debug("Extracting preview DDS from .scmap for: " + mapname)
-        mapfile = open(mapfilename, "rb")
-        """
-        magic = struct.unpack('i', mapfile.read(4))[0]
-        version_major = struct.unpack('i', mapfile.read(4))[0]
-        unk_edfe = struct.unpack('i', mapfile.read(4))[0]
-        unk_efbe = struct.unpack('i', mapfile.read(4))[0]
-        width = struct.unpack('f', mapfile.read(4))[0]
-        height = struct.unpack('f', mapfile.read(4))[0]
-        unk_32 = struct.unpack('i', mapfile.read(4))[0]
-        unk_16 = struct.unpack('h', mapfile.read(2))[0]
-        """
-        mapfile.seek(30)  # Shortcut. Maybe want to clean out some of the magic numbers some day
-        size = struct.unpack('i', mapfile.read(4))[0]
-        data = mapfile.read(size)
-        # version_minor = struct.unpack('i', mapfile.read(4))[0]
-        mapfile.close()
-        # logger.debug("SCMAP version %i.%i" % (version_major, version_minor))
+        ddsdata = readDDSFromMap(mapfilename)
 
+    if not ddsExists and positions is not None:
         try:
             with open(previewddsname, "wb") as previewfile:
-                previewfile.write(data)
+                previewfile.write(ddsdata)
 
                 # checking if file was created correctly, just in case
                 if os.path.isfile(previewddsname):
@@ -323,12 +421,19 @@ def __exportPreviewFromMap(mapname, positions=None):
         except IOError:
             pass
 
+    def makePreview(destname, small):
+        if ddsdata is not None:
+            genPrevFromDDSData(ddsdata, destname, small)
+        else:
+            genPrevFromDDS(previewddsname, destname, small)
+
     if not smallExists:
         logger.debug("Making small preview from DDS for: " + mapname)
         try:
-            genPrevFromDDS(previewddsname, previewsmallname, small=True)
+            makePreview(previewsmallname, small=True)
             previews["tozip"].append(previewsmallname)
             shutil.copyfile(previewsmallname, cachepngname)
+            _cached_previews.invalidate()
             previews["cache"] = cachepngname
         except IOError:
             logger.debug("Failed to make small preview for: " + mapname)
@@ -340,7 +445,7 @@ def __exportPreviewFromMap(mapname, positions=None):
             logger.debug("Icon positions were not passed or they were wrong for: " + mapname)
             return previews
         try:
-            genPrevFromDDS(previewddsname, previewlargename, small=False)
+            makePreview(previewlargename, small=False)
             mapimage = util.THEME.pixmap(previewlargename)
             armyicon = util.THEME.pixmap("vault/map_icons/army.png").scaled(8, 9, 1, 1)
             massicon = util.THEME.pixmap("vault/map_icons/mass.png").scaled(8, 8, 1, 1)
@@ -382,26 +487,148 @@ def __exportPreviewFromMap(mapname, positions=None):
 
     return previews
 
+def exportSmallPreview(mapname):
+    """
+    Makes the cached small preview of a local map, returning its path or None.
+    Doesn't touch any pixmaps, so it can be called outside the GUI thread.
+    """
+    previews = __exportPreviewFromMap(mapname)
+    if previews and previews["cache"] and os.path.isfile(previews["cache"]):
+        return previews["cache"]
+    return None
+
+
+class PreviewGenerator:
+    """
+    Lets a PreviewDownloader make previews of local maps in the background
+    instead of downloading them.
+    """
+    def can_generate(self, name):
+        return _is_local_map(name)
+
+    def generate(self, name):
+        return exportSmallPreview(name)
+
+
 iconExtensions = ["png"]  # "jpg" removed to have fewer of those costly 404 misses.
 
 
-def preview(mapname, pixmap=False):
-    try:
-        # Try to load directly from cache
+class PreviewCache:
+    """
+    Keeps the previews in a preview directory in memory. Holds at most
+    MAX_ENTRIES of them, dropping the least recently used ones. Previews
+    that aren't there are remembered for MISSING_TTL seconds, so that we
+    don't look for them on disk every time.
+    """
+    MAX_ENTRIES = 200
+    MISSING_TTL = 60
+
+    def __init__(self, index):
+        self._index = index
+        self._entries = OrderedDict()   # Name -> [pixmap, icon or None]
+        self._missing = {}              # Name -> expiry time
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, mapname, pixmap=False):
+        """
+        Returns the preview pixmap or icon, or None if there is none.
+        """
+        name = mapname.lower()
+        entry = self._entries.get(name)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(name)
+        elif self._is_missing(name):
+            self.hits += 1
+            return None
+        else:
+            self.misses += 1
+            entry = self._load(name)
+            if entry is None:
+                self._add_missing(name)
+                return None
+            self._entries[name] = entry
+            if len(self._entries) > self.MAX_ENTRIES:
+                self._entries.popitem(last=False)
+
+        if pixmap:
+            return entry[0]
+        if entry[1] is None:
+            entry[1] = QtGui.QIcon(entry[0])
+        return entry[1]
+
+    def _load(self, name):
+        # Previews might have been added since we last looked, so check
+        # again on a miss.
         for extension in iconExtensions:
-            img = os.path.join(util.MAP_PREVIEW_DIR, mapname + "." + extension)
-            if os.path.isfile(img):
-                logger.log(5, "Using cached preview image for: " + mapname)
-                return util.THEME.icon(img, False, pixmap)
+            filename = self._index.get(name + "." + extension,
+                                       check_on_miss=True)
+            if filename is None:
+                continue
+            pix = QtGui.QPixmap(os.path.join(self._index.path(), filename))
+            if not pix.isNull():
+                return [pix, None]
+        return None
 
-        # Try to find in local map folder
-        img = __exportPreviewFromMap(mapname)
+    def _is_missing(self, name):
+        expiry = self._missing.get(name)
+        if expiry is None:
+            return False
+        if time.monotonic() < expiry:
+            return True
+        del self._missing[name]
+        return False
 
-        if img and 'cache' in img and img['cache'] and os.path.isfile(img['cache']):
-            logger.debug("Using fresh preview image for: " + mapname)
-            return util.THEME.icon(img['cache'], False, pixmap)
+    def _add_missing(self, name):
+        now = time.monotonic()
+        if len(self._missing) >= self.MAX_ENTRIES:
+            self._missing = {k: v for k, v in self._missing.items()
+                             if v > now}
+        self._missing[name] = now + self.MISSING_TTL
 
-        return None
+    def invalidate(self, mapname):
+        name = mapname.lower()
+        self._entries.pop(name, None)
+        self._missing.pop(name, None)
+
+    def clear(self):
+        self._entries.clear()
+        self._missing.clear()
+
+
+_preview_cache = PreviewCache(_cached_previews)
+
+
+def invalidatePreview(mapname):
+    """
+    Call when the cached preview of a map changes.
+    """
+    _preview_cache.invalidate(mapname)
+
+
+def preview(mapname, pixmap=False, generate=True):
+    """
+    Returns the cached preview of a map. If there is none and the map is
+    local, one is made from the map unless generate is False - callers that
+    can wait should leave that to the preview downloader instead.
+    """
+    try:
+        img = _preview_cache.get(mapname, pixmap)
+        if img is not None:
+            logger.log(5, "Using cached preview image for: " + mapname)
+            return img
+
+        if not generate or not _is_local_map(mapname):
+            return None
+
+        # Try to find in local map folder
+        if exportSmallPreview(mapname) is None:
+            return None
+
+        logger.debug("Using fresh preview image for: " + mapname)
+        invalidatePreview(mapname)
+        return _preview_cache.get(mapname, pixmap)
     except:
         logger.error("Error raised in maps.preview(...) for " + mapname)
         logger.error("Map Preview Exception", exc_info=sys.exc_info())
@@ -421,6 +648,8 @@ def downloadMap(name, silent=False):
             msg()
             return ret
 
+    _user_maps.invalidate()
+
     # Count the map downloads
     try:
         url = VAULT_COUNTER_ROOT + "?map=" + urllib.parse.quote(link)
@@ -18,6 +18,8 @@ import sys
 import tempfile
 import json
 import ast
+import collections
+from concurrent import futures
 
 import config
 from config import Settings
@@ -26,7 +28,9 @@ import fafpath
 from PyQt5 import QtWidgets, QtCore, QtNetwork
 
 import util
+from util import digests
 import modvault
+from downloadManager import FileDownload
 
 
 logger = logging.getLogger(__name__)
@@ -163,6 +167,126 @@ class UpdateConnection(object):
         self.updateSocket.write(block)
 
 
+class UpdateDownloads(QtCore.QObject):
+    """
+    Downloads update files, a few at a time. Unfinished downloads are kept in
+    the cache directory and resumed when the same url is fetched again, as
+    long as the server's copy didn't change since.
+    """
+    MAX_DOWNLOADS = 4
+    BLOCK_SIZE = 1024 * 1024
+
+    progress = QtCore.pyqtSignal()
+
+    def __init__(self, parent=None):
+        QtCore.QObject.__init__(self, parent)
+        self._nam = QtNetwork.QNetworkAccessManager(self)
+        self._queue = collections.deque()
+        self._running = {}  # Download -> (target file, callback)
+
+    def fetch(self, url, toFile, callback):
+        """
+        Downloads url to toFile, then calls callback with True on success.
+        """
+        self._queue.append((url, toFile, callback))
+        self._start_next()
+
+    def pending(self):
+        return len(self._queue) + len(self._running)
+
+    def cancel(self):
+        self._queue.clear()
+        running = list(self._running)
+        self._running.clear()
+        for dl in running:
+            dl.cancel()
+            dl.dest.close()
+
+    @staticmethod
+    def partialFile(url):
+        return os.path.join(util.CACHE_DIR, "updater", util.md5text(url) + ".part")
+
+    @staticmethod
+    def validatorFile(partpath):
+        # ETag or Last-Modified of the download a partial file came from
+        return partpath + ".validator"
+
+    def _start_next(self):
+        while self._queue and len(self._running) < self.MAX_DOWNLOADS:
+            self._start(*self._queue.popleft())
+
+    def _start(self, url, toFile, callback):
+        logger.info('Updater: Downloading {}'.format(url))
+        partpath = self.partialFile(url)
+        os.makedirs(os.path.dirname(partpath), exist_ok=True)
+        validator = self._takeValidator(partpath)
+        # Without a validator we can't tell what the partial file belongs to
+        dest = open(partpath, "ab" if validator else "wb")
+        offset = dest.tell()
+        if offset > 0:
+            log("Resuming download of %s at %d bytes." % (url, offset))
+
+        dl = FileDownload(self._nam, url, dest, partpath,
+                          progress=self._atProgress,
+                          finished=self._finished, resume_from=offset,
+                          resume_validator=validator)
+        dl.blocksize = self.BLOCK_SIZE
+        self._running[dl] = (toFile, callback)
+        dl.run()
+
+    def _takeValidator(self, partpath):
+        # The validator is removed until we know what the server sends now
+        path = self.validatorFile(partpath)
+        try:
+            with open(path) as f:
+                validator = f.read().strip()
+            os.remove(path)
+        except OSError:
+            return None
+        return validator or None
+
+    @staticmethod
+    def _removeFiles(*paths):
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _atProgress(self, dl):
+        if dl in self._running and not os.path.exists(self.validatorFile(dl.destpath)):
+            validator = dl.validator()
+            if validator is not None:
+                with open(self.validatorFile(dl.destpath), "w") as f:
+                    f.write(validator)
+        self.progress.emit()
+
+    def _finished(self, dl):
+        if dl not in self._running:   # Canceled
+            return
+        toFile, callback = self._running.pop(dl)
+        dl.dest.close()
+
+        validatorpath = self.validatorFile(dl.destpath)
+        succeeded = dl.succeeded()
+        if succeeded and dl.file_size is not None and os.path.getsize(dl.destpath) != dl.file_size:
+            logger.warning("Download of {} has the wrong size.".format(dl.addr))
+            succeeded = False
+            self._removeFiles(validatorpath)
+
+        if succeeded:
+            shutil.move(dl.destpath, toFile)
+            self._removeFiles(validatorpath)
+            digests.cache().invalidate(toFile)
+            logger.debug("File downloaded successfully.")
+        else:
+            # Broken connections can be resumed, anything else starts over
+            if dl.status_code() not in (None, 200, 206) or not os.path.exists(validatorpath):
+                self._removeFiles(dl.destpath, validatorpath)
+            logger.warning("Download of {} failed.".format(dl.addr))
+
+        self._start_next()
+        callback(succeeded)
+
+
 FormClass, BaseClass = util.THEME.loadUiType("fa/updater/updater.ui")
 
 
@@ -230,6 +354,7 @@ class Updater(QtCore.QObject, ConnectionHandler):
     SOCKET  = 9001
     HOST    = Settings.get('lobby/host')
     TIMEOUT = 20  # seconds
+    HASH_THREADS = 4
 
     # Return codes to expect from run()
     RESULT_SUCCESS = 0  # Update successful
@@ -252,6 +377,9 @@ class Updater(QtCore.QObject, ConnectionHandler):
         self.connection = UpdateConnection(self, self.HOST, self.SOCKET)
         self.lastData = time.time()
 
+        self.downloads = UpdateDownloads(self)
+        self.downloads.progress.connect(self.atDownloadProgress)
+
         self.featured_mod = featured_mod
         self.version = version
         self.modversions = modversions
@@ -308,69 +436,6 @@ class Updater(QtCore.QObject, ConnectionHandler):
         log("Update finished at " + timestamp())
         return self.result
 
-    def fetchFile(self, url, toFile):
-        try:
-            logger.info('Updater: Downloading {}'.format(url))
-            progress = QtWidgets.QProgressDialog()
-            progress.setCancelButtonText("Cancel")
-            progress.setWindowFlags(QtCore.Qt.CustomizeWindowHint | QtCore.Qt.WindowTitleHint)
-            progress.setAutoClose(True)
-            progress.setAutoReset(False)
-
-            req = urllib.request.Request(url, headers={'User-Agent': "FAF Client"})
-            downloadedfile = urllib.request.urlopen(req)
-            meta = downloadedfile.info()
-
-            # Fix for #241, sometimes the server sends an error and no content-length.
-            file_size = int(meta.get_all("Content-Length")[0])
-            progress.setMinimum(0)
-            progress.setMaximum(file_size)
-            progress.setModal(1)
-            progress.setWindowTitle("Downloading Update")
-            label = QtWidgets.QLabel()
-            label.setOpenExternalLinks(True)
-            progress.setLabel(label)
-            progress.setLabelText('Downloading FA file : <a href="' + url + '">' + url + '</a><br/>File size: ' + str(
-                int(file_size / 1024 / 1024)) + ' MiB')
-            progress.show()
-
-            # Download the file as a series of up to 4 KiB chunks, then uncompress it.
-
-            output = tempfile.NamedTemporaryFile(mode='w+b', delete=False)
-
-            file_size_dl = 0
-            block_sz = 4096
-
-            while progress.isVisible():
-                QtWidgets.QApplication.processEvents()
-                if not progress.isVisible():
-                    break
-                read_buffer = downloadedfile.read(block_sz)
-                if not read_buffer:
-                    break
-                file_size_dl += len(read_buffer)
-                output.write(read_buffer)
-                progress.setValue(file_size_dl)
-
-            output.flush()
-            os.fsync(output.fileno())
-            output.close()
-
-            shutil.move(output.name, toFile)
-
-            if (progress.value() == file_size) or progress.value() == -1:
-                logger.debug("File downloaded successfully.")
-                return True
-            else:
-                QtWidgets.QMessageBox.information(None, "Aborted", "Download not complete.")
-                logger.warning("File download not complete.")
-                return False
-        except:
-            logger.error("Updater error: ", exc_info=sys.exc_info())
-            QtWidgets.QMessageBox.information(None, "Download Failed", "The file wasn't properly sent by the server. "
-                                                                       "<br/><b>Try again later.</b>")
-            return False
-
     def updateFiles(self, destination, filegroup):
         """
         Updates the files in a given file group, in the destination subdirectory of the Forged Alliance path.
@@ -392,8 +457,10 @@ class Updater(QtCore.QObject, ConnectionHandler):
         if not os.path.exists(targetdir):
             os.makedirs(targetdir)
 
-        for fileToUpdate in self.filesToUpdate:
-            md5File = util.md5(os.path.join(util.APPDATA_DIR, destination, fileToUpdate))
+        md5s = self.hashFiles([os.path.join(targetdir, fileToUpdate)
+                               for fileToUpdate in self.filesToUpdate])
+
+        for fileToUpdate, md5File in zip(self.filesToUpdate, md5s):
             if md5File is None:
                 if self.version:
                     if self.featured_mod == "faf" or self.featured_mod == "ladder1v1" or \
@@ -419,6 +486,32 @@ class Updater(QtCore.QObject, ConnectionHandler):
 
         self.waitUntilFilesAreUpdated()
 
+    def hashFiles(self, paths):
+        """
+        Computes md5 hashes of files in a thread pool, returning None for
+        missing files. Unchanged files are looked up in the digest cache.
+        """
+        self.progress.setLabelText("Checking files...")
+        self.progress.setMinimum(0)
+        self.progress.setMaximum(len(paths))
+        self.progress.setValue(0)
+
+        cache = digests.cache()
+        with futures.ThreadPoolExecutor(max_workers=self.HASH_THREADS) as pool:
+            jobs = [pool.submit(cache.md5, path) for path in paths]
+            pending = set(jobs)
+            while pending:
+                if self.progress.wasCanceled():
+                    for job in pending:
+                        job.cancel()
+                    raise UpdaterCancellation("Operation aborted while checking files.")
+                _, pending = futures.wait(pending, timeout=0.05)
+                self.progress.setValue(len(paths) - len(pending))
+                QtWidgets.QApplication.processEvents()
+
+        cache.save()
+        return [job.result() for job in jobs]
+
     def waitForSimModPath(self):
         """
         A simple loop that waits until the server has transmitted a sim mod path.
@@ -475,7 +568,7 @@ class Updater(QtCore.QObject, ConnectionHandler):
         self.progress.setMinimum(0)
         self.progress.setMaximum(0)
 
-        while len(self.filesToUpdate) > 0:
+        while len(self.filesToUpdate) > 0 or self.downloads.pending() > 0:
             if self.progress.wasCanceled():
                 raise UpdaterCancellation("Operation aborted while waiting for data.")
 
@@ -553,6 +646,7 @@ class Updater(QtCore.QObject, ConnectionHandler):
         else:
             self.result = self.RESULT_SUCCESS
         finally:
+            self.downloads.cancel()
             self.connection.disconnect()
 
         # Hide progress dialog if it's still showing.
@@ -650,9 +744,8 @@ class Updater(QtCore.QObject, ConnectionHandler):
             url = stream.readQString()
 
             toFile = os.path.join(util.APPDATA_DIR, str(path), str(fileToCopy))
-            self.fetchFile(url, toFile)
-            self.filesToUpdate.remove(str(fileToCopy))
-            self.updatedFiles.append(str(fileToCopy))
+            self.downloads.fetch(url, toFile,
+                                 lambda ok: self.atFileFetched(str(fileToCopy), ok))
 
         elif action == "SEND_FILE":
             path = stream.readQString()
@@ -671,6 +764,7 @@ class Updater(QtCore.QObject, ConnectionHandler):
             if writeFile.open(QtCore.QIODevice.WriteOnly):
                 writeFile.write(fileDatas)
                 writeFile.close()
+                digests.cache().invalidate(toFile)
             else:
                 logger.warning("%s is not writeable in in %s. Skipping." % (
                 fileToCopy, path))  # This may or may not be desirable behavior
@@ -684,21 +778,37 @@ class Updater(QtCore.QObject, ConnectionHandler):
             fileToUpdate = str(stream.readQString())
             url = str(stream.readQString())
 
-            toFile = os.path.join(util.CACHE_DIR, "temp.patch")
-            #
-            if self.fetchFile(url, toFile):
-                completePath = os.path.join(util.APPDATA_DIR, destination, fileToUpdate)
-                self.applyPatch(completePath, toFile)
-
-                log("%s/%s is patched." % (destination, fileToUpdate))
-                self.filesToUpdate.remove(str(fileToUpdate))
-                self.updatedFiles.append(str(fileToUpdate))
-            else:
-                log("Failed to update file :'(")
+            # Patches download in parallel, so each needs its own file
+            toFile = os.path.join(util.CACHE_DIR, util.md5text(url) + ".patch")
+            self.downloads.fetch(url, toFile,
+                                 lambda ok: self.atPatchFetched(destination, fileToUpdate, toFile, ok))
         else:
             log("Unexpected server command received: " + action)
             self.result = self.RESULT_FAILURE
 
+    def atFileFetched(self, fileToCopy, ok):
+        if not ok:
+            QtWidgets.QMessageBox.information(None, "Download Failed", "The file wasn't properly sent by the server. "
+                                                                       "<br/><b>Try again later.</b>")
+        self.filesToUpdate.remove(fileToCopy)
+        self.updatedFiles.append(fileToCopy)
+
+    def atPatchFetched(self, destination, fileToUpdate, patchFile, ok):
+        if not ok:
+            log("Failed to update file :'(")
+            return
+        completePath = os.path.join(util.APPDATA_DIR, destination, fileToUpdate)
+        self.applyPatch(completePath, patchFile)
+
+        log("%s/%s is patched." % (destination, fileToUpdate))
+        self.filesToUpdate.remove(fileToUpdate)
+        self.updatedFiles.append(fileToUpdate)
+
+    def atDownloadProgress(self):
+        # Downloads don't go through the update server, keep it from timing out
+        self.lastData = time.time()
+        self.progress.setLabelText("Downloading %d file(s)..." % self.downloads.pending())
+
     def applyPatch(self, original, patch):
         toFile = os.path.join(util.CACHE_DIR, "patchedFile")
         # applying delta
@@ -708,6 +818,7 @@ class Updater(QtCore.QObject, ConnectionHandler):
             xdelta = "xdelta3"
         subprocess.call([xdelta, '-d', '-f', '-s', original, patch, toFile], stdout=subprocess.PIPE)
         shutil.copy(toFile, original)
+        digests.cache().invalidate(original)
         os.remove(toFile)
         os.remove(patch)
 
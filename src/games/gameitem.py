@@ -180,7 +180,7 @@ class GameItemFormatter:
         if game.password_protected:
             return util.THEME.icon("games/private_game.png")
 
-        icon = maps.preview(name)
+        icon = maps.preview(name, generate=False)
         if icon is not None:
             return icon
 
@@ -189,7 +189,7 @@ class GameItemFormatter:
     def needed_map_preview(self, data):
         game = data.game
         name = game.mapname.lower()
-        if game.password_protected or maps.preview(name) is not None:
+        if game.password_protected or maps.preview(name, generate=False) is not None:
             return None
         return name
 
@@ -14,14 +14,15 @@ class GameModel(QAbstractListModel):
 
         self._gameitems = {}
         self._itemlist = []  # For queries
+        self._itemrows = {}  # Item -> row in _itemlist
 
         self._gameset = gameset
         if self._gameset is not None:
             self._gameset.newGame.connect(self.add_game)
+            self._gameset.gamesBulkAdded.connect(self.add_games)
             self._gameset.newClosedGame.connect(self.remove_game)
 
-            for game in self._gameset.values():
-                self.add_game(game)
+            self.add_games(list(self._gameset.values()))
 
     def rowCount(self, parent):
         if parent.isValid():
@@ -35,42 +36,77 @@ class GameModel(QAbstractListModel):
             return None
         return self._itemlist[index.row()]
 
-    # TODO - insertion and removal are O(n). Server bandwidth would probably
-    # become a bigger issue if number of games increased too much though.
+    def item_at(self, row):
+        return self._itemlist[row]
 
     def add_game(self, game):
-        assert game.uid not in self._gameitems
-
         next_index = len(self._itemlist)
         self.beginInsertRows(QModelIndex(), next_index, next_index)
+        self._insert_item(game)
+        self.endInsertRows()
+
+    # Inserts all games as one range instead of signalling each insert
+    def add_games(self, games):
+        if not games:
+            return
+
+        first = len(self._itemlist)
+        self.beginInsertRows(QModelIndex(), first, first + len(games) - 1)
+        for game in games:
+            self._insert_item(game)
+        self.endInsertRows()
+
+    def _insert_item(self, game):
+        assert game.uid not in self._gameitems
 
         item = GameModelItem(game, self._me, self._preview_dler)
         item.updated.connect(self._at_item_updated)
 
         self._gameitems[game.uid] = item
+        self._itemrows[item] = len(self._itemlist)
         self._itemlist.append(item)
 
-        self.endInsertRows()
-
     def remove_game(self, game):
         assert game.uid in self._gameitems
 
-        item = self._gameitems[game.uid]
-        item_index = self._itemlist.index(item)
-        self.beginRemoveRows(QModelIndex(), item_index, item_index)
-
+        item = self._gameitems.pop(game.uid)
         item.updated.disconnect(self._at_item_updated)
-        del self._gameitems[game.uid]
-        self._itemlist.pop(item_index)
+        row = self._itemrows.pop(item)
+        last = len(self._itemlist) - 1
+
+        # Swap the last game into the freed row, so no other rows need
+        # renumbering. The swap is signalled as moves, so persistent
+        # indexes, selections and the current index of views follow it.
+        if row != last:
+            itemlist = self._itemlist
+            moved = itemlist[last]
+            self.beginMoveRows(QModelIndex(), last, last, QModelIndex(), row)
+            itemlist.insert(row, itemlist.pop())
+            self.endMoveRows()
+            # Unless it already is, move the removed game to the end
+            if row + 1 != last:
+                self.beginMoveRows(QModelIndex(), row + 1, row + 1,
+                                   QModelIndex(), last + 1)
+                itemlist.append(itemlist.pop(row + 1))
+                self.endMoveRows()
+            self._itemrows[moved] = row
+
+        self.beginRemoveRows(QModelIndex(), last, last)
+        self._itemlist.pop()
         self.endRemoveRows()
 
     def clear_games(self):
-        for data in list(self._gameitems.values()):
-            self.remove_game(data.game)
+        self.beginResetModel()
+        for item in self._itemlist:
+            item.updated.disconnect(self._at_item_updated)
+        self._gameitems.clear()
+        self._itemlist.clear()
+        self._itemrows.clear()
+        self.endResetModel()
 
     def _at_item_updated(self, item):
-        item_index = self._itemlist.index(item)
-        index = self.index(item_index, 0)
+        item.sort_keys.clear()
+        index = self.index(self._itemrows[item], 0)
         self.dataChanged.emit(index, index)
 
 
@@ -82,48 +118,41 @@ class GameSortModel(QSortFilterProxyModel):
         HOSTNAME = 3
         AGE = 4
 
+    # Keys to sort games by for each sort type, lower keys come first
+    _TYPE_KEYS = {
+        SortType.PLAYER_NUMBER: lambda game: -len(game.players),
+        SortType.AVERAGE_RATING: lambda game: -game.average_rating,
+        SortType.MAPNAME: lambda game: game.mapdisplayname.lower(),
+        SortType.HOSTNAME: lambda game: game.host.lower(),
+        SortType.AGE: lambda game: game.uid,
+    }
+
     def __init__(self, me, model):
         QSortFilterProxyModel.__init__(self)
         self._sort_type = self.SortType.AGE
+        self._type_key = self._TYPE_KEYS[self._sort_type]
         self._me = me
         self.setSourceModel(model)
         self.sort(0)
 
     def lessThan(self, leftIndex, rightIndex):
-        left = self.sourceModel().data(leftIndex, Qt.DisplayRole).game
-        right = self.sourceModel().data(rightIndex, Qt.DisplayRole).game
-
-        comp_list = [self._lt_friend, self._lt_type, self._lt_fallback]
-
-        for lt in comp_list:
-            if lt(left, right):
-                return True
-            elif lt(right, left):
-                return False
-        return False
-
-    def _lt_friend(self, left, right):
-        hostl = -1 if left.host_player is None else left.host_player.id
-        hostr = -1 if right.host_player is None else right.host_player.id
-        return self._me.isFriend(hostl) and not self._me.isFriend(hostr)
-
-    def _lt_type(self, left, right):
-        stype = self._sort_type
-        stypes = self.SortType
-
-        if stype == stypes.PLAYER_NUMBER:
-            return len(left.players) > len(right.players)
-        elif stype == stypes.AVERAGE_RATING:
-            return left.average_rating > right.average_rating
-        elif stype == stypes.MAPNAME:
-            return left.mapdisplayname.lower() < right.mapdisplayname.lower()
-        elif stype == stypes.HOSTNAME:
-            return left.host.lower() < right.host.lower()
-        elif stype == stypes.AGE:
-            return left.uid < right.uid
-
-    def _lt_fallback(self, left, right):
-        return left.uid < right.uid
+        source = self.sourceModel()
+        left = source.item_at(leftIndex.row())
+        right = source.item_at(rightIndex.row())
+        return self._sort_key(left) < self._sort_key(right)
+
+    def _sort_key(self, item):
+        try:
+            return item.sort_keys[self._sort_type]
+        except KeyError:
+            pass
+        # Games hosted by friends first, then by sort type, then oldest first
+        game = item.game
+        host = game.host_player
+        friend = self._me.isFriend(-1 if host is None else host.id)
+        key = (not friend, self._type_key(game), game.uid)
+        item.sort_keys[self._sort_type] = key
+        return key
 
     @property
     def sort_type(self):
@@ -132,6 +161,7 @@ class GameSortModel(QSortFilterProxyModel):
     @sort_type.setter
     def sort_type(self, stype):
         self._sort_type = stype
+        self._type_key = self._TYPE_KEYS[stype]
         self.invalidate()
 
     def filterAcceptsRow(self, row, parent):
@@ -10,20 +10,33 @@ class GameModelItem(QObject):
     """
     updated = pyqtSignal(object)
 
+    # Game fields that are shown by the game views or used by their filters
+    SHOWN_FIELDS = frozenset(["state", "num_players", "max_players", "title",
+                              "host", "mapname", "teams", "featured_mod",
+                              "sim_mods", "password_protected"])
+    PREVIEW_FIELDS = frozenset(["mapname", "password_protected"])
+
     def __init__(self, game, me, preview_dler):
         QObject.__init__(self)
 
         self.game = game
         self.game.gameUpdated.connect(self._game_updated)
+        # Sort type -> key, kept by sort models and cleared by the model
+        # when the item is updated
+        self.sort_keys = {}
         self._me = me
         self._me.relationsUpdated.connect(self._check_host_relation_changed)
         self._preview_dler = preview_dler
         self._preview_dl_request = PreviewDownloadRequest()
         self._preview_dl_request.done.connect(self._at_preview_downloaded)
+        self._download_preview_if_needed()
 
-    def _game_updated(self):
+    def _game_updated(self, game, old, changed):
+        if changed.isdisjoint(self.SHOWN_FIELDS):
+            return
         self.updated.emit(self)
-        self._download_preview_if_needed()
+        if not changed.isdisjoint(self.PREVIEW_FIELDS):
+            self._download_preview_if_needed()
 
     def _check_host_relation_changed(self, players):
         # This should never happen bar server screwups.
@@ -36,7 +49,7 @@ class GameModelItem(QObject):
         if self.game.mapname is None:
             return
         name = self.game.mapname.lower()
-        if self.game.password_protected or maps.preview(name) is not None:
+        if self.game.password_protected or maps.preview(name, generate=False) is not None:
             return
         self._preview_dler.download_preview(name, self._preview_dl_request)
 
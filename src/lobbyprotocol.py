@@ -0,0 +1,241 @@
+"""
+The framing of the lobby server protocol, and tools to record lobby traffic
+and play it back from a local server for load testing.
+
+To replay a recording against the client, run
+
+    python src/lobbyprotocol.py RECORDING [--speed 10] [--port 8001]
+
+and point the client at it with the lobby/host and lobby/port settings.
+"""
+import argparse
+import gzip
+import json
+import struct
+import sys
+import time
+
+from PyQt5 import QtCore, QtNetwork
+
+# Use a faster json parser for server messages if one is installed
+try:
+    import orjson as fast_json
+except ImportError:
+    try:
+        import ujson as fast_json
+    except ImportError:
+        fast_json = None
+
+
+def decode_json(text):
+    if fast_json is not None:
+        try:
+            return fast_json.loads(text)
+        except ValueError:
+            pass    # Let json decide, it accepts things like NaN
+    return json.loads(text)
+
+
+_uint32 = struct.Struct(">I")
+_NULL_STRING = 0xFFFFFFFF
+
+
+def pack_frame(text):
+    """
+    Packs a string into a frame the way QDataStream.writeQString does,
+    preceded by the frame size.
+    """
+    data = text.encode("utf-16-be")
+    return _uint32.pack(len(data) + 4) + _uint32.pack(len(data)) + data
+
+
+class FrameReader:
+    """
+    Splits the lobby protocol stream into strings. Each frame is a size,
+    followed by a QString written by QDataStream: a byte length and UTF-16
+    text, all big endian. Received data is buffered until frames are
+    complete.
+    """
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        """
+        Adds received data and returns the strings of all frames completed
+        by it.
+        """
+        buf = self._buffer
+        buf += data
+        end = len(buf)
+        pos = 0
+        frames = []
+        with memoryview(buf) as view:
+            while end - pos >= 4:
+                size, = _uint32.unpack_from(buf, pos)
+                if end - pos - 4 < size:
+                    break
+                frame_end = pos + 4 + size
+                frames.append(self._read_string(buf, view, pos + 4, frame_end))
+                pos = frame_end
+        if pos:
+            del buf[:pos]
+        return frames
+
+    def clear(self):
+        self._buffer.clear()
+
+    @staticmethod
+    def _read_string(buf, view, pos, end):
+        if end - pos < 4:
+            return ""
+        length, = _uint32.unpack_from(buf, pos)
+        if length == _NULL_STRING:
+            return ""
+        pos += 4
+        return str(view[pos:min(pos + length, end)], "utf-16-be")
+
+
+RECORDING_MAGIC = b"FAFLOBBY1\n"
+FROM_SERVER = b"S"
+FROM_CLIENT = b"C"
+
+# Direction, seconds since start, payload length
+_record_header = struct.Struct(">cdI")
+
+
+class TrafficRecorder:
+    """
+    Writes lobby protocol messages in both directions with timestamps to a
+    gzip compressed file. Messages are stored as UTF-8, each preceded by a
+    small header.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self._file = gzip.open(filename, "wb")
+        self._file.write(RECORDING_MAGIC)
+        self._start = time.monotonic()
+
+    def record(self, direction, text):
+        data = text.encode("utf-8")
+        self._file.write(_record_header.pack(direction, time.monotonic() - self._start, len(data)))
+        self._file.write(data)
+
+    def close(self):
+        self._file.close()
+
+
+def read_recording(filename):
+    """
+    Yields (direction, seconds since start, message) for every message in
+    a recording.
+    """
+    with gzip.open(filename, "rb") as f:
+        if f.read(len(RECORDING_MAGIC)) != RECORDING_MAGIC:
+            raise ValueError("Not a lobby traffic recording: {}".format(filename))
+        while True:
+            header = f.read(_record_header.size)
+            if len(header) < _record_header.size:
+                return
+            direction, timestamp, length = _record_header.unpack(header)
+            yield direction, timestamp, f.read(length).decode("utf-8")
+
+
+def replay_messages(filename, dispatch):
+    """
+    Dispatches every server message of a recording as fast as possible,
+    without any sockets. Returns the number of messages dispatched.
+    """
+    count = 0
+    for direction, _, text in read_recording(filename):
+        if direction != FROM_SERVER or text in ("PING", "PONG"):
+            continue
+        dispatch(decode_json(text))
+        count += 1
+    return count
+
+
+class LobbyReplayServer(QtNetwork.QTcpServer):
+    """
+    Stand-in lobby server that plays the server side of a recording to
+    every client that connects, keeping the recorded timing scaled by speed.
+    With a speed of None everything is sent at once. Messages from clients
+    are read and ignored.
+    """
+    finished = QtCore.pyqtSignal()
+
+    def __init__(self, filename, speed=1.0):
+        QtNetwork.QTcpServer.__init__(self)
+        self._messages = [(timestamp, pack_frame(text))
+                          for direction, timestamp, text in read_recording(filename)
+                          if direction == FROM_SERVER]
+        self.speed = speed
+        self._clients = []
+        self.newConnection.connect(self._new_connection)
+
+    def _new_connection(self):
+        while self.hasPendingConnections():
+            socket = self.nextPendingConnection()
+            socket.readyRead.connect(socket.readAll)
+            client = _ReplayClient(socket, self._messages, self.speed)
+            client.finished.connect(self.finished)
+            self._clients.append(client)
+            client.start()
+
+
+class _ReplayClient(QtCore.QObject):
+    finished = QtCore.pyqtSignal()
+
+    def __init__(self, socket, messages, speed):
+        QtCore.QObject.__init__(self)
+        self._socket = socket
+        self._messages = messages
+        self._speed = speed
+        self._next = 0
+        self._clock = QtCore.QElapsedTimer()
+        self._timer = QtCore.QTimer()
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._send_due)
+
+    def start(self):
+        self._clock.start()
+        self._send_due()
+
+    def _send_due(self):
+        messages = self._messages
+        if self._speed is None:
+            due = len(messages)
+        else:
+            elapsed = self._clock.elapsed() / 1000 * self._speed
+            due = self._next
+            while due < len(messages) and messages[due][0] <= elapsed:
+                due += 1
+        if due > self._next:
+            self._socket.write(b"".join(frame for _, frame in messages[self._next:due]))
+            self._next = due
+
+        if self._next == len(messages):
+            self.finished.emit()
+            return
+        wait = (messages[self._next][0] / self._speed) * 1000 - self._clock.elapsed()
+        self._timer.start(max(0, int(wait)))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Replays recorded lobby traffic to clients")
+    parser.add_argument("recording")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Playback speed, 0 for as fast as possible")
+    args = parser.parse_args(argv)
+
+    app = QtCore.QCoreApplication([])
+    server = LobbyReplayServer(args.recording, args.speed or None)
+    if not server.listen(QtNetwork.QHostAddress.LocalHost, args.port):
+        print("Can't listen on port {}".format(args.port))
+        return 1
+    print("Replaying {} on port {}".format(args.recording, args.port))
+    return app.exec_()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
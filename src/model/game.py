@@ -2,6 +2,7 @@ from PyQt5.QtCore import QObject, pyqtSignal, QUrl, QUrlQuery, QTimer
 
 from enum import Enum
 from decorators import with_logger
+from model.player import Player
 import time
 
 import string
@@ -19,6 +20,51 @@ class GameVisibility(Enum):
     FRIENDS = "friends"
 
 
+class GameSnapshot:
+    """
+    Immutable copy of a game's state at some point in time. Emitted with
+    gameUpdated as the old state, so that an update doesn't have to construct
+    a whole new Game.
+    """
+    FIELDS = ("uid", "state", "launched_at", "num_players", "max_players",
+              "title", "host", "mapname", "map_file_path", "teams",
+              "featured_mod", "featured_mod_versions", "sim_mods",
+              "password_protected", "visibility")
+
+    __slots__ = FIELDS + ("aborted",)
+
+    def __init__(self, game):
+        for name in self.FIELDS:
+            object.__setattr__(self, name, getattr(game, name))
+        object.__setattr__(self, "aborted", game._aborted)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("GameSnapshot is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("GameSnapshot is immutable")
+
+    def closed(self):
+        return self.state == GameState.CLOSED or self.aborted
+
+    @property
+    def players(self):
+        if self.teams is None:
+            return []
+        return [name for team in self.teams.values() for name in team]
+
+    def diff(self, other):
+        """
+        Returns the set of names of fields that differ between this and
+        other, which can be a snapshot or a game.
+        """
+        return frozenset(name for name in self.FIELDS
+                         if getattr(self, name) != getattr(other, name))
+
+    def to_dict(self):
+        return Game.to_dict(self)
+
+
 @with_logger
 class Game(QObject):
     """
@@ -30,8 +76,15 @@ class Game(QObject):
     ends with some update, or is ended manually. Once the game ends, it
     shouldn't be updated or ended again. Update and game end are propagated
     with signals.
+
+    Values derived from teams are computed once per update, since views and
+    sort models ask for them a lot. The lists returned must not be modified.
+    The average rating is remembered until teams change, players come or go
+    or a player's rating changes.
     """
-    gameUpdated = pyqtSignal(object, object)
+    # Emits the game, a GameSnapshot of its old state and a set of names of
+    # changed fields. Not emitted if an update changed nothing.
+    gameUpdated = pyqtSignal(object, object, object)
     liveReplayAvailable = pyqtSignal(object)
 
     connectedPlayerAdded = pyqtSignal(object, object)
@@ -84,6 +137,14 @@ class Game(QObject):
         self.visibility = None
         self._aborted = False
 
+        self._players = []
+        self._observers = []
+        self._playing_teams = {}
+        self._playing_players = []
+        self._mapdisplayname = None
+        self._average_rating = None
+        self._average_rating_stamp = None
+
         self._live_replay_timer = QTimer()
         self._live_replay_timer.setSingleShot(True)
         self._live_replay_timer.setInterval(self.LIVE_REPLAY_DELAY_SECS * 1000)
@@ -102,12 +163,18 @@ class Game(QObject):
                     s.teams, s.featured_mod, s.featured_mod_versions,
                     s.sim_mods, s.password_protected, s.visibility)
 
+    def snapshot(self):
+        return GameSnapshot(self)
+
     def update(self, *args, **kwargs):
         if self._aborted:
             return
-        old = self.copy()
+        old = self.snapshot()
         self._update(*args, **kwargs)
-        self.gameUpdated.emit(self, old)
+        changed = old.diff(self)
+        if not changed:
+            return
+        self.gameUpdated.emit(self, old, changed)
 
     def _update(self,
                 state=SENTINEL,
@@ -144,12 +211,14 @@ class Game(QObject):
             self.host = host
         if changed(mapname):
             self.mapname = mapname
+            self._mapdisplayname = None
         if changed(map_file_path):
             self.map_file_path = map_file_path
 
         # Dict of <teamname> : [list of player names]
         if changed(teams):
             self.teams = teams
+            self._update_team_lists()
 
         # Actually a game mode like faf, coop, ladder etc.
         if changed(featured_mod):
@@ -170,6 +239,24 @@ class Game(QObject):
 
         self._check_live_replay_timer()
 
+    def _update_team_lists(self):
+        self._average_rating = None
+        if self.teams is None:
+            self._players = []
+            self._observers = []
+            self._playing_teams = {}
+            self._playing_players = []
+            return
+
+        self._players = [name for team in self.teams.values() for name in team]
+        self._observers = [name for tname, team in self.teams.items()
+                           if tname in self.OBSERVER_TEAMS
+                           for name in team]
+        self._playing_teams = {n: t for n, t in self.teams.items()
+                               if n not in self.OBSERVER_TEAMS}
+        self._playing_players = [name for team in self._playing_teams.values()
+                                 for name in team]
+
     def _check_live_replay_timer(self):
         if (self.state != GameState.PLAYING or
            self._live_replay_timer.isActive() or
@@ -197,10 +284,10 @@ class Game(QObject):
         if self.closed():
             return
 
-        old = self.copy()
+        old = self.snapshot()
         self.state = GameState.CLOSED
         self._aborted = True
-        self.gameUpdated.emit(self, old)
+        self.gameUpdated.emit(self, old, old.diff(self))
 
     def to_dict(self):
         return {
@@ -260,28 +347,19 @@ class Game(QObject):
 
     @property
     def players(self):
-        if self.teams is None:
-            return []
-        return [name for team in self.teams.values() for name in team]
+        return self._players
 
     @property
     def observers(self):
-        if self.teams is None:
-            return []
-        return [name for tname, team in self.teams.items()
-                if tname in self.OBSERVER_TEAMS
-                for name in team]
+        return self._observers
 
     @property
     def playing_teams(self):
-        if self.teams is None:
-            return {}
-        return {n: t for n, t in self.teams.items()
-                if n not in self.OBSERVER_TEAMS}
+        return self._playing_teams
 
     @property
     def playing_players(self):
-        return [name for team in self.playing_teams.values() for name in team]
+        return self._playing_players
 
     @property
     def host_player(self):
@@ -292,9 +370,16 @@ class Game(QObject):
 
     @property
     def average_rating(self):
-        players = [name for team in self.playing_teams.values()
-                   for name in team]
-        players = [self.to_player(name) for name in players
+        # Players coming and going and rating changes are noticed through
+        # version counters, without listening to every player
+        stamp = (self._playerset.version, Player.ratings_version)
+        if self._average_rating is None or self._average_rating_stamp != stamp:
+            self._average_rating = self._compute_average_rating()
+            self._average_rating_stamp = stamp
+        return self._average_rating
+
+    def _compute_average_rating(self):
+        players = [self.to_player(name) for name in self._playing_players
                    if self.is_connected(name)]
         if not players:
             return 0
@@ -303,6 +388,11 @@ class Game(QObject):
 
     @property
     def mapdisplayname(self):
+        if self._mapdisplayname is None:
+            self._mapdisplayname = self._compute_mapdisplayname()
+        return self._mapdisplayname
+
+    def _compute_mapdisplayname(self):
         if self.mapname in OFFICIAL_MAPS:
             return OFFICIAL_MAPS[self.mapname][0]
 
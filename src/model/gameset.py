@@ -13,8 +13,13 @@ class Gameset(QObject):
     Note that it doesn't remember which games ended - the server may choose to
     send a game state for a uid, send a state that closes it, then send a state
     with the same uid again, and it will be reported as a new game.
+
+    Games added between begin_bulk_add and commit_bulk_add are reported
+    with a single gamesBulkAdded signal instead of one newGame each. Their
+    state signals are sent on commit.
     """
     newGame = pyqtSignal(object)
+    gamesBulkAdded = pyqtSignal(list)
 
     newLobby = pyqtSignal(object)
     newLiveGame = pyqtSignal(object)
@@ -27,6 +32,9 @@ class Gameset(QObject):
         self._playerset = playerset
         self._idx = PlayerGameIndex(playerset)
 
+        self._bulk_depth = 0
+        self._bulk_added = {}
+
     def __getitem__(self, uid):
         return self.games[uid]
 
@@ -65,19 +73,43 @@ class Gameset(QObject):
         # We should be the first ones to connect to the signal
         value.gameUpdated.connect(self._at_game_update)
         value.liveReplayAvailable.connect(self._at_live_replay)
+        if self._bulk_depth > 0:
+            self._bulk_added[key] = value
         self._at_game_update(value, None)
-        self.newGame.emit(value)
+        if self._bulk_depth == 0:
+            self.newGame.emit(value)
         self._logger.debug("Added game, uid {}".format(value.uid))
 
+    def begin_bulk_add(self):
+        self._bulk_depth += 1
+
+    def commit_bulk_add(self):
+        if self._bulk_depth == 0:
+            raise ValueError("No bulk add in progress")
+        self._bulk_depth -= 1
+        if self._bulk_depth > 0 or not self._bulk_added:
+            return
+        added = list(self._bulk_added.values())
+        self._bulk_added = {}
+        for g in added:
+            self._new_state(g)
+        self.gamesBulkAdded.emit(added)
+
     def clear(self):
         # Abort_game removes g from dict, so 'for g in values()' complains
         for g in list(self.games.values()):
             g.abort_game()
 
-    def _at_game_update(self, new, old):
+    # Old is a GameSnapshot of the previous state, or None for a new game.
+    def _at_game_update(self, new, old, changed=None):
+        # Games pending in a bulk add have their state reported on commit
+        pending = self._bulk_added.get(new.uid) is new
         if new.closed():
             self._remove_game(new)
-        self._idx.at_game_update(new, old)
+        if old is None or not changed.isdisjoint({"state", "teams"}):
+            self._idx.at_game_update(new, old)
+        if pending:
+            return
         if old is None or new.state != old.state:
             self._new_state(new)
 
@@ -99,6 +131,7 @@ class Gameset(QObject):
             g.gameUpdated.disconnect(self._at_game_update)
             g.liveReplayAvailable.disconnect(self._at_live_replay)
             del self.games[g.uid]
+            self._bulk_added.pop(g.uid, None)
             self._logger.debug("Removed game, uid {}".format(g.uid))
         except KeyError:
             pass
@@ -111,9 +144,10 @@ class PlayerGameIndex:
         self._playerset = playerset
         self._idx = {}
         self._playerset.playerAdded.connect(self._on_player_added)
+        self._playerset.playersBulkAdded.connect(self._on_players_bulk_added)
         self._playerset.playerRemoved.connect(self._on_player_removed)
 
-    # Called by gameset
+    # Called by gameset. Old is a GameSnapshot or None.
     def at_game_update(self, new, old):
         old_closed = old is None or old.closed()
 
@@ -179,6 +213,10 @@ class PlayerGameIndex:
             player.currentGame = pgame
             pgame.connectedPlayerAdded.emit(pgame, player)
 
+    def _on_players_bulk_added(self, players):
+        for player in players:
+            self._on_player_added(player)
+
     def _on_player_removed(self, player):
         pgame = self.player_game(player.login)
         if pgame is not None:
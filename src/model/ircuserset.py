@@ -10,6 +10,7 @@ class IrcUserset(QObject):
         self._users = {}
         self._playerset = playerset
         playerset.playerAdded.connect(self._at_player_added)
+        playerset.playersBulkAdded.connect(self._at_players_bulk_added)
         playerset.playerRemoved.connect(self._at_player_removed)
 
     def __getitem__(self, item):
@@ -80,6 +81,10 @@ class IrcUserset(QObject):
         if player.login in self:
             self[player.login].player = player
 
+    def _at_players_bulk_added(self, players):
+        for player in players:
+            self._at_player_added(player)
+
     def _at_player_removed(self, player):
         if player.login in self:
             self[player.login].player = None
@@ -2,9 +2,14 @@ from PyQt5.QtCore import QObject, pyqtSignal
 
 
 class Player(QObject):
-    updated = pyqtSignal(object, object)
+    # Emits the player, a copy of the old player and a set of changed fields
+    updated = pyqtSignal(object, object, object)
     newCurrentGame = pyqtSignal(object, object, object)
 
+    # Bumped whenever any player's global rating changes, so that values
+    # computed from ratings can tell they're stale
+    ratings_version = 0
+
     """
     Represents a player the client knows about.
     """
@@ -55,25 +60,29 @@ class Player(QObject):
                clan=None,
                league=None):
 
-        old_data = self.copy()
         # Ignore id and login (they are be immutable)
         # Login should be mutable, but we look up things by login right now
-        if global_rating is not None:
-            self.global_rating = global_rating
-        if ladder_rating is not None:
-            self.ladder_rating = ladder_rating
-        if number_of_games is not None:
-            self.number_of_games = number_of_games
-        if avatar is not None:
-            self.avatar = avatar
-        if country is not None:
-            self.country = country
-        if clan is not None:
-            self.clan = clan
-        if league is not None:
-            self.league = league
-
-        self.updated.emit(self, old_data)
+        new_values = {
+            "global_rating": global_rating,
+            "ladder_rating": ladder_rating,
+            "number_of_games": number_of_games,
+            "avatar": avatar,
+            "country": country,
+            "clan": clan,
+            "league": league,
+        }
+        changes = {field: value for field, value in new_values.items()
+                   if value is not None and value != getattr(self, field)}
+        if not changes:
+            return
+
+        old_data = self.copy()
+        for field, value in changes.items():
+            setattr(self, field, value)
+        if "global_rating" in changes:
+            Player.ratings_version += 1
+
+        self.updated.emit(self, old_data, frozenset(changes))
 
     def __hash__(self):
         """
@@ -8,8 +8,14 @@ class Playerset(QObject):
     Wrapper for an id->Player map
 
     Used to lookup players either by id or by login.
+
+    Players added between begin_bulk_add and commit_bulk_add are reported
+    with a single playersBulkAdded signal instead of one playerAdded each.
+
+    The version changes whenever a player is added or removed.
     """
     playerAdded = pyqtSignal(object)
+    playersBulkAdded = pyqtSignal(list)
     playerRemoved = pyqtSignal(object)
 
     def __init__(self):
@@ -20,6 +26,14 @@ class Playerset(QObject):
         # Login -> Player map
         self._logins = {}
 
+        self._bulk_depth = 0
+        self._bulk_added = []
+        self._version = 0
+
+    @property
+    def version(self):
+        return self._version
+
     def __getitem__(self, item):
         if isinstance(item, int):
             return self._players[item]
@@ -74,7 +88,11 @@ class Playerset(QObject):
 
         self._players[key] = value
         self._logins[value.login] = value
-        self.playerAdded.emit(value)
+        self._version += 1
+        if self._bulk_depth > 0:
+            self._bulk_added.append(value)
+        else:
+            self.playerAdded.emit(value)
 
     def __delitem__(self, item):
         try:
@@ -83,8 +101,26 @@ class Playerset(QObject):
             return
         del self._players[player.id]
         del self._logins[player.login]
+        self._version += 1
+        if self._bulk_depth > 0 and player in self._bulk_added:
+            # Nobody heard of it yet, so nobody needs to hear it's gone
+            self._bulk_added.remove(player)
+            return
         self.playerRemoved.emit(player)
 
+    def begin_bulk_add(self):
+        self._bulk_depth += 1
+
+    def commit_bulk_add(self):
+        if self._bulk_depth == 0:
+            raise ValueError("No bulk add in progress")
+        self._bulk_depth -= 1
+        if self._bulk_depth > 0 or not self._bulk_added:
+            return
+        added = self._bulk_added
+        self._bulk_added = []
+        self.playersBulkAdded.emit(added)
+
     def clear(self):
         oldplayers = list(self.keys())
         for player in oldplayers:
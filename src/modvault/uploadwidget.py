@@ -7,6 +7,7 @@ from PyQt5 import QtCore, QtWidgets
 
 import modvault
 import util
+from downloadManager import BackgroundTask
 
 FormClass, BaseClass = util.THEME.loadUiType("modvault/upload.ui")
 
@@ -20,6 +21,7 @@ class UploadModWidget(FormClass, BaseClass):
         self.client = self.parent.client
         self.modinfo = modinfo
         self.modDir = modDir
+        self._thumbnail_task = None
 
         self.setStyleSheet(self.parent.client.styleSheet())
 
@@ -42,6 +44,9 @@ class UploadModWidget(FormClass, BaseClass):
 
     @QtCore.pyqtSlot()
     def upload(self):
+        if self._thumbnail_task is not None:
+            # The thumbnail is still being written, don't package half of it
+            return
         n = self.Name.text()
         if any([(i in n) for i in '"<*>|?/\\:']):
             QtWidgets.QMessageBox.information(self.client, "Invalid Name",
@@ -80,14 +85,28 @@ class UploadModWidget(FormClass, BaseClass):
         if iconfilename == "":
             return False
         if os.path.splitext(iconfilename)[1].lower() == ".dds":
+            # Converting can take a while, so do it in the background
             old = iconfilename
             iconfilename = os.path.join(self.modDir, os.path.splitext(os.path.basename(iconfilename))[0] + ".png")
-            succes = modvault.generateThumbnail(old, iconfilename)
-            if not succes:
-                QtWidgets.QMessageBox.information(self.client, "Invalid Icon File",
-                                                  "Because FAF can't read DDS files, it tried to convert it to a png. "
-                                                  "This failed. Try something else")
-                return False
+            self._thumbnail_task = BackgroundTask(modvault.generateThumbnail, old, iconfilename)
+            self._thumbnail_task.done.connect(
+                lambda succes: self._at_thumbnail_generated(iconfilename, succes))
+            self.UploadButton.setEnabled(False)
+            self._thumbnail_task.start()
+            return True
+        return self._setThumbnail(iconfilename)
+
+    def _at_thumbnail_generated(self, iconfilename, succes):
+        self._thumbnail_task = None
+        self.UploadButton.setEnabled(True)
+        if not succes:
+            QtWidgets.QMessageBox.information(self.client, "Invalid Icon File",
+                                              "Because FAF can't read DDS files, it tried to convert it to a png. "
+                                              "This failed. Try something else")
+            return
+        self._setThumbnail(iconfilename)
+
+    def _setThumbnail(self, iconfilename):
         try:
             self.Thumbnail.setPixmap(util.THEME.pixmap(iconfilename, False))
         except:
@@ -8,6 +8,7 @@ from PyQt5 import QtCore, QtWidgets, QtGui
 
 from util import PREFSFILENAME
 import util
+from util import digests
 import logging
 from vault import luaparser
 import warnings
@@ -86,6 +87,7 @@ def getInstalledMods():
                 continue
         if m:
             installedMods.append(m)
+    digests.cache().save()
     logger.debug("getting installed mods. Count: %d" % len(installedMods))
     return installedMods
 
@@ -159,18 +161,18 @@ def getModInfoFromZip(zfile):
         return modCache[zfile]
 
     r = None
-    if zipfile.is_zipfile(os.path.join(MODFOLDER, zfile)):
-        zip = zipfile.ZipFile(os.path.join(MODFOLDER,zfile), "r", zipfile.ZIP_DEFLATED)
-        if zip.testzip() is None:
-            for member in zip.namelist():
-                filename = os.path.basename(member)
-                if not filename:
-                    continue
-                if filename == "mod_info.lua":
-                    modinfofile = luaparser.luaParser("mod_info.lua")
-                    modinfofile.iszip = True
-                    modinfofile.zip = zip
-                    r = getModInfo(modinfofile)
+    zpath = os.path.join(MODFOLDER, zfile)
+    if zipfile.is_zipfile(zpath) and digests.cache().zip_ok(zpath):
+        zip = zipfile.ZipFile(zpath, "r", zipfile.ZIP_DEFLATED)
+        for member in zip.namelist():
+            filename = os.path.basename(member)
+            if not filename:
+                continue
+            if filename == "mod_info.lua":
+                modinfofile = luaparser.luaParser("mod_info.lua")
+                modinfofile.iszip = True
+                modinfofile.zip = zip
+                r = getModInfo(modinfofile)
     if r is None:
         logger.debug("mod_info.lua not found in zip file %s" % zfile)
         return None
@@ -338,20 +340,10 @@ def updateModInfo(mod, info):  # should probably not be used.
 def generateThumbnail(sourcename, destname):
     """Given a dds file, generates a png file (or whatever the extension of dest is"""
     logger.debug("Creating png thumnail for %s to %s" % (sourcename, destname))
+    from fa.maps import genPrevFromDDS  # fa imports us
 
     try:
-        img = bytearray()
-        buf = bytearray(16)
-        file = open(sourcename, "rb")
-        file.seek(128)  # skip header
-        while file.readinto(buf):
-            img += buf[:3] + buf[4:7] + buf[8:11] + buf[12:15]
-        file.close()
-
-        size = int((len(img)/3) ** (1.0/2))
-        imageFile = QtGui.QImage(img, size, size, QtGui.QImage.Format_RGB888).rgbSwapped().\
-            scaled(100, 100, transformMode=QtCore.Qt.SmoothTransformation)
-        imageFile.save(destname)
+        genPrevFromDDS(sourcename, destname, small=True)
     except IOError:
         return False
 
@@ -31,6 +31,7 @@ class Notifications:
         client.gameFull.connect(self._gamefull)
         gameset.newLobby.connect(self._newLobby)
         playerset.playerAdded.connect(self._newPlayer)
+        playerset.playersBulkAdded.connect(self._newPlayers)
 
         self.user = util.THEME.icon("client/user.png", pix=True)
 
@@ -48,6 +49,10 @@ class Notifications:
         self.events.append((self.USER_ONLINE, player.copy()))
         self.checkEvent()
 
+    def _newPlayers(self, players):
+        for player in players:
+            self._newPlayer(player)
+
     def _newLobby(self, game):
         if self.isDisabled() or not self.settings.popupEnabled(self.NEW_GAME):
             return
@@ -58,7 +63,7 @@ class Notifications:
             if host is None or not self.me.isFriend(host):
                 return
 
-        self.events.append((self.NEW_GAME, game.copy()))
+        self.events.append((self.NEW_GAME, game.snapshot()))
         self.checkEvent()
 
     def _gamefull(self):
@@ -56,19 +56,28 @@ class LiveReplayItem(QtWidgets.QTreeWidgetItem):
         if mapname != self._game.mapname:
             return
         path, is_local = result
-        icon = util.THEME.icon(path, is_local)
+        icon = fa.maps.preview(mapname, generate=False)
+        if icon is None:
+            icon = util.THEME.icon(path, is_local)
         self.setIcon(0, icon)
 
-    def _update_game(self, game):
+    def _update_game(self, game, old=None, changed=None):
         if game.state == GameState.CLOSED:
             return
 
-        self.takeChildren()     # Clear the children of this item
+        def any_changed(*fields):
+            return changed is None or not changed.isdisjoint(fields)
+
         self._set_debug_tooltip(game)
-        self._set_game_map_icon(game)
-        self._set_misc_formatting(game)
-        self._set_color(game)
-        self._generate_player_subitems(game)
+        if any_changed("mapname", "featured_mod"):
+            self._set_game_map_icon(game)
+        if any_changed("mapname", "title", "host", "featured_mod"):
+            self._set_misc_formatting(game)
+        if any_changed("teams"):
+            self._set_color(game)
+        if any_changed("teams", "uid", "mapname", "featured_mod"):
+            self.takeChildren()     # Clear the children of this item
+            self._generate_player_subitems(game)
 
     def _set_debug_tooltip(self, game):
         info = game.to_dict()
@@ -81,7 +90,7 @@ class LiveReplayItem(QtWidgets.QTreeWidgetItem):
         if game.featured_mod == "coop":  # no map icons for coop
             icon = util.THEME.icon("games/unknown_map.png")
         else:
-            icon = fa.maps.preview(game.mapname)
+            icon = fa.maps.preview(game.mapname, generate=False)
             if not icon:
                 dler = client.instance.map_downloader
                 dler.download_preview(game.mapname, self._map_dl_request)
@@ -249,7 +258,7 @@ class LiveReplaysWidgetHandler(object):
         self.liveTree.insertTopLevelItem(0, item)
         game.gameUpdated.connect(self._check_game_closed)
 
-    def _check_game_closed(self, game):
+    def _check_game_closed(self, game, old, changed):
         if game.state == GameState.CLOSED:
             game.gameUpdated.disconnect(self._check_game_closed)
             self._removeGame(game)
@@ -0,0 +1,169 @@
+import binascii
+import hashlib
+import json
+import logging
+import os
+import stat
+import threading
+import time
+import zipfile
+
+logger = logging.getLogger(__name__)
+
+
+def _read_chunks(path):
+    with open(path, "rb") as fd:
+        while True:
+            content = fd.read(1024 * 1024)
+            if not content:
+                break
+            yield content
+
+
+def _md5_file(path):
+    m = hashlib.md5()
+    for content in _read_chunks(path):
+        m.update(content)
+    return m.hexdigest()
+
+
+def _crc32_file(path):
+    crc = 0
+    for content in _read_chunks(path):
+        crc = binascii.crc32(content, crc)
+    return crc
+
+
+def _test_zip(path):
+    try:
+        with zipfile.ZipFile(path) as zf:
+            return zf.testzip() is None
+    except zipfile.BadZipFile:
+        return False
+
+
+class DigestCache:
+    """
+    Remembers digests of files by path, size and modification time, so that
+    unchanged files don't need to be read again. Besides md5 and crc32 it
+    remembers whether zip archives are intact. Entries are kept in a json
+    file between runs. Digests can be computed from several threads at once.
+
+    Files modified less than RACY_INTERVAL seconds ago aren't remembered,
+    since they could change again without their modification time changing.
+    """
+    RACY_INTERVAL = 2
+
+    def __init__(self, filename):
+        self._filename = filename
+        self._lock = threading.Lock()
+        self._entries = None   # Path -> [size, mtime, {kind: digest}]
+        self._dirty = False
+
+    def md5(self, path):
+        """
+        Returns the md5 hexdigest of a file, or None if it's not a file.
+        """
+        return self._digest(path, "md5", _md5_file)
+
+    def crc32(self, path):
+        """
+        Returns the crc32 of a file, or None if it's not a file.
+        """
+        return self._digest(path, "crc32", _crc32_file)
+
+    def zip_ok(self, path):
+        """
+        Returns whether a file is a zip archive without corrupt members, or
+        None if it's not a file.
+        """
+        return self._digest(path, "zip_ok", _test_zip)
+
+    def invalidate(self, path):
+        """
+        Forgets the digests of a file. Not needed if the file's size or
+        modification time changed, which is checked anyway.
+        """
+        key = self._key(path)
+        with self._lock:
+            if self._get_entries().pop(key, None) is not None:
+                self._dirty = True
+
+    @staticmethod
+    def _key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def _digest(self, path, kind, compute):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+
+        key = self._key(path)
+        with self._lock:
+            entry = self._get_entries().get(key)
+            if (entry is not None and entry[0] == st.st_size
+                    and entry[1] == st.st_mtime_ns and kind in entry[2]):
+                return entry[2][kind]
+
+        value = compute(path)
+
+        if time.time() - st.st_mtime < self.RACY_INTERVAL:
+            return value
+        with self._lock:
+            entries = self._get_entries()
+            entry = entries.get(key)
+            if (entry is None or entry[0] != st.st_size
+                    or entry[1] != st.st_mtime_ns):
+                entry = [st.st_size, st.st_mtime_ns, {}]
+                entries[key] = entry
+            entry[2][kind] = value
+            self._dirty = True
+        return value
+
+    def _get_entries(self):
+        if self._entries is None:
+            self._entries = self._load()
+        return self._entries
+
+    def _load(self):
+        try:
+            with open(self._filename) as f:
+                entries = json.load(f)
+            if isinstance(entries, dict):
+                return entries
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError):
+            logger.warning("Could not read digest cache, starting over",
+                           exc_info=True)
+        return {}
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            tmpname = self._filename + ".tmp"
+            try:
+                with open(tmpname, "w") as f:
+                    json.dump(self._entries, f)
+                os.replace(tmpname, self._filename)
+                self._dirty = False
+            except OSError:
+                logger.warning("Could not save digest cache", exc_info=True)
+
+
+_cache = None
+
+
+def cache():
+    """
+    The digest cache shared by the whole client.
+    """
+    global _cache
+    if _cache is None:
+        import util
+        _cache = DigestCache(os.path.join(util.CACHE_DIR, "digests.json"))
+    return _cache
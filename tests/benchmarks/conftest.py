@@ -0,0 +1,289 @@
+import json
+import os
+import random
+import time
+
+import pytest
+
+from model import game
+
+
+# Best times of this run, by benchmark name
+_results = {}
+_baselines = {}
+
+
+def _bench_name(node):
+    # Independent of the directory pytest was started from
+    return "{}::{}".format(os.path.basename(str(node.fspath)), node.name)
+
+
+def _baseline(filename):
+    if filename not in _baselines:
+        with open(filename) as f:
+            _baselines[filename] = json.load(f)
+    return _baselines[filename]
+
+
+def pytest_sessionfinish(session):
+    filename = session.config.getoption("bench_save")
+    if not filename or not _results:
+        return
+    try:
+        with open(filename) as f:
+            saved = json.load(f)
+    except FileNotFoundError:
+        saved = {}
+    saved.update(_results)
+    with open(filename, "w") as f:
+        json.dump(saved, f, indent=2, sort_keys=True)
+
+
+@pytest.fixture
+def bench(request):
+    """
+    Runs a function a few times and returns the best wall clock time in
+    seconds. The result is also recorded in the test report.
+
+    With --bench-save, best times are saved to a file. With --bench-compare,
+    the benchmark fails if it is slower than the saved time by more than
+    --bench-threshold.
+    """
+    def run(fn, rounds=5):
+        best = None
+        for _ in range(rounds):
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        request.node.user_properties.append(("best_time", best))
+
+        name = _bench_name(request.node)
+        _results[name] = best
+        config = request.config
+        compare = config.getoption("bench_compare")
+        if compare:
+            saved = _baseline(compare).get(name)
+            limit = None if saved is None else saved * (1 + config.getoption("bench_threshold"))
+            if limit is not None and best > limit:
+                pytest.fail("{} got slower: {:.4f}s, saved {:.4f}s".format(
+                    name, best, saved))
+        return best
+    return run
+
+
+def make_game_info(uid, state="open", players=()):
+    return {
+        "command": "game_info",
+        "uid": uid,
+        "state": state,
+        "launched_at": None if state == "open" else 10000 + uid,
+        "num_players": len(players),
+        "max_players": 8,
+        "title": "Game {}".format(uid),
+        "host": players[0] if players else "Host{}".format(uid),
+        "mapname": "scmp_0{:02d}".format(uid % 40 + 1),
+        "map_file_path": "maps/scmp_0{:02d}.zip".format(uid % 40 + 1),
+        "teams": {"1": list(players[::2]), "2": list(players[1::2])},
+        "featured_mod": "faf",
+        "featured_mod_versions": {},
+        "sim_mods": {},
+        "password_protected": False,
+        "visibility": game.GameVisibility.PUBLIC.value,
+    }
+
+
+@pytest.fixture
+def game_info():
+    """
+    Builds the game_info message of a single game.
+    """
+    return make_game_info
+
+
+@pytest.fixture
+def game_info_burst():
+    """
+    Builds a deterministic burst of game_info traffic resembling a busy
+    evening: lobbies open, fill up with players, launch and close.
+    """
+    def build(num_games=500, updates_per_game=8, seed=0):
+        rng = random.Random(seed)
+        lobbies = {}
+        messages = []
+        next_uid = 1
+        while next_uid <= num_games or lobbies:
+            if next_uid <= num_games and rng.random() < 0.3:
+                lobbies[next_uid] = ["Player{}_0".format(next_uid)]
+                messages.append(make_game_info(next_uid,
+                                               players=lobbies[next_uid]))
+                next_uid += 1
+                continue
+            if not lobbies:
+                continue
+            uid = rng.choice(list(lobbies))
+            players = lobbies[uid]
+            if len(players) < updates_per_game:
+                players.append("Player{}_{}".format(uid, len(players)))
+                messages.append(make_game_info(uid, players=players))
+            elif len(players) == updates_per_game:
+                players.append(None)
+                messages.append(make_game_info(uid, "playing", players[:-1]))
+            else:
+                del lobbies[uid]
+                messages.append(make_game_info(uid, "closed", players[:-1]))
+        return messages
+    return build
+
+
+@pytest.fixture
+def gpgnet_lobby_stream():
+    """
+    Builds the GPGNet traffic a game sends while setting up a lobby with
+    many peers, split into reads the way a socket would deliver it.
+    """
+    from fa.game_connection import packMessage
+
+    def build(num_peers=12, rounds=50, seed=0):
+        rng = random.Random(seed)
+        messages = [("GameState", ["Idle"]), ("GameState", ["Lobby"])]
+        for peer in range(num_peers):
+            messages.append(("ConnectToPeer",
+                             ["127.0.0.1:{}".format(7000 + peer),
+                              "Player{}".format(peer), 1000 + peer]))
+        for _ in range(rounds):
+            peer = rng.randrange(num_peers)
+            messages.append(("GameOption", ["Slot{}".format(peer),
+                                            "Team", rng.randrange(1, 5)]))
+            messages.append(("PlayerOption", [1000 + peer, "Faction",
+                                              rng.randrange(1, 5)]))
+            messages.append(("Chat", ["Player{}: gl/nhf".format(peer)]))
+        stream = b"".join(packMessage(c, a) for c, a in messages)
+
+        reads = []
+        pos = 0
+        while pos < len(stream):
+            step = rng.randint(1, 1500)
+            reads.append(stream[pos:pos + step])
+            pos += step
+        return reads, len(messages)
+    return build
+
+
+@pytest.fixture
+def login_burst(application, game_info_burst):
+    """
+    Builds the lobby server traffic right after logging in - player and
+    game info for everyone online - as the frames a socket would deliver.
+    """
+    import json
+    import client  # noqa: F401
+    from client.connection import pack_frame
+
+    def build(num_players=3000, num_games=300, seed=0):
+        rng = random.Random(seed)
+        messages = [{"command": "welcome", "id": 1, "login": "Me"}]
+        for uid in range(num_players):
+            messages.append({"command": "player_info", "players": [{
+                "id": uid,
+                "login": "Player{}".format(uid),
+                "global_rating": [rng.gauss(1000, 300), rng.uniform(50, 500)],
+                "ladder_rating": [rng.gauss(1000, 300), rng.uniform(50, 500)],
+                "number_of_games": rng.randrange(5000),
+                "avatar": None,
+                "country": "DE",
+                "clan": "",
+            }]})
+        messages.extend(game_info_burst(num_games=num_games, seed=seed))
+        stream = b"".join(pack_frame(json.dumps(m)) for m in messages)
+
+        reads = []
+        pos = 0
+        while pos < len(stream):
+            step = rng.randint(1, 64 * 1024)
+            reads.append(stream[pos:pos + step])
+            pos += step
+        return reads, len(messages)
+    return build
+
+
+@pytest.fixture
+def lobby_population():
+    """
+    Builds a synthetic lobby population: player info dicts, and game info
+    dicts for games made up of those players.
+    """
+    def build(num_players=10000, num_games=2000, seed=0):
+        rng = random.Random(seed)
+        players = [{
+            "id_": pid,
+            "login": "Player{}".format(pid),
+            "global_rating": (rng.gauss(1200, 400), rng.uniform(50, 500)),
+            "ladder_rating": (rng.gauss(1200, 400), rng.uniform(50, 500)),
+            "number_of_games": rng.randrange(5000),
+        } for pid in range(num_players)]
+
+        logins = [p["login"] for p in players]
+        rng.shuffle(logins)
+        games = []
+        for uid in range(1, num_games + 1):
+            size = rng.randint(2, 8)
+            members, logins = logins[:size], logins[size:]
+            state = "open" if rng.random() < 0.5 else "playing"
+            info = make_game_info(uid, state, members)
+            del info["command"]
+            info["state"] = game.GameState(info["state"])
+            info["visibility"] = game.GameVisibility(info["visibility"])
+            games.append(info)
+        return players, games
+    return build
+
+
+@pytest.fixture
+def irc_channel_log():
+    """
+    Builds the IRC traffic of a busy channel - names on join, then chatter,
+    people coming and going - split into reads the way a socket would
+    deliver it.
+    """
+    def build(num_users=1500, num_lines=30000, seed=0):
+        rng = random.Random(seed)
+        server = ":irc.faforever.com"
+        nicks = ["User{}".format(i) for i in range(num_users)]
+        mask = "{0}!{1}@faforever.com".format
+        lines = []
+        for start in range(0, num_users, 50):
+            names = " ".join(("@" if rng.random() < 0.01 else "") + nick
+                             for nick in nicks[start:start + 50])
+            lines.append("{} 353 Me = #aeolus :{}".format(server, names))
+        lines.append("{} 366 Me #aeolus :End of /NAMES list.".format(server))
+        while len(lines) < num_lines:
+            nick = rng.choice(nicks)
+            source = ":" + mask(nick, rng.randrange(100000))
+            roll = rng.random()
+            if roll < 0.8:
+                words = rng.randint(1, 25)
+                text = " ".join(rng.choice(["gg", "gl hf", "anyone for setons?",
+                                            "lol", "the new patch", "1v1 me"])
+                                for _ in range(words))
+                lines.append("{} PRIVMSG #aeolus :{}".format(source, text))
+            elif roll < 0.85:
+                lines.append("{} PRIVMSG #aeolus :\x01ACTION waves\x01".format(source))
+            elif roll < 0.9:
+                lines.append("{} JOIN :#aeolus".format(source))
+            elif roll < 0.95:
+                lines.append("{} PART #aeolus".format(source))
+            elif roll < 0.99:
+                lines.append("{} QUIT :Quit: leaving".format(source))
+            else:
+                lines.append("PING {}".format(server))
+        stream = "".join(line + "\r\n" for line in lines).encode()
+
+        reads = []
+        pos = 0
+        while pos < len(stream):
+            step = rng.randint(1, 2**14)
+            reads.append(stream[pos:pos + step])
+            pos += step
+        return reads, len(lines)
+    return build
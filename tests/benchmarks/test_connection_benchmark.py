@@ -0,0 +1,19 @@
+from PyQt5.QtCore import QByteArray
+
+
+def test_login_burst(application, mocker, bench, login_burst):
+    from client.connection import ServerConnection
+
+    reads, count = login_burst()
+    received = []
+    connection = ServerConnection("localhost", 0, received.append)
+    connection.socket = mocker.Mock()
+
+    def replay():
+        received.clear()
+        connection.socket.readAll.side_effect = [QByteArray(r) for r in reads]
+        for _ in reads:
+            connection.readFromServer()
+        assert len(received) == count
+
+    bench(replay)
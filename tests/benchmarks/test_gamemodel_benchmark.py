@@ -0,0 +1,78 @@
+import copy
+
+from PyQt5.QtCore import QModelIndex
+
+from model.gameset import Gameset
+from model.playerset import Playerset
+
+
+def test_game_info_burst(application, mocker, bench, game_info_burst):
+    # The games package can only be imported once the client exists
+    import client  # noqa: F401
+    from client.connection import Dispatcher, LobbyInfo
+    from games.gamemodel import GameModel
+
+    burst = game_info_burst(num_games=1000)
+
+    def replay():
+        playerset = Playerset()
+        gameset = Gameset(playerset)
+        model = GameModel(mocker.Mock(), mocker.Mock(), gameset)
+        dispatcher = Dispatcher()
+        LobbyInfo(dispatcher, gameset, playerset)
+        for message in copy.deepcopy(burst):
+            dispatcher.dispatch(message)
+        assert model.rowCount(QModelIndex()) == 0
+
+    bench(replay, rounds=3)
+
+
+def test_game_info_burst_batched(application, mocker, bench, game_info_burst):
+    import client  # noqa: F401
+    from client.connection import BatchingDispatcher, LobbyInfo
+    from games.gamemodel import GameModel
+
+    burst = game_info_burst(num_games=1000)
+
+    def replay():
+        playerset = Playerset()
+        gameset = Gameset(playerset)
+        model = GameModel(mocker.Mock(), mocker.Mock(), gameset)
+        dispatcher = BatchingDispatcher()
+        LobbyInfo(dispatcher, gameset, playerset)
+        # A batch per 100 messages, as if they arrived in separate reads
+        for i, message in enumerate(copy.deepcopy(burst)):
+            dispatcher.dispatch(message)
+            if i % 100 == 99:
+                dispatcher.flush()
+        dispatcher.flush()
+        assert model.rowCount(QModelIndex()) == 0
+
+    bench(replay, rounds=3)
+
+
+def test_new_games_into_full_model(application, mocker, bench, game_info):
+    import client  # noqa: F401
+    from client.connection import BatchingDispatcher, LobbyInfo
+    from games.gamemodel import GameModel
+
+    def replay():
+        playerset = Playerset()
+        gameset = Gameset(playerset)
+        model = GameModel(mocker.Mock(), mocker.Mock(), gameset)
+        dispatcher = BatchingDispatcher()
+        LobbyInfo(dispatcher, gameset, playerset)
+        dispatcher.dispatch({"command": "game_info", "games": [
+            game_info(uid) for uid in range(2000)]})
+        dispatcher.flush()
+
+        reset = mocker.Mock()
+        model.modelReset.connect(reset)
+        # Games hosted one at a time, each in its own event loop pass
+        for uid in range(2000, 2050):
+            dispatcher.dispatch(game_info(uid))
+            dispatcher.flush()
+        assert not reset.called
+        assert model.rowCount(QModelIndex()) == 2050
+
+    bench(replay, rounds=3)
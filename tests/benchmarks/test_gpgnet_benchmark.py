@@ -0,0 +1,22 @@
+from fa.game_connection import GPGNetParser, packMessage
+
+
+def test_gpgnet_parse_lobby_stream(bench, gpgnet_lobby_stream):
+    reads, count = gpgnet_lobby_stream(num_peers=16, rounds=2000)
+
+    def replay():
+        parser = GPGNetParser()
+        received = 0
+        for data in reads:
+            received += len(parser.feed(data))
+        assert received == count
+
+    bench(replay)
+
+
+def test_gpgnet_pack_messages(bench):
+    def pack():
+        for peer in range(5000):
+            packMessage("ConnectToPeer", ["127.0.0.1:7000", "Player", peer])
+
+    bench(pack)
@@ -0,0 +1,38 @@
+import pytest
+
+
+@pytest.fixture
+def irclib(application):
+    # The chat package can only be imported once the client exists
+    import client  # noqa: F401
+    from chat import irclib
+    return irclib
+
+
+def test_irc_replay_busy_channel(bench, irclib, irc_channel_log, mocker):
+    reads, count = irc_channel_log()
+
+    class Client(irclib.SimpleIRCClient):
+        def __init__(self):
+            irclib.SimpleIRCClient.__init__(self)
+            self.events = 0
+            # Don't answer the server's pings
+            self.connection.send_raw = mocker.Mock()
+
+        def on_default(self, c, e):
+            self.events += 1
+
+        def on_pubmsg(self, c, e):
+            self.events += 1
+
+        def on_action(self, c, e):
+            self.events += 1
+
+    def replay():
+        client = Client()
+        for data in reads:
+            client.connection._feed(data)
+        # Actions come as a ctcp and an action event
+        assert client.events >= count
+
+    bench(replay)
@@ -0,0 +1,141 @@
+import copy
+import functools
+
+import pytest
+from PyQt5.QtCore import QModelIndex
+
+from model.game import Game, GameState
+from model.gameset import Gameset, PlayerGameIndex
+from model.player import Player
+from model.playerset import Playerset
+
+
+@pytest.fixture
+def population(lobby_population):
+    return lobby_population(num_players=10000, num_games=2000)
+
+
+def make_playerset(player_infos):
+    playerset = Playerset()
+    for info in player_infos:
+        playerset[info["id_"]] = Player(**info)
+    return playerset
+
+
+def make_games(playerset, game_infos):
+    return [Game(playerset=playerset, **copy.copy(info)) for info in game_infos]
+
+
+def test_playerset_add_remove(application, bench, population):
+    player_infos, _ = population
+    players = [Player(**info) for info in player_infos]
+
+    def run():
+        playerset = Playerset()
+        for player in players:
+            playerset[player.id] = player
+        for player in players:
+            del playerset[player.id]
+
+    bench(run)
+
+
+def test_gameset_cycle(application, bench, population):
+    player_infos, game_infos = population
+    playerset = make_playerset(player_infos)
+
+    def run():
+        gameset = Gameset(playerset)
+        games = make_games(playerset, game_infos)
+        for g in games:
+            gameset[g.uid] = g
+        for g in games:
+            g.update(title=g.title + " 2v2", num_players=g.num_players - 1)
+        for g in games:
+            g.update(state=GameState.CLOSED)
+        assert not gameset.games
+
+    bench(run, rounds=3)
+
+
+def test_player_game_index(application, bench, population):
+    player_infos, game_infos = population
+    playerset = make_playerset(player_infos)
+    games = make_games(playerset, game_infos)
+
+    def run():
+        index = PlayerGameIndex(playerset)
+        for g in games:
+            index.at_game_update(g, None)
+        for g in games:
+            old = g.snapshot()
+            index.at_game_update(g, old)
+
+    bench(run)
+
+
+def test_game_average_rating(application, bench, population):
+    player_infos, game_infos = population
+    playerset = make_playerset(player_infos)
+    gameset = Gameset(playerset)
+    for g in make_games(playerset, game_infos):
+        gameset[g.uid] = g
+
+    def run():
+        for g in gameset.values():
+            g.average_rating
+
+    bench(run)
+
+
+def test_game_sort_model(application, mocker, bench, population):
+    import client  # noqa: F401
+    from games.gamemodel import GameModel, GameSortModel
+
+    player_infos, game_infos = population
+    playerset = make_playerset(player_infos)
+    gameset = Gameset(playerset)
+    for g in make_games(playerset, game_infos):
+        gameset[g.uid] = g
+
+    me = mocker.Mock()
+    me.isFriend = lambda id_: id_ % 50 == 0
+    model = GameModel(me, mocker.Mock(), gameset)
+    proxy = GameSortModel(me, model)
+    rows = [model.index(row, 0) for row in range(model.rowCount(QModelIndex()))]
+
+    def compare(left, right):
+        if proxy.lessThan(left, right):
+            return -1
+        return 1 if proxy.lessThan(right, left) else 0
+
+    def run():
+        for sort_type in GameSortModel.SortType:
+            proxy.sort_type = sort_type
+            sorted(rows, key=functools.cmp_to_key(compare))
+
+    bench(run, rounds=3)
+
+
+@pytest.mark.parametrize("sorted_view", [False, True])
+def test_game_model_close_games(application, mocker, bench, population, sorted_view):
+    import client  # noqa: F401
+    from games.gamemodel import GameModel, GameSortModel
+
+    player_infos, game_infos = population
+    playerset = make_playerset(player_infos)
+    games = make_games(playerset, game_infos)
+    me = mocker.Mock()
+    me.isFriend = lambda id_: False
+
+    def run():
+        model = GameModel(me, mocker.Mock())
+        model.add_games(games)
+        if sorted_view:
+            proxy = GameSortModel(me, model)
+        # Oldest games first, the rows at the top of the model
+        for g in games[:1000]:
+            model.remove_game(g)
+        assert model.rowCount(QModelIndex()) == len(games) - 1000
+
+    bench(run, rounds=3)
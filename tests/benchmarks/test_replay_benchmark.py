@@ -0,0 +1,56 @@
+import pytest
+
+from lobbyprotocol import FROM_SERVER, LobbyReplayServer, TrafficRecorder, \
+    replay_messages
+from model.gameset import Gameset
+from model.playerset import Playerset
+
+
+@pytest.fixture
+def login_recording(tmpdir, login_burst):
+    from lobbyprotocol import FrameReader
+
+    reads, _ = login_burst()
+    filename = str(tmpdir.join("login.rec.gz"))
+    recorder = TrafficRecorder(filename)
+    frames = FrameReader()
+    for data in reads:
+        for text in frames.feed(data):
+            recorder.record(FROM_SERVER, text)
+    recorder.close()
+    return filename
+
+
+def test_replay_login_into_model(application, bench, login_recording):
+    from client.connection import BatchingDispatcher, LobbyInfo
+
+    def replay():
+        playerset = Playerset()
+        gameset = Gameset(playerset)
+        dispatcher = BatchingDispatcher()
+        dispatcher["welcome"] = lambda message: None
+        LobbyInfo(dispatcher, gameset, playerset)
+        replay_messages(login_recording, dispatcher.dispatch)
+        dispatcher.flush()
+        assert len(playerset) == 3000
+
+    bench(replay, rounds=3)
+
+
+def test_replay_login_over_socket(application, qtbot, bench, login_recording):
+    from PyQt5.QtNetwork import QHostAddress
+    from client.connection import ServerConnection
+
+    server = LobbyReplayServer(login_recording, speed=None)
+    assert server.listen(QHostAddress.LocalHost)
+    expected = replay_messages(login_recording, lambda message: None)
+
+    def replay():
+        received = []
+        connection = ServerConnection("127.0.0.1", server.serverPort(),
+                                      received.append)
+        connection.doConnect()
+        qtbot.waitUntil(lambda: len(received) == expected, timeout=10000)
+        connection.disconnect()
+
+    bench(replay, rounds=3)
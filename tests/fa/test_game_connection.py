@@ -0,0 +1,100 @@
+import random
+
+import pytest
+
+from fa.game_connection import GPGNetParser, packMessage
+
+
+MESSAGES = [
+    ("GameState", ["Idle"]),
+    ("CreateLobby", [0, 6113, "Player", 1234, 1]),
+    ("ConnectToPeer", ["127.0.0.1:6114", "Opponent", 5678]),
+    ("Chat", ["line/nbreak and/ttab"]),
+    ("Empty", []),
+    ("Unicode", ["Grüße ☃"]),
+]
+
+
+def expected(command, args):
+    return command, [a.replace("/n", "\n").replace("/t", "\t")
+                     if isinstance(a, str) else a for a in args]
+
+
+def test_parser_reads_messages():
+    parser = GPGNetParser()
+    stream = b"".join(packMessage(c, a) for c, a in MESSAGES)
+
+    assert parser.feed(stream) == [expected(c, a) for c, a in MESSAGES]
+    assert parser.pending() == 0
+
+
+def test_parser_keeps_partial_messages():
+    parser = GPGNetParser()
+    data = packMessage("CreateLobby", [0, 6113, "Player", 1234, 1])
+
+    assert parser.feed(data[:-3]) == []
+    assert parser.pending() == len(data) - 3
+    assert parser.feed(data[-3:]) == [("CreateLobby", [0, 6113, "Player", 1234, 1])]
+    assert parser.pending() == 0
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_parser_fuzz_splits(seed):
+    rng = random.Random(seed)
+    messages = [rng.choice(MESSAGES) for _ in range(50)]
+    stream = b"".join(packMessage(c, a) for c, a in messages)
+
+    parser = GPGNetParser()
+    received = []
+    pos = 0
+    while pos < len(stream):
+        step = rng.randint(1, 40)
+        received.extend(parser.feed(stream[pos:pos + step]))
+        pos += step
+
+    assert received == [expected(c, a) for c, a in messages]
+    assert parser.pending() == 0
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_parser_fuzz_garbage(seed):
+    rng = random.Random(seed)
+    parser = GPGNetParser()
+    garbage = bytes(rng.randrange(256) for _ in range(200))
+    # Garbage must either be buffered or rejected, nothing else
+    try:
+        parser.feed(garbage)
+    except (ValueError, UnicodeDecodeError):
+        pass
+
+
+def test_parser_rejects_unknown_field():
+    parser = GPGNetParser()
+    data = packMessage("Test", [1])
+    data = data[:-5] + b"\x07" + data[-4:]
+
+    with pytest.raises(ValueError):
+        parser.feed(data)
+
+
+def test_connection_round_trip(application, qtbot):
+    from PyQt5.QtNetwork import QTcpServer, QTcpSocket, QHostAddress
+    from fa.game_connection import GPGNetConnection
+
+    server = QTcpServer()
+    assert server.listen(QHostAddress.LocalHost)
+    game = QTcpSocket()
+    with qtbot.waitSignal(server.newConnection, timeout=1000):
+        game.connectToHost(QHostAddress(QHostAddress.LocalHost), server.serverPort())
+    connection = GPGNetConnection(server.nextPendingConnection())
+
+    with qtbot.waitSignal(connection.messageReceived, timeout=1000) as blocker:
+        game.write(packMessage("GameState", ["Idle"]))
+    assert blocker.args == ["GameState", ["Idle"]]
+
+    parser = GPGNetParser()
+    received = []
+    game.readyRead.connect(lambda: received.extend(parser.feed(game.readAll().data())))
+    connection.send("CreateLobby", 0, 6113, "Player", 1234, 1)
+    qtbot.waitUntil(lambda: len(received) > 0, timeout=1000)
+    assert received == [("CreateLobby", [0, 6113, "Player", 1234, 1])]
@@ -0,0 +1,176 @@
+from fa import maps
+
+
+def test_directory_index_is_case_insensitive(tmpdir):
+    tmpdir.mkdir("Some_Map.v0001")
+    index = maps.DirectoryIndex(lambda: str(tmpdir))
+    assert "some_map.v0001" in index
+    assert index.get("SOME_MAP.V0001") == "Some_Map.v0001"
+    assert index.get("other_map") is None
+
+
+def test_directory_index_missing_dir(tmpdir):
+    index = maps.DirectoryIndex(lambda: str(tmpdir.join("nothing")))
+    assert index.names() == []
+    assert "some_map" not in index
+
+
+def test_directory_index_doesnt_relist_until_checked(tmpdir, mocker):
+    index = maps.DirectoryIndex(lambda: str(tmpdir))
+    assert index.names() == []
+    tmpdir.mkdir("new_map")
+
+    listdir = mocker.spy(maps.os, "listdir")
+    assert "new_map" not in index
+    assert not listdir.called
+
+    assert index.get("new_map", check_on_miss=True) == "new_map"
+
+
+def test_directory_index_invalidate(tmpdir):
+    index = maps.DirectoryIndex(lambda: str(tmpdir))
+    assert index.names() == []
+    tmpdir.mkdir("new_map")
+    index.invalidate()
+    assert index.names() == ["new_map"]
+
+
+def make_dds(width, height, pixels):
+    header = bytearray(maps.DDS_HEADER_SIZE)
+    header[0:4] = b"DDS "
+    header[12:20] = maps.struct.pack("<II", height, width)
+    return bytes(header) + bytes(pixels)
+
+
+def test_dds_to_image_drops_alpha(application):
+    # Blue, green, red and white pixels stored as BGRA with varying alpha
+    pixels = [255, 0, 0, 0,
+              0, 255, 0, 10,
+              0, 0, 255, 128,
+              255, 255, 255, 255]
+    image = maps.ddsToImage(make_dds(2, 2, pixels))
+    assert image.width() == 2 and image.height() == 2
+    assert image.pixelColor(0, 0).getRgb() == (0, 0, 255, 255)
+    assert image.pixelColor(1, 0).getRgb() == (0, 255, 0, 255)
+    assert image.pixelColor(0, 1).getRgb() == (255, 0, 0, 255)
+    assert image.pixelColor(1, 1).getRgb() == (255, 255, 255, 255)
+
+
+def test_dds_to_image_without_size_assumes_square(application):
+    data = bytearray(make_dds(0, 0, [1, 2, 3, 4] * 16))
+    image = maps.ddsToImage(data)
+    assert image.width() == 4 and image.height() == 4
+    assert image.pixelColor(3, 3).getRgb() == (3, 2, 1, 255)
+
+
+def test_preview_from_scmap(application, tmpdir):
+    dds = make_dds(4, 4, [10, 20, 30, 40] * 16)
+    scmap = tmpdir.join("map.scmap")
+    scmap.write_binary(bytes(30) + maps.struct.pack("i", len(dds)) + dds)
+    assert maps.readDDSFromMap(str(scmap)) == dds
+
+    png = tmpdir.join("map.small.png")
+    maps.genPrevFromDDSData(maps.readDDSFromMap(str(scmap)), str(png),
+                            small=True)
+    image = maps.QtGui.QImage(str(png))
+    assert image.width() == 100
+    assert image.pixelColor(50, 50).getRgb() == (30, 20, 10, 255)
+
+
+def make_map_dir(tmpdir, name):
+    dds = make_dds(4, 4, [10, 20, 30, 40] * 16)
+    mapdir = tmpdir.mkdir("maps").mkdir(name)
+    mapdir.join(name + ".scmap").write_binary(
+        bytes(30) + maps.struct.pack("i", len(dds)) + dds)
+    return mapdir
+
+
+def test_export_small_preview(application, tmpdir, mocker):
+    cache = tmpdir.mkdir("cache")
+    mocker.patch.object(maps.util, "MAP_PREVIEW_DIR", str(cache))
+    mapdir = make_map_dir(tmpdir, "some_map")
+
+    path = maps.exportSmallPreview(str(mapdir))
+    assert path == str(cache.join("some_map.png"))
+    assert maps.QtGui.QImage(path).width() == 100
+    assert mapdir.join("some_map.small.png").check()
+    # Only needed for uploads
+    assert not mapdir.join("some_map.dds").check()
+
+
+def test_export_small_preview_missing_map(application, tmpdir, mocker):
+    mocker.patch.object(maps.util, "MAP_PREVIEW_DIR", str(tmpdir))
+    assert maps.exportSmallPreview(str(tmpdir.mkdir("no_scmap"))) is None
+
+
+def test_preview_without_generating(application, tmpdir, mocker):
+    mocker.patch.object(maps.util, "MAP_PREVIEW_DIR", str(tmpdir))
+    mocker.patch.object(maps, "_preview_cache",
+                        maps.PreviewCache(maps.DirectoryIndex(str)))
+    mocker.patch.object(maps, "_is_local_map", return_value=True)
+    export = mocker.patch.object(maps, "exportSmallPreview")
+
+    assert maps.preview("some_map", generate=False) is None
+    assert not export.called
+
+
+def make_preview_cache(tmpdir):
+    return maps.PreviewCache(maps.DirectoryIndex(lambda: str(tmpdir)))
+
+
+def save_preview(tmpdir, name):
+    image = maps.QtGui.QImage(4, 4, maps.QtGui.QImage.Format_RGB32)
+    image.fill(0)
+    assert image.save(str(tmpdir.join(name + ".png")))
+
+
+def test_preview_cache_loads_once(application, tmpdir, mocker):
+    save_preview(tmpdir, "Some_Map")
+    cache = make_preview_cache(tmpdir)
+    pixmap = mocker.spy(maps.QtGui, "QPixmap")
+
+    icon = cache.get("some_map")
+    assert icon is not None and not icon.isNull()
+    assert cache.get("SOME_MAP") is icon
+    assert cache.get("some_map", pixmap=True).width() == 4
+    assert pixmap.call_count == 1
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_preview_cache_is_bounded(application, tmpdir, mocker):
+    mocker.patch.object(maps.PreviewCache, "MAX_ENTRIES", 2)
+    for name in ["a", "b", "c"]:
+        save_preview(tmpdir, name)
+    cache = make_preview_cache(tmpdir)
+
+    cache.get("a")
+    cache.get("b")
+    cache.get("a")
+    cache.get("c")      # Drops b, the least recently used
+    assert cache.misses == 3
+    cache.get("a")
+    assert cache.misses == 3
+    cache.get("b")
+    assert cache.misses == 4
+
+
+def test_preview_cache_remembers_missing(application, tmpdir, mocker):
+    cache = make_preview_cache(tmpdir)
+    monotonic = mocker.patch.object(maps.time, "monotonic", return_value=0)
+    assert cache.get("some_map") is None
+
+    save_preview(tmpdir, "some_map")
+    listdir = mocker.spy(maps.os, "listdir")
+    assert cache.get("some_map") is None
+    assert not listdir.called
+
+    monotonic.return_value = maps.PreviewCache.MISSING_TTL + 1
+    assert cache.get("some_map") is not None
+
+
+def test_preview_cache_invalidate(application, tmpdir):
+    cache = make_preview_cache(tmpdir)
+    assert cache.get("some_map") is None
+    save_preview(tmpdir, "some_map")
+    cache.invalidate("Some_Map")
+    assert cache.get("some_map") is not None
@@ -4,6 +4,10 @@ from fa import updater
 from PyQt5 import QtWidgets, QtCore
 import pytest
 import collections
+import hashlib
+import http.server
+import os
+import threading
 
 class NoIsFinished(QtCore.QObject):
     finished = QtCore.pyqtSignal()
@@ -91,3 +95,132 @@ def test_updater_does_not_hide_and_accept_before_all_watches_are_finished(applic
     assert u.isVisible()
     assert not u.result() == QtWidgets.QDialog.Accepted
 
+
+
+class RangeHandler(http.server.BaseHTTPRequestHandler):
+    content = bytes(range(256)) * 64
+    etag = '"v1"'
+    honor_range = True
+    wrong_range = False
+    requests = []
+    if_ranges = []
+
+    def do_GET(self):
+        RangeHandler.requests.append(self.headers.get("Range"))
+        RangeHandler.if_ranges.append(self.headers.get("If-Range"))
+        start = 0
+        rng = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if rng is not None and self.honor_range and if_range in (None, self.etag):
+            start = int(rng[len("bytes="):-1])
+            if self.wrong_range:
+                start = 0
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes {}-{}/{}".format(
+                start, len(self.content) - 1, len(self.content)))
+        else:
+            self.send_response(200)
+        body = self.content[start:]
+        self.send_header("ETag", self.etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    RangeHandler.requests = []
+    RangeHandler.if_ranges = []
+    RangeHandler.honor_range = True
+    RangeHandler.wrong_range = False
+    server = http.server.HTTPServer(("127.0.0.1", 0), RangeHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield "http://127.0.0.1:{}/file".format(server.server_port)
+    server.shutdown()
+    thread.join()
+
+
+def fetch(qtbot, url, target):
+    downloads = updater.UpdateDownloads()
+    results = []
+    downloads.fetch(url, str(target), results.append)
+    qtbot.waitUntil(lambda: len(results) > 0, timeout=5000)
+    return results[0]
+
+
+def write_partial(url, data, validator=RangeHandler.etag):
+    partpath = updater.UpdateDownloads.partialFile(url)
+    os.makedirs(os.path.dirname(partpath))
+    with open(partpath, "wb") as f:
+        f.write(data)
+    if validator is not None:
+        with open(updater.UpdateDownloads.validatorFile(partpath), "w") as f:
+            f.write(validator)
+    return partpath
+
+
+def test_downloads_resume_partial_files(application, qtbot, tmpdir, mocker, http_server):
+    mocker.patch.object(updater.util, "CACHE_DIR", str(tmpdir))
+    partpath = write_partial(http_server, RangeHandler.content[:1000])
+
+    target = tmpdir.join("target")
+    assert fetch(qtbot, http_server, target)
+    assert target.read_binary() == RangeHandler.content
+    assert RangeHandler.requests == ["bytes=1000-"]
+    assert RangeHandler.if_ranges == [RangeHandler.etag]
+    assert not os.path.exists(partpath)
+    assert not os.path.exists(updater.UpdateDownloads.validatorFile(partpath))
+
+
+def test_downloads_start_over_without_range_support(application, qtbot, tmpdir, mocker, http_server):
+    mocker.patch.object(updater.util, "CACHE_DIR", str(tmpdir))
+    RangeHandler.honor_range = False
+    write_partial(http_server, b"garbage")
+
+    target = tmpdir.join("target")
+    assert fetch(qtbot, http_server, target)
+    assert target.read_binary() == RangeHandler.content
+
+
+def test_downloads_start_over_if_file_changed(application, qtbot, tmpdir, mocker, http_server):
+    mocker.patch.object(updater.util, "CACHE_DIR", str(tmpdir))
+    write_partial(http_server, b"old version", validator='"v0"')
+
+    target = tmpdir.join("target")
+    assert fetch(qtbot, http_server, target)
+    assert target.read_binary() == RangeHandler.content
+    assert RangeHandler.if_ranges == ['"v0"']
+
+
+def test_downloads_dont_resume_without_validator(application, qtbot, tmpdir, mocker, http_server):
+    mocker.patch.object(updater.util, "CACHE_DIR", str(tmpdir))
+    write_partial(http_server, b"unknown", validator=None)
+
+    target = tmpdir.join("target")
+    assert fetch(qtbot, http_server, target)
+    assert target.read_binary() == RangeHandler.content
+    assert RangeHandler.requests == [None]
+
+
+def test_downloads_discard_wrong_range(application, qtbot, tmpdir, mocker, http_server):
+    mocker.patch.object(updater.util, "CACHE_DIR", str(tmpdir))
+    RangeHandler.wrong_range = True
+    partpath = write_partial(http_server, RangeHandler.content[:1000])
+
+    target = tmpdir.join("target")
+    assert not fetch(qtbot, http_server, target)
+    assert not target.check()
+    assert not os.path.exists(partpath)
+
+
+def test_hash_files(application, tmpdir, mocker):
+    mocker.patch.object(updater.digests, "cache",
+                        return_value=updater.digests.DigestCache(str(tmpdir.join("digests.json"))))
+    tmpdir.join("a").write_binary(b"a")
+    u = updater.Updater("faf", silent=True)
+    md5s = u.hashFiles([str(tmpdir.join("a")), str(tmpdir.join("b"))])
+    assert md5s == [hashlib.md5(b"a").hexdigest(), None]
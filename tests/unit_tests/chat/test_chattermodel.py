@@ -0,0 +1,154 @@
+import pytest
+
+from PyQt5.QtCore import QModelIndex, QPersistentModelIndex, Qt
+
+from model.ircuser import IrcUser
+from model.player import Player
+
+
+@pytest.fixture
+def chattermodel(application):
+    # The chat package can only be imported once the client exists
+    import client  # noqa: F401
+    from chat import chattermodel
+    return chattermodel
+
+
+@pytest.fixture
+def me(mocker):
+    me = mocker.Mock()
+    me.login = "Me"
+    me.friends = set()
+    me.foes = set()
+    me.isFriend = lambda id_=-1, name=None: (id_ if id_ != -1 else name) in me.friends
+    me.isFoe = lambda id_=-1, name=None: (id_ if id_ != -1 else name) in me.foes
+    return me
+
+
+@pytest.fixture
+def model(chattermodel, me, mocker):
+    colors = mocker.Mock()
+    colors.getUserColor.return_value = "#808080"
+    colors.getModColor.return_value = "#ffffff"
+    return chattermodel.ChatterModel(me, colors, mocker.Mock(), mocker.Mock())
+
+
+def nicks(proxy):
+    return [proxy.index(row, 2).data(Qt.DisplayRole)
+            for row in range(proxy.rowCount(QModelIndex()))]
+
+
+def test_users_share_rows_across_channels(chattermodel, model):
+    aeolus = chattermodel.ChatterSortFilterModel(model, "#aeolus")
+    newbie = chattermodel.ChatterSortFilterModel(model, "#newbie")
+    a, b = IrcUser("a", ""), IrcUser("b", "")
+
+    model.add_chatter(a, "#aeolus")
+    model.add_chatter(b, "#aeolus")
+    model.add_chatter(b, "#newbie")
+    assert model.rowCount(QModelIndex()) == 2
+    assert nicks(aeolus) == ["a", "b"]
+    assert nicks(newbie) == ["b"]
+
+    model.remove_chatter(b, "#aeolus")
+    assert model.rowCount(QModelIndex()) == 2
+    assert nicks(aeolus) == ["a"]
+    assert nicks(newbie) == ["b"]
+
+    model.remove_channel("#newbie")
+    assert model.rowCount(QModelIndex()) == 1
+    assert nicks(newbie) == []
+    assert model.item(b) is None
+
+
+def test_nick_list_order(chattermodel, model, me):
+    proxy = chattermodel.ChatterSortFilterModel(model, "#aeolus")
+    users = {name: IrcUser(name, "") for name in
+             ["zed", "Me", "mod", "friend", "foe", "player", "alice"]}
+    users["player"].player = Player(id_=1, login="player")
+    users["alice"].player = Player(id_=2, login="alice")
+    me.friends.add("friend")
+    me.foes.add("foe")
+    users["mod"].set_elevation("#aeolus", "@")
+    for user in users.values():
+        model.add_chatter(user, "#aeolus")
+
+    assert nicks(proxy) == ["Me", "mod", "friend", "alice", "player",
+                            "zed", "foe"]
+
+    model.friends_on_top = True
+    proxy.invalidate()
+    assert nicks(proxy)[:3] == ["Me", "friend", "mod"]
+
+
+def test_nick_list_follows_changes(chattermodel, model, me):
+    proxy = chattermodel.ChatterSortFilterModel(model, "#aeolus")
+    a, b = IrcUser("a", ""), IrcUser("b", "")
+    model.add_chatter(a, "#aeolus")
+    model.add_chatter(b, "#aeolus")
+
+    b.update(name="0b")
+    assert nicks(proxy) == ["0b", "a"]
+
+    me.friends.add("a")
+    model._at_irc_relations_updated({"a"})
+    assert nicks(proxy) == ["a", "0b"]
+
+    a.player = Player(id_=3, login="a", clan="CLN")
+    assert nicks(proxy) == ["[CLN]a", "0b"]
+    assert model.item(a).chat_name == "<b>[CLN]</b>a"
+
+
+def test_nick_filter(chattermodel, model):
+    proxy = chattermodel.ChatterSortFilterModel(model, "#aeolus")
+    for name in ["Alpha", "beta", "alphonse"]:
+        model.add_chatter(IrcUser(name, ""), "#aeolus")
+
+    proxy.set_nick_filter("ALPH")
+    assert nicks(proxy) == ["Alpha", "alphonse"]
+    model.add_chatter(IrcUser("xalphx", ""), "#aeolus")
+    model.add_chatter(IrcUser("gamma", ""), "#aeolus")
+    assert nicks(proxy) == ["Alpha", "alphonse", "xalphx"]
+    proxy.set_nick_filter("")
+    assert len(nicks(proxy)) == 5
+
+
+def test_add_chatters_in_bulk(chattermodel, model, mocker):
+    aeolus = chattermodel.ChatterSortFilterModel(model, "#aeolus")
+    newbie = chattermodel.ChatterSortFilterModel(model, "#newbie")
+    users = [IrcUser("user{}".format(i), "") for i in range(5)]
+    model.add_chatter(users[0], "#newbie")
+
+    inserted = mocker.Mock()
+    changed = mocker.Mock()
+    model.rowsInserted.connect(inserted)
+    model.dataChanged.connect(changed)
+    model.add_chatters(users, "#aeolus")
+
+    assert inserted.call_count == 1
+    assert changed.call_count == 1
+    assert nicks(aeolus) == ["user{}".format(i) for i in range(5)]
+    assert nicks(newbie) == ["user0"]
+
+
+def test_removal_keeps_persistent_indexes(chattermodel, model, mocker):
+    aeolus = chattermodel.ChatterSortFilterModel(model, "#aeolus")
+    users = [IrcUser("user{}".format(i), "") for i in range(8)]
+    model.add_chatters(users, "#aeolus")
+    model.add_chatter(users[2], "#newbie")
+    kept = {i: QPersistentModelIndex(model.index(i, 2)) for i in (2, 5, 7)}
+
+    removed = mocker.Mock()
+    model.rowsRemoved.connect(removed)
+    model.remove_user(users[0])
+    for i in (3, 4, 6):
+        model.remove_chatter(users[i], "#aeolus")
+    model.remove_channel("#aeolus")
+
+    assert model.rowCount(QModelIndex()) == 1
+    assert not kept[5].isValid() and not kept[7].isValid()
+    assert model.item_at(kept[2].row()) is model.item(users[2])
+    assert nicks(aeolus) == []
+    # Leaving the channel removes user5 and user7 as one run, then user1
+    assert [c[0][1:] for c in removed.call_args_list] == [
+        (0, 0), (2, 2), (2, 2), (3, 3), (2, 3), (0, 0)]
@@ -0,0 +1,97 @@
+import pytest
+
+
+@pytest.fixture
+def irclib(application):
+    # The chat package can only be imported once the client exists
+    import client  # noqa: F401
+    from chat import irclib
+    return irclib
+
+
+@pytest.mark.parametrize("line, parsed", [
+    ("PING :irc.faforever.com",
+     (None, "ping", ["irc.faforever.com"])),
+    (":nick!user@host PRIVMSG #aeolus :gl hf all",
+     ("nick!user@host", "privmsg", ["#aeolus", "gl hf all"])),
+    (":irc.faforever.com 353 me = #aeolus :@a +b c",
+     ("irc.faforever.com", "353", ["me", "=", "#aeolus", "@a +b c"])),
+    (":nick!user@host   MODE  #aeolus +o  other",
+     ("nick!user@host", "mode", ["#aeolus", "+o", "other"])),
+    (":nick!user@host PART #aeolus",
+     ("nick!user@host", "part", ["#aeolus"])),
+    ("QUIT", (None, "quit", [])),
+])
+def test_parse_line(irclib, line, parsed):
+    assert irclib._parse_line(line) == parsed
+
+
+def test_split_lines_keeps_unfinished_line(irclib):
+    buffer = bytearray(b"PING :a\r\nPING :b\nPI")
+    assert irclib._split_lines(buffer) == [b"PING :a", b"PING :b"]
+    assert buffer == b"PI"
+    buffer += b"NG :c\r"
+    assert irclib._split_lines(buffer) == []
+    buffer += b"\n"
+    assert irclib._split_lines(buffer) == [b"PING :c"]
+    assert buffer == b""
+
+
+@pytest.fixture
+def connection(irclib):
+    irc = irclib.IRC()
+    return irc.server()
+
+
+def received(connection, eventtype):
+    events = []
+    connection.add_global_handler(
+        eventtype, lambda c, e: events.append((e.eventtype(), e.source(),
+                                               e.target(), e.arguments())))
+    return events
+
+
+def test_events_from_lines_split_across_reads(connection):
+    events = received(connection, "all_events")
+    connection._feed(b":a!u@h PRIVMSG #aeolus :hel")
+    assert events == []
+    connection._feed(b"lo\r\n:b!u@h PRIVMSG me :\x01ACTION waves\x01\r\n")
+    assert events == [
+        ("pubmsg", "a!u@h", "#aeolus", ["hello"]),
+        ("ctcp", "b!u@h", "me", ["ACTION", "waves"]),
+        ("action", "b!u@h", "me", ["waves"]),
+    ]
+
+
+def test_raw_messages_only_for_subscribers(irclib, connection, mocker):
+    events = received(connection, "all_events")
+    connection._feed(b"NOTICE me :hi\r\n")
+    assert [e[0] for e in events] == ["privnotice"]
+
+    event_class = mocker.spy(irclib, "Event")
+    connection._feed(b"NOTICE me :hi\r\n")
+    assert event_class.call_count == 1
+
+    raw = received(connection, "all_raw_messages")
+    connection._feed(b"NOTICE me :again\r\n")
+    assert raw == [("all_raw_messages", "", None, ["NOTICE me :again"])]
+    assert [e[0] for e in events] == ["privnotice"] * 3
+
+
+def test_handler_chain_follows_handlers(connection):
+    calls = []
+
+    def first(c, e):
+        calls.append("first")
+
+    def stop(c, e):
+        calls.append("stop")
+        return "NO MORE"
+
+    connection.add_global_handler("join", first, 1)
+    connection._feed(b":a!u@h JOIN #aeolus\r\n")
+    connection.add_global_handler("join", stop, 0)
+    connection._feed(b":a!u@h JOIN #aeolus\r\n")
+    connection.remove_global_handler("join", stop)
+    connection._feed(b":a!u@h JOIN #aeolus\r\n")
+    assert calls == ["first", "stop", "first"]
@@ -0,0 +1,103 @@
+import pytest
+
+from PyQt5.QtGui import QTextDocument
+
+
+@pytest.fixture
+def scrollback(application):
+    # The chat package can only be imported once the client exists
+    import client  # noqa: F401
+    from chat import scrollback
+    return scrollback
+
+
+def row(i):
+    return "<tr><td>line {}</td></tr>".format(i)
+
+
+def shown(document):
+    return [line for line in document.toPlainText().split("\n") if line]
+
+
+def test_history_batches(scrollback, tmpdir):
+    history = scrollback.open_history(str(tmpdir.join("chat")), "#aeolus")
+    history.append(["a", "b\nc"])
+    history.append(["d"])
+    assert len(history) == 2
+    assert history.read(0) == ["a", "b\nc"]
+    assert history.read(1) == ["d"]
+    assert tmpdir.join("chat", "%23aeolus.gz").check()
+
+
+def test_scrollback_keeps_newest_lines(scrollback):
+    document = QTextDocument()
+    lines = scrollback.Scrollback(document, limit=10, chunk=4)
+    lines.append([row(i) for i in range(10)])
+    assert len(lines) == 10
+
+    lines.append([row(10)])
+    assert len(lines) == 7
+    assert shown(document) == ["line {}".format(i) for i in range(4, 11)]
+    assert not lines.has_older()
+
+
+def test_scrollback_keeps_lines_while_reading_back(scrollback):
+    document = QTextDocument()
+    lines = scrollback.Scrollback(document, limit=10, chunk=4)
+    lines.append([row(i) for i in range(40)], reading_back=True)
+    assert len(lines) == 40
+
+    # Past the longer limit, only a chunk goes at a time
+    lines.append([row(40)], reading_back=True)
+    assert len(lines) == 37
+    assert shown(document)[0] == "line 4"
+
+    lines.append([row(41)])
+    assert len(lines) == 10
+
+
+def test_scrollback_loads_older_lines(scrollback, tmpdir):
+    document = QTextDocument()
+    history = scrollback.ChatHistory(str(tmpdir.join("history.gz")))
+    lines = scrollback.Scrollback(document, history, limit=10, chunk=4)
+    for i in range(18):
+        lines.append([row(i)])
+    assert shown(document) == ["line {}".format(i) for i in range(8, 18)]
+
+    assert lines.load_older()
+    assert shown(document) == ["line {}".format(i) for i in range(4, 18)]
+    assert lines.load_older()
+    assert shown(document) == ["line {}".format(i) for i in range(18)]
+    assert not lines.load_older()
+
+    # Back at the bottom, loaded lines go first and aren't written again
+    lines.append([row(18)])
+    assert shown(document) == ["line {}".format(i) for i in range(12, 19)]
+    assert len(history) == 3
+    assert history.read(2) == [row(i) for i in range(8, 12)]
+
+
+def test_scrollback_with_chat_formatters(scrollback):
+    from chat.channel import Formatters
+
+    def line(i):
+        text = "line {}".format(i)
+        if i % 3 == 0:
+            return Formatters.FORMATTER_ANNOUNCEMENT.format(
+                size=4, color="grey", text=text)
+        if i % 3 == 1:
+            return Formatters.FORMATTER_RAW.format(
+                name="nick", color="grey", width=100, text=text)
+        return Formatters.FORMATTER_MESSAGE.format(
+            time="12:00", name="nick", color="grey", width=100, text=text)
+
+    document = QTextDocument()
+    lines = scrollback.Scrollback(document, limit=10, chunk=4)
+    for i in range(25):
+        lines.append([line(i)])
+    assert len(lines) == 9
+    texts = [t for t in shown(document) if t.startswith("line")]
+    assert texts == ["line {}".format(i) for i in range(16, 25)]
+    # Nothing is left of the cells of dropped lines
+    assert shown(document).count("12:00") == 3
+    assert len([t for t in shown(document) if t.startswith("nick")]) == 6
@@ -0,0 +1,144 @@
+import json
+
+from PyQt5.QtCore import QByteArray, QDataStream, QIODevice
+
+
+def qdatastream_frame(text):
+    block = QByteArray()
+    out = QDataStream(block, QIODevice.ReadWrite)
+    out.setVersion(QDataStream.Qt_4_2)
+    out.writeUInt32(0)
+    out.writeQString(text)
+    out.device().seek(0)
+    out.writeUInt32(block.size() - 4)
+    return bytes(block)
+
+
+def test_pack_frame_matches_qdatastream(application):
+    import client  # noqa: F401
+    from client.connection import pack_frame
+
+    for text in ["PING", "", '{"command": "hello"}', "Grüße ☃ 🎮"]:
+        assert pack_frame(text) == qdatastream_frame(text)
+
+
+def test_frame_reader_splits_stream(application):
+    import client  # noqa: F401
+    from client.connection import FrameReader, pack_frame
+
+    texts = ["PING", '{"command": "welcome"}', "Grüße 🎮", ""]
+    stream = b"".join(pack_frame(t) for t in texts)
+    reader = FrameReader()
+
+    received = []
+    for i in range(0, len(stream), 3):
+        received.extend(reader.feed(stream[i:i + 3]))
+    assert received == texts
+    assert reader.feed(stream) == texts
+
+
+def test_decode_json_falls_back(mocker):
+    import lobbyprotocol
+
+    assert lobbyprotocol.decode_json('{"a": [1, 2]}') == {"a": [1, 2]}
+    assert lobbyprotocol.decode_json('{"a": NaN}')["a"] != 0
+
+    mocker.patch.object(lobbyprotocol, "fast_json", None)
+    assert lobbyprotocol.decode_json('{"a": [1, 2]}') == {"a": [1, 2]}
+
+
+def test_server_connection_drains_all_frames(application, mocker):
+    import client  # noqa: F401
+    from client.connection import ServerConnection, pack_frame
+
+    dispatch = mocker.Mock()
+    connection = ServerConnection("localhost", 0, dispatch)
+    connection.socket = mocker.Mock()
+    pongs = mocker.Mock()
+    connection.received_pong.connect(pongs)
+
+    messages = [{"command": "welcome"}, {"command": "player_info"}]
+    data = (pack_frame("PING") + pack_frame("PONG")
+            + b"".join(pack_frame(json.dumps(m)) for m in messages))
+    connection.socket.readAll.return_value = QByteArray(data)
+
+    connection.readFromServer()
+
+    assert [c[0][0] for c in dispatch.call_args_list] == messages
+    connection.socket.write.assert_called_once_with(pack_frame("PONG"))
+    assert pongs.called
+
+
+def test_batching_dispatcher_coalesces(application, qtbot):
+    import client  # noqa: F401
+    from client.connection import BatchingDispatcher
+
+    dispatcher = BatchingDispatcher()
+    received = []
+    dispatcher["game_info"] = received.append
+    dispatcher["player_info"] = received.append
+
+    dispatcher.dispatch({"command": "game_info", "uid": 1, "state": "open"})
+    dispatcher.dispatch({"command": "player_info",
+                         "players": [{"id": 5, "login": "A"}]})
+    dispatcher.dispatch({"command": "game_info", "games": [
+        {"command": "game_info", "uid": 2, "state": "open"},
+        {"command": "game_info", "uid": 1, "state": "playing"}]})
+    dispatcher.dispatch({"command": "player_info",
+                         "players": [{"id": 5, "login": "B"}]})
+    assert received == []
+
+    qtbot.waitUntil(lambda: len(received) == 2, timeout=1000)
+    assert received == [
+        {"command": "player_info", "players": [{"id": 5, "login": "B"}]},
+        {"command": "game_info", "games": [
+            {"command": "game_info", "uid": 1, "state": "playing"},
+            {"command": "game_info", "uid": 2, "state": "open"}]},
+    ]
+
+
+def test_batching_dispatcher_passes_lone_game_on(application):
+    import client  # noqa: F401
+    from client.connection import BatchingDispatcher
+
+    dispatcher = BatchingDispatcher()
+    received = []
+    dispatcher["game_info"] = received.append
+
+    dispatcher.dispatch({"command": "game_info", "uid": 1, "state": "open"})
+    dispatcher.flush()
+    dispatcher.dispatch({"command": "game_info", "games": [
+        {"uid": 2, "state": "open"}]})
+    dispatcher.flush()
+    assert received == [
+        {"command": "game_info", "uid": 1, "state": "open"},
+        {"command": "game_info", "uid": 2, "state": "open"},
+    ]
+
+
+def test_batching_dispatcher_keeps_order(application):
+    import client  # noqa: F401
+    from client.connection import BatchingDispatcher
+
+    dispatcher = BatchingDispatcher()
+    received = []
+    dispatcher["game_info"] = lambda m: received.append("game_info")
+    dispatcher["game_launch"] = lambda m: received.append("game_launch")
+
+    dispatcher.dispatch({"command": "game_info", "uid": 1})
+    dispatcher.dispatch({"command": "game_launch", "uid": 1})
+    assert received == ["game_info", "game_launch"]
+
+
+def test_batching_dispatcher_clear(application, qtbot):
+    import client  # noqa: F401
+    from client.connection import BatchingDispatcher
+
+    dispatcher = BatchingDispatcher()
+    received = []
+    dispatcher["game_info"] = received.append
+
+    dispatcher.dispatch({"command": "game_info", "uid": 1})
+    dispatcher.clear()
+    qtbot.wait(10)
+    assert received == []
@@ -0,0 +1,72 @@
+import gzip
+import json
+
+import pytest
+
+from lobbyprotocol import FROM_CLIENT, FROM_SERVER, LobbyReplayServer, \
+    TrafficRecorder, read_recording, replay_messages
+
+
+@pytest.fixture
+def recording(tmpdir):
+    filename = str(tmpdir.join("lobby.rec.gz"))
+    recorder = TrafficRecorder(filename)
+    recorder.record(FROM_CLIENT, json.dumps({"command": "ask_session"}))
+    recorder.record(FROM_SERVER, json.dumps({"command": "session", "session": 1}))
+    recorder.record(FROM_SERVER, "PING")
+    for uid in range(50):
+        recorder.record(FROM_SERVER, json.dumps({"command": "game_info", "uid": uid}))
+    recorder.close()
+    return filename
+
+
+def test_recording_round_trip(recording):
+    records = list(read_recording(recording))
+
+    assert len(records) == 53
+    assert records[0][0] == FROM_CLIENT
+    assert records[2][0] == FROM_SERVER and records[2][2] == "PING"
+    timestamps = [t for _, t, _ in records]
+    assert timestamps == sorted(timestamps)
+
+
+def test_read_recording_rejects_other_files(tmpdir):
+    filename = str(tmpdir.join("other.gz"))
+    with gzip.open(filename, "wb") as f:
+        f.write(b"something else")
+
+    with pytest.raises(ValueError):
+        list(read_recording(filename))
+
+
+def test_replay_messages(recording):
+    received = []
+    assert replay_messages(recording, received.append) == 51
+    assert received[0] == {"command": "session", "session": 1}
+    assert received[-1] == {"command": "game_info", "uid": 49}
+
+
+@pytest.mark.parametrize("speed", [None, 10.0])
+def test_replay_server(application, qtbot, mocker, recording, tmpdir, speed):
+    import client  # noqa: F401
+    from client.connection import ServerConnection
+    from PyQt5.QtNetwork import QHostAddress
+
+    server = LobbyReplayServer(recording, speed)
+    assert server.listen(QHostAddress.LocalHost)
+
+    received = []
+    connection = ServerConnection("127.0.0.1", server.serverPort(), received.append)
+    rerecorded = str(tmpdir.join("again.rec.gz"))
+    connection.start_recording(rerecorded)
+    connection.doConnect()
+
+    qtbot.waitUntil(lambda: len(received) == 51, timeout=3000)
+    connection.stop_recording()
+    connection.disconnect()
+
+    assert received[-1] == {"command": "game_info", "uid": 49}
+    # The client answered the PING, and both directions were recorded
+    records = list(read_recording(rerecorded))
+    assert (FROM_CLIENT, "PONG") in [(d, text) for d, _, text in records]
+    assert len([d for d, _, _ in records if d == FROM_SERVER]) == 52
@@ -0,0 +1,28 @@
+from PyQt5.QtCore import QCoreApplication
+from PyQt5.QtNetwork import QUdpSocket
+
+from connectivity.helper import ConnectivityHelper
+
+
+def free_port():
+    socket = QUdpSocket()
+    socket.bind()
+    port = socket.localPort()
+    socket.close()
+    return port
+
+
+def test_stop_frees_port(application, mocker):
+    mocker.patch("connectivity.qturnsocket.QHostInfo")   # No TURN server lookup
+    port = free_port()
+    helper = ConnectivityHelper(mocker.Mock(), port)
+    assert helper._socket.localPort() == port
+    helper.stop()
+    assert not helper._thread.isRunning()
+    assert helper._socket.thread() is QCoreApplication.instance().thread()
+
+    # The next login gets the same port
+    helper = ConnectivityHelper(mocker.Mock(), port)
+    assert helper._socket.localPort() == port
+    helper.stop()
+    helper.stop()
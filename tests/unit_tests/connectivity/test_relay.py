@@ -0,0 +1,56 @@
+import time
+
+from PyQt5.QtNetwork import QUdpSocket, QHostAddress
+
+from connectivity.relay import Relay
+from connectivity.thread import NetworkThread
+
+
+def test_relay_forwards_game_traffic(application, qtbot):
+    received = []
+    relay = Relay(0, "Peer", 1, received.append)
+    with qtbot.waitSignal(relay.bound, timeout=1000) as blocker:
+        relay.listen()
+    port, = blocker.args
+
+    game = QUdpSocket()
+    for i in range(20):
+        game.writeDatagram(str(i).encode(), QHostAddress(QHostAddress.LocalHost), port)
+    qtbot.waitUntil(lambda: len(received) == 20, timeout=1000)
+
+    assert received == [str(i).encode() for i in range(20)]
+
+
+def test_relay_sends_to_game(application, qtbot):
+    game = QUdpSocket()
+    assert game.bind(QHostAddress(QHostAddress.LocalHost), 0)
+    relay = Relay(game.localPort(), "Peer", 1, lambda data: None)
+
+    relay.send(b"hello")
+    qtbot.waitUntil(game.hasPendingDatagrams, timeout=1000)
+
+    data, _, _ = game.readDatagram(game.pendingDatagramSize())
+    assert data == b"hello"
+
+
+def test_relay_in_thread_forwards_while_gui_blocks(application):
+    thread = NetworkThread()
+    thread.start()
+    try:
+        received = []
+        relay = thread.call_blocking(Relay, 0, "Peer", 1, received.append)
+        thread.call_blocking(relay.listen)
+        port = thread.call_blocking(lambda: relay._socket.localPort())
+
+        game = QUdpSocket()
+        for i in range(20):
+            game.writeDatagram(str(i).encode(), QHostAddress(QHostAddress.LocalHost), port)
+
+        # No GUI events are processed here
+        deadline = time.monotonic() + 1
+        while len(received) < 20 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert received == [str(i).encode() for i in range(20)]
+    finally:
+        thread.call_blocking(relay.close)
+        thread.stop()
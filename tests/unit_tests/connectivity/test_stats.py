@@ -0,0 +1,45 @@
+from connectivity.stats import PeerStats, RelayStats
+
+
+def test_peer_stats_counts_traffic():
+    stats = PeerStats()
+    stats.received(10, True, now=0)
+    stats.sent(20, False)
+    stats.sent(30, False)
+
+    assert (stats.packets_in, stats.bytes_in) == (1, 10)
+    assert (stats.packets_out, stats.bytes_out) == (2, 50)
+    assert stats.path == 'mixed'
+
+
+def test_peer_stats_path():
+    stats = PeerStats()
+    assert stats.path is None
+    stats.received(10, True, now=0)
+    assert stats.path == 'turn'
+    stats.reset()
+    stats.sent(10, False)
+    assert stats.path == 'direct'
+
+
+def test_peer_stats_jitter():
+    stats = PeerStats()
+    # Intervals of 10ms, 10ms, 13ms and 117ms
+    for now in [0, 0.010, 0.020, 0.033, 0.150]:
+        stats.received(1, False, now=now)
+
+    jitter = stats.as_dict()["jitter_ms"]
+    assert jitter["1"] == 1
+    assert jitter["5"] == 1
+    assert jitter["200"] == 1
+    assert sum(jitter.values()) == 3
+
+
+def test_relay_stats_report():
+    stats = RelayStats()
+    stats.peer(("1.2.3.4", 6112)).sent(5, True)
+    assert stats.peer(("1.2.3.4", 6112)) is stats.peer(("1.2.3.4", 6112))
+
+    report = stats.as_dict()
+    assert report["peers"]["1.2.3.4:6112"]["packets_out"] == 1
+    assert report["peers"]["1.2.3.4:6112"]["path"] == 'turn'
@@ -0,0 +1,41 @@
+import pytest
+from PyQt5.QtCore import QObject, QThread
+
+from connectivity.thread import NetworkThread
+
+
+@pytest.fixture
+def thread(application):
+    thread = NetworkThread()
+    thread.start()
+    yield thread
+    thread.stop()
+
+
+def test_call_blocking_runs_in_thread(thread):
+    assert thread.call_blocking(QThread.currentThread) is thread
+
+
+def test_call_blocking_creates_objects_in_thread(thread):
+    obj = thread.call_blocking(QObject)
+    assert obj.thread() is thread
+
+
+def test_call_blocking_raises(thread):
+    def fail():
+        raise ValueError("fail")
+
+    with pytest.raises(ValueError):
+        thread.call_blocking(fail)
+
+
+def test_call_runs_in_order(thread, qtbot):
+    calls = []
+    for i in range(10):
+        thread.call(calls.append, i)
+    # A failing call doesn't stop the thread
+    thread.call(int, "not a number")
+    thread.call(calls.append, 10)
+
+    qtbot.waitUntil(lambda: len(calls) == 11, timeout=1000)
+    assert calls == list(range(11))
@@ -0,0 +1,75 @@
+import struct
+
+from connectivity.stun import STUNMessage
+from connectivity.turn import TURNSession
+
+
+class FakeSession(TURNSession):
+    def __init__(self):
+        TURNSession.__init__(self)
+        self.written = []
+        self.received = []
+
+    def _write(self, bytes):
+        self.written.append(bytes)
+
+    def _call_in(self, timeout, func):
+        pass
+
+    def _recv(self, channel, data):
+        self.received.append((channel, bytes(data)))
+
+    def _recvfrom(self, sender, data):
+        self.received.append((sender, bytes(data)))
+
+    def channel_bound(self, address, channel):
+        pass
+
+    def state_changed(self, new_state):
+        pass
+
+
+def bound_session(addr):
+    session = FakeSession()
+    session.bind(addr)
+    request = STUNMessage.from_bytes(session.written[-1])
+    response = STUNMessage('ChannelBindSuccess',
+                           transaction_id=request.transaction_id)
+    session.handle_response(response)
+    return session
+
+
+def test_bind_indexes_channels():
+    session = bound_session(("1.2.3.4", 6112))
+
+    assert session.bindings == {("1.2.3.4", 6112): 0x4000}
+    assert session.channels == {0x4000: ("1.2.3.4", 6112)}
+
+
+def test_channel_data_fast_path():
+    session = bound_session(("1.2.3.4", 6112))
+    # Padding after the payload must be ignored
+    frame = struct.pack('!HH', 0x4000, 3) + b"abc" + b"\0"
+
+    assert session.handle_channel_data(frame)
+    assert session.received == [(("1.2.3.4", 6112), b"abc")]
+
+
+def test_channel_data_fast_path_skips_other_messages():
+    session = bound_session(("1.2.3.4", 6112))
+    unbound = struct.pack('!HH', 0x4001, 3) + b"abc"
+    stun = STUNMessage('RefreshSuccess').to_bytes()
+
+    assert not session.handle_channel_data(unbound)
+    assert not session.handle_channel_data(stun)
+    assert not session.handle_channel_data(b"\x40")
+    assert session.received == []
+
+
+def test_send_to_bound_peer_uses_channel():
+    session = bound_session(("1.2.3.4", 6112))
+    session.send_to(b"abc", ("1.2.3.4", 6112))
+    session.send_to(b"def", 0x4000)
+
+    assert session.written[-2:] == [struct.pack('!HH', 0x4000, 3) + b"abc",
+                                    struct.pack('!HH', 0x4000, 3) + b"def"]
@@ -0,0 +1,83 @@
+from downloadManager import PreviewDownloader, PreviewDownloadRequest
+
+
+class FakeGenerator:
+    def __init__(self, result):
+        self.result = result
+        self.generated = []
+
+    def can_generate(self, name):
+        return name.startswith("local")
+
+    def generate(self, name):
+        self.generated.append(name)
+        return self.result
+
+
+def test_generates_local_previews(qtbot, tmpdir):
+    gen = FakeGenerator("/previews/local_map.png")
+    dler = PreviewDownloader(str(tmpdir), "http://localhost/", gen)
+    req1 = PreviewDownloadRequest()
+    req2 = PreviewDownloadRequest()
+
+    with qtbot.waitSignals([req1.done, req2.done]) as blocker:
+        dler.download_preview("local_map", req1)
+        dler.download_preview("local_map", req2)
+
+    assert gen.generated == ["local_map"]
+    assert list(blocker.all_signals_and_args[0].args) == [
+        "local_map", ("/previews/local_map.png", False)]
+    assert req1.dl is None and req2.dl is None
+
+
+def test_failed_generation_falls_back_to_download(qtbot, tmpdir, mocker):
+    gen = FakeGenerator(None)
+    dler = PreviewDownloader(str(tmpdir), "http://localhost/", gen)
+    start = mocker.patch("downloadManager.PreviewDownload._start_download")
+    req = PreviewDownloadRequest()
+
+    dler.download_preview("local_map", req)
+    qtbot.waitUntil(lambda: start.called)
+
+    assert gen.generated == ["local_map"]
+    assert req.dl is not None
+    assert req.dl.name == "local_map"
+    assert req.dl._url == "http://localhost/local_map.png"
+
+
+def test_downloads_previews_it_cant_generate(tmpdir, mocker):
+    gen = FakeGenerator("/previews/remote_map.png")
+    dler = PreviewDownloader(str(tmpdir), "http://localhost/", gen)
+    start = mocker.patch("downloadManager.PreviewDownload._start_download")
+    req = PreviewDownloadRequest()
+
+    dler.download_preview("remote_map", req)
+    assert start.called
+    assert gen.generated == []
+
+
+def test_available_previews_are_reported(qtbot, tmpdir):
+    gen = FakeGenerator("/previews/local_map.png")
+    dler = PreviewDownloader(str(tmpdir), "http://localhost/", gen)
+    req = PreviewDownloadRequest()
+
+    with qtbot.waitSignal(dler.previewAvailable) as blocker:
+        dler.download_preview("local_map", req)
+    assert blocker.args == ["local_map"]
+
+
+def test_failed_previews_arent_retried(qtbot, tmpdir, mocker):
+    dler = PreviewDownloader(str(tmpdir), "http://localhost/")
+    mocker.patch("downloadManager.PreviewDownload._start_download")
+    mocker.patch("downloadManager.PreviewDownload.failed", return_value=True)
+    req = PreviewDownloadRequest()
+    result = ("games/unknown_map.png", True)
+
+    dler.download_preview("remote_map", req)
+    with qtbot.waitSignal(req.done):
+        req.dl.done.emit(req.dl, result)
+
+    with qtbot.waitSignal(req.done) as blocker:
+        dler.download_preview("remote_map", req)
+    assert list(blocker.args) == ["remote_map", result]
+    assert req.dl is None
@@ -0,0 +1,176 @@
+import copy
+import pytest
+
+from PyQt5.QtCore import QModelIndex, QPersistentModelIndex, Qt
+
+from model import game, gameset
+
+DEFAULT_DICT = {
+    "uid":  1,
+    "state": game.GameState.OPEN,
+    "launched_at": 10000,
+    "num_players": 3,
+    "max_players": 8,
+    "title": "Sentons sucks",
+    "host":  "IllIIIlIlIIIlI",
+    "mapname": "Sentons Ultimate 6v6",
+    "map_file_path": "xrca_co_000001.scfamap",
+    "teams": {
+        1: ["IllIIIlIlIIIlI", "TableNoob"],
+        2: ["Kraut"]
+        },
+    "featured_mod": "faf",
+    "featured_mod_versions": {},
+    "sim_mods": {},
+    "password_protected": True,
+    "visibility": game.GameVisibility.PUBLIC,
+}
+
+
+@pytest.fixture
+def GameModel(application):
+    # The games package can only be imported once the client exists
+    import client  # noqa: F401
+    from games.gamemodel import GameModel
+    return GameModel
+
+
+def make_model(GameModel, mocker, num_games):
+    playerset = mocker.MagicMock()
+    gs = gameset.Gameset(playerset)
+    model = GameModel(mocker.Mock(), mocker.Mock(), gs)
+    for uid in range(1, num_games + 1):
+        data = copy.deepcopy(DEFAULT_DICT)
+        data["uid"] = uid
+        gs[uid] = game.Game(playerset=playerset, **data)
+    return gs, model
+
+
+def model_uids(model):
+    return [model.index(row, 0).data(Qt.DisplayRole).game.uid
+            for row in range(model.rowCount(QModelIndex()))]
+
+
+def test_add_games(GameModel, mocker):
+    gs, model = make_model(GameModel, mocker, 5)
+    assert sorted(model_uids(model)) == [1, 2, 3, 4, 5]
+
+
+def test_remove_game_keeps_rows_consistent(GameModel, mocker):
+    gs, model = make_model(GameModel, mocker, 5)
+    gs[2].abort_game()
+    gs[4].abort_game()
+    assert sorted(model_uids(model)) == [1, 3, 5]
+
+    # Rows of remaining games are still reported correctly
+    changed = mocker.Mock()
+    model.dataChanged.connect(changed)
+    for uid in (1, 3, 5):
+        changed.reset_mock()
+        gs[uid].update(title="Changed {}".format(uid))
+        index = changed.call_args[0][0]
+        assert index.data(Qt.DisplayRole).game.uid == uid
+
+
+def test_remove_game_keeps_persistent_indexes(GameModel, mocker):
+    gs, model = make_model(GameModel, mocker, 5)
+    last = QPersistentModelIndex(model.index(4, 0))
+    uid = last.data(Qt.DisplayRole).game.uid
+    other = next(u for u in model_uids(model) if u != uid)
+
+    gs[other].abort_game()
+    assert last.isValid()
+    assert last.data(Qt.DisplayRole).game.uid == uid
+
+
+def test_remove_game_moves_last_row(GameModel, mocker):
+    gs, model = make_model(GameModel, mocker, 5)
+    rows = [QPersistentModelIndex(model.index(row, 0)) for row in range(5)]
+    uids = model_uids(model)
+    moved = mocker.Mock()
+    model.rowsMoved.connect(moved)
+
+    gs[uids[1]].abort_game()
+    assert moved.called
+    assert not rows[1].isValid()
+    # The last game fills the freed row and its index follows it
+    assert rows[4].row() == 1
+    for row, uid in ((0, uids[0]), (2, uids[2]), (3, uids[3]), (4, uids[4])):
+        assert rows[row].data(Qt.DisplayRole).game.uid == uid
+    assert model_uids(model) == [uids[0], uids[4], uids[2], uids[3]]
+
+    # Games are still found by their new rows
+    changed = mocker.Mock()
+    model.dataChanged.connect(changed)
+    gs[uids[4]].update(title="Moved")
+    assert changed.call_args[0][0].row() == 1
+    gs[uids[3]].abort_game()
+    assert model_uids(model) == [uids[0], uids[4], uids[2]]
+
+
+def test_clear_games(GameModel, mocker):
+    gs, model = make_model(GameModel, mocker, 3)
+    model.clear_games()
+    assert model.rowCount(QModelIndex()) == 0
+
+
+def test_sort_model_orders_by_sort_type(GameModel, mocker):
+    from games.gamemodel import GameSortModel
+    gs, model = make_model(GameModel, mocker, 4)
+    for uid, players in ((1, 1), (2, 3), (3, 2), (4, 3)):
+        gs[uid].update(teams={1: ["p{}".format(i) for i in range(players)]})
+
+    me = mocker.Mock()
+    me.isFriend = lambda id_: False
+    proxy = GameSortModel(me, model)
+    proxy.sort_type = GameSortModel.SortType.PLAYER_NUMBER
+    assert model_uids(proxy) == [2, 4, 3, 1]
+
+    proxy.sort_type = GameSortModel.SortType.AGE
+    assert model_uids(proxy) == [1, 2, 3, 4]
+
+
+def test_bulk_add_inserts_one_range(GameModel, mocker):
+    gs, model = make_model(GameModel, mocker, 3)
+    inserted = mocker.Mock()
+    reset = mocker.Mock()
+    model.rowsInserted.connect(inserted)
+    model.modelReset.connect(reset)
+
+    gs.begin_bulk_add()
+    for uid in (4, 5):
+        data = copy.deepcopy(DEFAULT_DICT)
+        data["uid"] = uid
+        gs[uid] = game.Game(playerset=gs._playerset, **data)
+    gs.commit_bulk_add()
+
+    assert not reset.called
+    assert inserted.call_count == 1
+    assert inserted.call_args[0][1:] == (3, 4)
+    assert sorted(model_uids(model)) == [1, 2, 3, 4, 5]
+
+
+def test_sort_keys_follow_updates(GameModel, mocker):
+    from games.gamemodel import GameSortModel
+    gs, model = make_model(GameModel, mocker, 3)
+    hosts = {}
+    for uid in (1, 2, 3):
+        hosts["host{}".format(uid)] = mocker.Mock(id=uid)
+    gs._playerset.__getitem__.side_effect = hosts.__getitem__
+    for uid in (1, 2, 3):
+        gs[uid].update(host="host{}".format(uid))
+
+    friends = set()
+    me = mocker.Mock()
+    me.isFriend = lambda id_: id_ in friends
+    proxy = GameSortModel(me, model)
+    proxy.sort_type = GameSortModel.SortType.PLAYER_NUMBER
+    assert model_uids(proxy) == [1, 2, 3]
+
+    gs[3].update(teams={1: ["a", "b", "c", "d"]})
+    assert model_uids(proxy) == [3, 1, 2]
+
+    friends.add(2)
+    for row in range(3):
+        model.index(row, 0).data(Qt.DisplayRole)._check_host_relation_changed({2})
+    assert model_uids(proxy) == [2, 3, 1]
@@ -2,6 +2,8 @@ import pytest
 import copy
 
 from model import game
+from model.player import Player
+from model.playerset import Playerset
 
 DEFAULT_DICT = {
     "uid":  1,
@@ -100,3 +102,104 @@ def test_can_update_to_none(playerset, mocker):
     g = game.Game(playerset=playerset, **data)
     g.update(launched_at=None)
     assert g.launched_at is None
+
+
+def test_update_signal_carries_snapshot(playerset, mocker):
+    data = copy.deepcopy(DEFAULT_DICT)
+    g = game.Game(playerset=playerset, **data)
+    updated = mocker.Mock()
+    g.gameUpdated.connect(updated)
+    g.update(title="Other title")
+
+    new, old, _ = updated.call_args[0]
+    assert new is g
+    assert isinstance(old, game.GameSnapshot)
+    assert old.title == "Sentons sucks"
+    assert old.players == g.players
+
+
+def test_snapshot_is_immutable(playerset):
+    g = game.Game(playerset=playerset, **DEFAULT_DICT)
+    s = g.snapshot()
+    with pytest.raises(AttributeError):
+        s.title = "Something"
+    with pytest.raises(AttributeError):
+        s.something_else = 1
+    assert s.to_dict() == g.to_dict()
+
+
+def test_snapshot_diff(playerset):
+    data = copy.deepcopy(DEFAULT_DICT)
+    g = game.Game(playerset=playerset, **data)
+    s = g.snapshot()
+    assert s.diff(g) == set()
+    g.update(title="Other title", num_players=4, host=data["host"])
+    assert s.diff(g) == {"title", "num_players"}
+    assert s.diff(g.snapshot()) == {"title", "num_players"}
+
+
+def test_abort_snapshot_not_closed(playerset, mocker):
+    g = game.Game(playerset=playerset, **DEFAULT_DICT)
+    updated = mocker.Mock()
+    g.gameUpdated.connect(updated)
+    g.abort_game()
+    new, old, _ = updated.call_args[0]
+    assert new.closed()
+    assert not old.closed()
+
+
+def test_update_signal_reports_changed_fields(playerset, mocker):
+    data = copy.deepcopy(DEFAULT_DICT)
+    g = game.Game(playerset=playerset, **data)
+    updated = mocker.Mock()
+    g.gameUpdated.connect(updated)
+    data["num_players"] = 4
+    g.update(**data)
+    assert updated.call_args[0][2] == {"num_players"}
+
+
+def test_no_update_signal_if_nothing_changed(playerset, mocker):
+    data = copy.deepcopy(DEFAULT_DICT)
+    g = game.Game(playerset=playerset, **data)
+    updated = mocker.Mock()
+    g.gameUpdated.connect(updated)
+    g.update(**data)
+    assert not updated.called
+
+
+def test_team_lists_follow_updates(playerset):
+    data = copy.deepcopy(DEFAULT_DICT)
+    data["teams"] = {1: ["A", "B"], "-1": ["Obs"]}
+    g = game.Game(playerset=playerset, **data)
+    g.update(teams={1: ["A"], 2: ["C"], "-1": ["Obs"]})
+
+    assert sorted(g.players) == ["A", "C", "Obs"]
+    assert g.observers == ["Obs"]
+    assert g.playing_teams == {1: ["A"], 2: ["C"]}
+    assert sorted(g.playing_players) == ["A", "C"]
+
+    g.update(teams=None)
+    assert g.players == []
+    assert g.playing_teams == {}
+
+
+def test_average_rating_follows_players_and_ratings():
+    ps = Playerset()
+    ps[1] = Player(id_=1, login="A", global_rating=(1500, 0))
+    ps[2] = Player(id_=2, login="B", global_rating=(1000, 0))
+    data = copy.deepcopy(DEFAULT_DICT)
+    data["teams"] = {1: ["A"], 2: ["B", "C"]}
+    g = game.Game(playerset=ps, **data)
+    assert g.average_rating == 1250
+
+    ps[2].update(global_rating=(2000, 0))
+    assert g.average_rating == 1750
+
+    ps[3] = Player(id_=3, login="C", global_rating=(500, 0))
+    assert g.average_rating == 4000 / 3
+
+    del ps[1]
+    assert g.average_rating == 1250
+
+    g.update(teams={1: ["C"]})
+    assert g.average_rating == 500
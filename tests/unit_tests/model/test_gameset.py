@@ -194,3 +194,48 @@ def test_no_state_changes(playerset, mocker):
     assert not lobby.called
     assert not live.called
     assert not closed.called
+
+
+def test_bulk_add(playerset, mocker):
+    s = gameset.Gameset(playerset=playerset)
+    newgame = mocker.Mock()
+    bulkadded = mocker.Mock()
+    lobby = mocker.Mock()
+    s.newGame.connect(newgame)
+    s.gamesBulkAdded.connect(bulkadded)
+    s.newLobby.connect(lobby)
+
+    s.begin_bulk_add()
+    games = []
+    for uid in range(1, 4):
+        data = copy.deepcopy(DEFAULT_DICT)
+        data["uid"] = uid
+        g = game.Game(playerset=playerset, **data)
+        s[uid] = g
+        games.append(g)
+    assert 1 in s
+    assert not lobby.called
+    s.commit_bulk_add()
+
+    assert not newgame.called
+    bulkadded.assert_called_once_with(games)
+    assert lobby.call_count == 3
+
+
+def test_bulk_add_closed_game_not_reported(playerset, mocker):
+    s = gameset.Gameset(playerset=playerset)
+    bulkadded = mocker.Mock()
+    closed = mocker.Mock()
+    s.gamesBulkAdded.connect(bulkadded)
+    s.newClosedGame.connect(closed)
+
+    data = copy.deepcopy(DEFAULT_DICT)
+    s.begin_bulk_add()
+    s[1] = game.Game(playerset=playerset, **data)
+    data["state"] = game.GameState.CLOSED
+    s[1].update(**data)
+    s.commit_bulk_add()
+
+    assert 1 not in s
+    assert not closed.called
+    assert not bulkadded.called
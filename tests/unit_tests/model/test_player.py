@@ -54,3 +54,19 @@ def test_player_equality():
 def test_player_indexing():
     p = Player(id_=1, login='x')
     assert {1: p}[1] == {p: p}[p]
+
+
+def test_update_signal_reports_changed_fields(mocker):
+    p = Player(**DEFAULT_DICT)
+    updated = mocker.Mock()
+    p.updated.connect(updated)
+    p.update(number_of_games=375, country="PL", clan="CLAN")
+    assert updated.call_args[0][2] == {"number_of_games", "clan"}
+
+
+def test_no_update_signal_if_nothing_changed(mocker):
+    p = Player(**DEFAULT_DICT)
+    updated = mocker.Mock()
+    p.updated.connect(updated)
+    p.update(**DEFAULT_DICT)
+    assert not updated.called
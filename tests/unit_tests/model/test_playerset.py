@@ -74,3 +74,47 @@ def test_cant_get_by_player():
     ps[p.id] = p
     with pytest.raises(TypeError):
         ps[p]
+
+
+def test_bulk_add(mocker):
+    ps = Playerset()
+    newplayer = mocker.Mock()
+    bulkadded = mocker.Mock()
+    ps.playerAdded.connect(newplayer)
+    ps.playersBulkAdded.connect(bulkadded)
+
+    ps.begin_bulk_add()
+    players = [Player(id_=i, login="Player{}".format(i)) for i in range(5)]
+    for p in players:
+        ps[p.id] = p
+    assert players[0].id in ps
+    assert not bulkadded.called
+
+    ps.commit_bulk_add()
+    assert not newplayer.called
+    bulkadded.assert_called_once_with(players)
+
+
+def test_bulk_add_removed_player_not_reported(mocker):
+    ps = Playerset()
+    bulkadded = mocker.Mock()
+    goneplayer = mocker.Mock()
+    ps.playersBulkAdded.connect(bulkadded)
+    ps.playerRemoved.connect(goneplayer)
+
+    ps.begin_bulk_add()
+    p1 = Player(id_=1, login="Player1")
+    p2 = Player(id_=2, login="Player2")
+    ps[p1.id] = p1
+    ps[p2.id] = p2
+    del ps[p1.id]
+    ps.commit_bulk_add()
+
+    assert not goneplayer.called
+    bulkadded.assert_called_once_with([p2])
+
+
+def test_commit_without_begin():
+    ps = Playerset()
+    with pytest.raises(ValueError):
+        ps.commit_bulk_add()
@@ -0,0 +1,106 @@
+import hashlib
+import os
+import zipfile
+import zlib
+
+from util import digests
+
+
+def make_file(tmpdir, name, content, age=60):
+    f = tmpdir.join(name)
+    f.write_binary(content)
+    mtime = f.mtime() - age
+    os.utime(str(f), (mtime, mtime))
+    return str(f)
+
+
+def test_md5(tmpdir):
+    cache = digests.DigestCache(str(tmpdir.join("digests.json")))
+    path = make_file(tmpdir, "file", b"some data")
+    assert cache.md5(path) == hashlib.md5(b"some data").hexdigest()
+    assert cache.md5(str(tmpdir.join("missing"))) is None
+    assert cache.md5(str(tmpdir)) is None
+
+
+def test_unchanged_files_arent_read_again(tmpdir, mocker):
+    cache = digests.DigestCache(str(tmpdir.join("digests.json")))
+    path = make_file(tmpdir, "file", b"some data")
+    compute = mocker.spy(digests, "_md5_file")
+    cache.md5(path)
+    cache.md5(path)
+    assert compute.call_count == 1
+
+    make_file(tmpdir, "file", b"other data")
+    assert cache.md5(path) == hashlib.md5(b"other data").hexdigest()
+    assert compute.call_count == 2
+
+
+def test_recently_modified_files_arent_remembered(tmpdir, mocker):
+    cache = digests.DigestCache(str(tmpdir.join("digests.json")))
+    path = make_file(tmpdir, "file", b"some data", age=0)
+    compute = mocker.spy(digests, "_md5_file")
+    cache.md5(path)
+    cache.md5(path)
+    assert compute.call_count == 2
+
+
+def test_saved_between_runs(tmpdir, mocker):
+    cachefile = str(tmpdir.join("digests.json"))
+    path = make_file(tmpdir, "file", b"some data")
+    cache = digests.DigestCache(cachefile)
+    cache.md5(path)
+    cache.save()
+
+    compute = mocker.spy(digests, "_md5_file")
+    cache = digests.DigestCache(cachefile)
+    assert cache.md5(path) == hashlib.md5(b"some data").hexdigest()
+    assert not compute.called
+
+
+def test_broken_cache_file_is_ignored(tmpdir):
+    cachefile = tmpdir.join("digests.json")
+    cachefile.write("{not json")
+    path = make_file(tmpdir, "file", b"some data")
+    cache = digests.DigestCache(str(cachefile))
+    assert cache.md5(path) == hashlib.md5(b"some data").hexdigest()
+
+
+def test_crc32(tmpdir):
+    cache = digests.DigestCache(str(tmpdir.join("digests.json")))
+    path = make_file(tmpdir, "file", b"some data")
+    assert cache.crc32(path) == zlib.crc32(b"some data")
+
+
+def test_zip_ok(tmpdir):
+    cache = digests.DigestCache(str(tmpdir.join("digests.json")))
+    path = str(tmpdir.join("good.zip"))
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("mod_info.lua", "name = 'mod'")
+    os.utime(path, (0, 0))
+    assert cache.zip_ok(path) is True
+    assert cache.zip_ok(make_file(tmpdir, "bad.zip", b"not a zip")) is False
+
+
+def test_warm_start_reads_nothing(tmpdir, mocker):
+    cachefile = str(tmpdir.join("digests.json"))
+    path = make_file(tmpdir, "file", b"some data")
+    cache = digests.DigestCache(cachefile)
+    cache.md5(path)
+    cache.crc32(path)
+    cache.save()
+
+    opened = mocker.spy(digests, "_read_chunks")
+    cache = digests.DigestCache(cachefile)
+    cache.md5(path)
+    cache.crc32(path)
+    assert not opened.called
+
+
+def test_invalidate(tmpdir, mocker):
+    cache = digests.DigestCache(str(tmpdir.join("digests.json")))
+    path = make_file(tmpdir, "file", b"some data")
+    compute = mocker.spy(digests, "_md5_file")
+    cache.md5(path)
+    cache.invalidate(path)
+    cache.md5(path)
+    assert compute.call_count == 2
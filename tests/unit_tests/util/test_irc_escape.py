@@ -0,0 +1,27 @@
+import pytest
+
+from util import irc_escape
+
+
+@pytest.mark.parametrize("text, escaped", [
+    ("gl hf", "gl hf"),
+    ("<b>bold</b> & 'quoted'",
+     "&lt;b&gt;bold&lt;/b&gt; &amp; &apos;quoted&apos;"),
+    ("see faforever.com",
+     'see <a href="http://faforever.com" style="">faforever.com</a>'),
+    ("faflive://localhost/1234/5.SCFAreplay",
+     '<a href="faflive://localhost/1234/5.SCFAreplay" style="">'
+     'faflive://localhost/1234/5.SCFAreplay</a>'),
+    ("at 127.0.0.1:6667", 'at <a href="http://127.0.0.1:6667" style="">'
+     '127.0.0.1:6667</a>'),
+    ("version 3.0 and not.atld", "version 3.0 and not.atld"),
+    ("  extra   spaces ", "extra spaces"),
+])
+def test_irc_escape(text, escaped):
+    assert irc_escape(text) == escaped
+
+
+def test_irc_escape_link_style():
+    assert irc_escape("www.faforever.com", "color:red") == (
+        '<a href="http://www.faforever.com" style="color:red">'
+        'www.faforever.com</a>')